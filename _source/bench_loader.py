@@ -0,0 +1,63 @@
+import csv
+import os
+import shutil
+import sys
+import tempfile
+import time
+from data_loader import load_csv, load_json, parse_csv, SNAPSHOT_SUFFIX
+
+# Cold (text parse) vs warm (binary snapshot) loads of villes.csv and the enriched JSON.
+# Usage: python bench_loader.py [synthetic_rows]
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+VILLES_PATH = os.path.join(BASE_DIR, "villes.csv")
+ENRICHED_PATH = os.path.join(BASE_DIR, "villes_enrichies_final-1.json")
+
+def write_synthetic_csv(path, rows):
+    source = parse_csv(VILLES_PATH)
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=list(source[0].keys()))
+        writer.writeheader()
+        for i in range(rows):
+            row = dict(source[i % len(source)])
+            row["slug"] = f"{row['slug']}-{i}"
+            writer.writerow(row)
+
+def timed(fn):
+    start = time.perf_counter()
+    data = fn()
+    return time.perf_counter() - start, len(data)
+
+def bench_file(label, path, loader):
+    snapshot = path + SNAPSHOT_SUFFIX
+    if os.path.exists(snapshot):
+        os.remove(snapshot)
+    text, rows = timed(lambda: loader(path, use_snapshot=False))
+    cold, _ = timed(lambda: loader(path))  # parse + write snapshot
+    warm, _ = timed(lambda: loader(path))
+    os.utime(path)  # new mtime, same bytes: hash check, no re-parse
+    touched, _ = timed(lambda: loader(path))
+    size = os.path.getsize(path) / 1e6
+    snap = os.path.getsize(snapshot) / 1e6
+    print(f"{label:<26}{rows:>7}{size:>8.1f}MB{snap:>8.1f}MB{text * 1000:>10.1f}{cold * 1000:>10.1f}{warm * 1000:>10.1f}{touched * 1000:>10.1f}{text / warm:>8.1f}x")
+
+def main():
+    synthetic_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 35000
+    print(f"{'source':<26}{'rows':>7}{'text':>10}{'snapshot':>10}{'parse ms':>10}{'cold ms':>10}{'warm ms':>10}{'touch ms':>10}{'gain':>9}")
+    tmp_dir = tempfile.mkdtemp(prefix="bench_loader_")
+    try:
+        # Work on copies so the real snapshots are not disturbed
+        villes = os.path.join(tmp_dir, "villes.csv")
+        enriched = os.path.join(tmp_dir, "villes_enrichies.json")
+        shutil.copy(VILLES_PATH, villes)
+        shutil.copy(ENRICHED_PATH, enriched)
+        bench_file("villes.csv", villes, load_csv)
+        bench_file("villes_enrichies.json", enriched, load_json)
+        synthetic = os.path.join(tmp_dir, "villes_synthetic.csv")
+        write_synthetic_csv(synthetic, synthetic_rows)
+        bench_file(f"villes.csv x{synthetic_rows}", synthetic, load_csv)
+    finally:
+        shutil.rmtree(tmp_dir)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,304 @@
+import argparse
+import csv
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+from build_manifest import MANIFEST_DIR
+from neighbour_index import name_key
+
+# Scale benchmark of the generators on synthetic French communes.
+# For each size (1k, 10k, 35k by default) a throwaway copy of _source/ gets a
+# synthetic villes.csv, enriched JSON and departements.json, then every
+# generator runs there as its own process, from a cold build. Recorded per
+# generator: wall time, pages per second, peak RSS (of the generator process;
+# pool workers with --jobs > 1 are not included) and bytes written.
+# Synthetic rows reuse the real rows as templates, so long text fields keep
+# realistic sizes, and departments are drawn with the skew of the real data.
+# Results go to .build/bench/; --compare checks them against a baseline saved
+# with --save-baseline and exits 1 on a regression. No baseline is committed:
+# timings only compare on the same machine, so save one there first.
+# --compare without a baseline file is an error (exit 2) before anything runs.
+# Usage: python bench_scale.py [--sizes 1000,10000,35000] [--compare] [--save-baseline]
+# The 35k run writes about 9 GB of pages; the workspace is deleted after each size.
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+VILLES_PATH = os.path.join(BASE_DIR, "villes.csv")
+ENRICHED_PATH = os.path.join(BASE_DIR, "villes_enrichies_final-1.json")
+DEPARTEMENTS_PATH = os.path.join(BASE_DIR, "departements.json")
+RESULTS_DIR = os.path.join(MANIFEST_DIR, "bench")
+BASELINE_PATH = os.path.join(BASE_DIR, "bench_scale_baseline.json")
+SIZES = (1000, 10000, 35000)
+REGRESSION_THRESHOLD = 1.2
+# Differences below these are run-to-run noise, whatever the ratio
+NOISE_FLOOR = {"seconds": 0.25, "peak_rss_mb": 5.0}
+
+# (script, accepts --jobs); sitemaps read the manifests, so they come last
+GENERATORS = [
+    ("generate.py", True),
+    ("generate_departements.py", True),
+    ("generate_demos.py", True),
+    ("generate_site.py", True),
+    ("generate_sitemap.py", False),
+    ("generate_niche_sitemaps.py", False),
+]
+# Inputs of the generators copied into the workspace besides the *.py files
+WORKSPACE_FILES = ("template.html", "template_departement.html", "niche_data.json", "config.json")
+
+PREFIXES = ("", "", "", "Saint-", "Sainte-", "Le ", "La ", "Les ", "Villeneuve-", "Mont-")
+SUFFIXES = ("", "", "", "-sur-Loire", "-sur-Mer", "-en-Provence", "-les-Bains", "-le-Château", "-la-Forêt", "-sur-Seine")
+
+
+def synthetic_name(rng, base, used):
+    for _ in range(20):
+        name = f"{rng.choice(PREFIXES)}{base}{rng.choice(SUFFIXES)}"
+        if name_key(name) not in used:
+            return name
+    n = 2
+    while name_key(f"{base} {n}") in used:
+        n += 1
+    return f"{base} {n}"
+
+
+def rename(value, old, new):
+    return value.replace(old, new) if isinstance(value, str) and old else value
+
+
+def make_dataset(directory, size, seed=0):
+    """Write villes.csv, villes_enrichies_final-1.json and departements.json with size communes."""
+    rng = random.Random(seed)
+    with open(VILLES_PATH, "r", encoding="utf-8", newline="") as f:
+        rows = list(csv.DictReader(f))
+    with open(ENRICHED_PATH, "r", encoding="utf-8") as f:
+        enriched = {e["slug"]: e for e in json.load(f)}
+    with open(DEPARTEMENTS_PATH, "r", encoding="utf-8") as f:
+        depts = json.load(f)
+
+    # Department skew of the real data (+1 so that every department shows up)
+    real_counts = Counter(r["departement_nom"] for r in rows)
+    dept_names = [d["nom"] for d in depts]
+    weights = [real_counts.get(name, 0) + 1 for name in dept_names]
+    regions = {r["departement_nom"]: r["region"] for r in rows}
+
+    communes, used = [], set()
+    for i in range(size):
+        template = rows[i % len(rows)]
+        name = synthetic_name(rng, template["ville"], used)
+        slug = name_key(name)
+        used.add(slug)
+        dept = rng.choices(dept_names, weights)[0]
+        communes.append({
+            "template": template,
+            "ville": name,
+            "slug": slug,
+            "departement_nom": dept,
+            "region": regions.get(dept, template["region"]),
+            # Heavy-tailed like real communes: a few big cities, many villages
+            "population": min(int(150 * rng.paretovariate(1.05)), 2200000),
+        })
+
+    by_dept = defaultdict(list)
+    for c in communes:
+        by_dept[c["departement_nom"]].append(c)
+
+    villes_rows, enriched_rows = [], []
+    for c in communes:
+        template = c["template"]
+        old_name, old_slug = template["ville"], template["slug"]
+        same_dept = by_dept[c["departement_nom"]]
+        close = [o for o in rng.sample(same_dept, min(len(same_dept), 9)) if o is not c][:8]
+
+        row = {key: rename(rename(value, old_name, c["ville"]), old_slug, c["slug"]) for key, value in template.items()}
+        row.update(ville=c["ville"], slug=c["slug"], departement_nom=c["departement_nom"], region=c["region"], population=str(c["population"]))
+        for i in (1, 2, 3):
+            if f"slug_proche_{i}" in row:
+                row[f"slug_proche_{i}"] = close[i - 1]["slug"] if len(close) >= i else ""
+        villes_rows.append(row)
+
+        source = enriched.get(old_slug)
+        if source:
+            entry = {key: rename(rename(value, old_name, c["ville"]), old_slug, c["slug"]) for key, value in source.items()}
+            entry.update(ville=c["ville"], slug=c["slug"], departement_nom=c["departement_nom"], region=c["region"], population=c["population"])
+            entry["communes_limitrophes"] = "|".join(o["ville"] for o in close)
+            enriched_rows.append(entry)
+
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, "villes.csv"), "w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0].keys()), quoting=csv.QUOTE_NONNUMERIC)
+        writer.writeheader()
+        writer.writerows(villes_rows)
+    with open(os.path.join(directory, "villes_enrichies_final-1.json"), "w", encoding="utf-8") as f:
+        json.dump(enriched_rows, f, ensure_ascii=False)
+    with open(os.path.join(directory, "departements.json"), "w", encoding="utf-8") as f:
+        json.dump(depts, f, ensure_ascii=False, indent=2)
+    return len(villes_rows), len(enriched_rows)
+
+
+def make_workspace(size, seed):
+    """Copy of the generators in a temporary tree, with a synthetic dataset and an empty output/."""
+    root = tempfile.mkdtemp(prefix=f"bench_scale_{size}_")
+    source = os.path.join(root, "_source")
+    os.makedirs(os.path.join(root, "output"))
+    shutil.copytree(os.path.join(BASE_DIR, "demos"), os.path.join(source, "demos"))
+    for name in os.listdir(BASE_DIR):
+        if name.endswith(".py") or name in WORKSPACE_FILES:
+            shutil.copy(os.path.join(BASE_DIR, name), source)
+    make_dataset(source, size, seed)
+    return root
+
+
+def snapshot(directory):
+    files = {}
+    for dirpath, _, filenames in os.walk(directory):
+        for name in filenames:
+            path = os.path.join(dirpath, name)
+            st = os.stat(path)
+            files[path] = (st.st_size, st.st_mtime_ns)
+    return files
+
+
+# Runs a generator as __main__ and writes its peak RSS (MB) to $BENCH_RSS_FILE
+# at exit. On Linux a child's ru_maxrss starts from the parent's high-water mark
+# (it survives fork + exec), so the child reads its own VmHWM instead.
+RUNNER = """
+import atexit, os, runpy, sys
+
+def write_peak_rss():
+    try:
+        with open("/proc/self/status") as f:
+            peak = next(int(line.split()[1]) / 1024 for line in f if line.startswith("VmHWM:"))
+    except (OSError, StopIteration):
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+    with open(os.environ["BENCH_RSS_FILE"], "w") as f:
+        f.write(str(peak))
+
+atexit.register(write_peak_rss)
+sys.argv = sys.argv[1:]
+runpy.run_path(sys.argv[0], run_name="__main__")
+"""
+
+
+def run_generator(root, script, accepts_jobs, jobs):
+    output = os.path.join(root, "output")
+    rss_file = os.path.join(root, "peak_rss")
+    before = snapshot(output)
+    command = [sys.executable, "-c", RUNNER, script] + (["--jobs", str(jobs)] if accepts_jobs else [])
+    env = dict(os.environ, BENCH_RSS_FILE=rss_file)
+    started = time.perf_counter()
+    proc = subprocess.run(command, cwd=os.path.join(root, "_source"), env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    seconds = time.perf_counter() - started
+    if proc.returncode != 0:
+        raise RuntimeError(f"{script} exited with {proc.returncode}:\n{proc.stderr.decode('utf-8', 'replace')[-2000:]}")
+    with open(rss_file, "r") as f:
+        peak_rss = float(f.read())
+
+    after = snapshot(output)
+    written = [path for path, stat in after.items() if before.get(path) != stat]
+    pages = sum(1 for path in written if path.endswith((".html", ".xml", ".xml.gz")))
+    return {
+        "seconds": round(seconds, 3),
+        "pages": pages,
+        "pages_per_second": round(pages / seconds, 1) if seconds else None,
+        "peak_rss_mb": round(peak_rss, 1),
+        "bytes_written": sum(after[path][0] for path in written),
+    }
+
+
+def run_size(size, jobs, seed, only=None, keep=False):
+    started = time.perf_counter()
+    root = make_workspace(size, seed)
+    print(f"📦 {size} communes: workspace {root} ({time.perf_counter() - started:.1f}s)")
+    results = {}
+    try:
+        for script, accepts_jobs in GENERATORS:
+            if only and script not in only:
+                continue
+            result = run_generator(root, script, accepts_jobs, jobs)
+            results[script] = result
+            print(f"   {script:<28}{result['seconds']:>9.2f}s{result['pages']:>9} pages{result['pages_per_second'] or 0:>10.1f}/s"
+                  f"{result['peak_rss_mb']:>9.1f} MB{result['bytes_written'] / 1e6:>10.1f} MB written")
+    finally:
+        if keep:
+            print(f"   workspace kept: {root}")
+        else:
+            shutil.rmtree(root)
+    return results
+
+
+def compare(results, baseline, threshold=REGRESSION_THRESHOLD):
+    """Print time and memory against the baseline; return the regressions found."""
+    regressions = []
+    print(f"🧭 Against baseline of {baseline.get('created', '?')} (regression above x{threshold:g}):")
+    for size, scripts in results["sizes"].items():
+        for script, result in scripts.items():
+            base = baseline.get("sizes", {}).get(size, {}).get(script)
+            if not base:
+                print(f"   ?? {size:>6} {script:<28}not in the baseline")
+                continue
+            for metric in ("seconds", "peak_rss_mb"):
+                if not base[metric]:
+                    continue
+                ratio = result[metric] / base[metric]
+                regressed = ratio > threshold and result[metric] - base[metric] > NOISE_FLOOR[metric]
+                flag = "⚠️" if regressed else "  "
+                print(f"   {flag} {size:>6} {script:<28}{metric:<12}{base[metric]:>10.2f} -> {result[metric]:>10.2f}  x{ratio:.2f}")
+                if regressed:
+                    regressions.append((size, script, metric, ratio))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the generators on synthetic datasets")
+    parser.add_argument("--sizes", default=",".join(map(str, SIZES)), help="comma-separated commune counts")
+    parser.add_argument("--jobs", "-j", type=int, default=1, help="passed to the generators")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the synthetic data")
+    parser.add_argument("--only", action="append", help="run only this generator (repeatable)")
+    parser.add_argument("--keep", action="store_true", help="keep the workspaces for inspection")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--compare", action="store_true", help="compare against the baseline (required), exit 1 on a regression")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD, help="ratio counted as a regression")
+    parser.add_argument("--save-baseline", action="store_true", help="store these results as the new baseline")
+    args = parser.parse_args()
+    if args.compare and not os.path.exists(args.baseline):
+        parser.error(f"--compare: no baseline at {args.baseline}; run with --save-baseline on this machine first")
+
+    results = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "jobs": args.jobs,
+        "seed": args.seed,
+        "sizes": {},
+    }
+    for size in (int(s) for s in args.sizes.split(",")):
+        results["sizes"][str(size)] = run_size(size, args.jobs, args.seed, args.only, args.keep)
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    path = os.path.join(RESULTS_DIR, f"scale-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"💾 Results written to {path}")
+
+    regressions = []
+    if args.compare:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.threshold)
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"💾 Baseline saved to {args.baseline}")
+    if regressions:
+        print(f"❌ {len(regressions)} regression(s).")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+import os
+import sys
+import time
+from template_engine import CompiledTemplate
+
+# Before/after benchmark: chained str.replace vs compiled template render.
+# Usage: python bench_templates.py [iterations]
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+TEMPLATES = ["template.html"] + [os.path.join("demos", f) for f in sorted(os.listdir(os.path.join(BASE_DIR, "demos")))]
+
+def replace_render(source, values):
+    content = source
+    for key, val in values.items():
+        content = content.replace("{{" + key + "}}", str(val))
+    return content
+
+def sample_values(template, extra_keys=70):
+    # Every placeholder gets a value, plus unused keys like a full CSV row would bring
+    values = {key: f"valeur {key} " * 20 for key in sorted(template.placeholders)}
+    for i in range(max(0, extra_keys - len(values))):
+        values[f"colonne_{i}"] = "texte " * 50
+    return values
+
+def bench(fn, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    print(f"⏱️ {iterations} renders per template")
+    print(f"{'template':<24}{'size':>8}{'keys':>6}{'replace':>12}{'compiled':>12}{'speedup':>9}")
+    for name in TEMPLATES:
+        with open(os.path.join(BASE_DIR, name), "r", encoding="utf-8") as f:
+            source = f.read()
+        template = CompiledTemplate(source, name)
+        values = sample_values(template)
+        assert template.render(values) == replace_render(source, values)
+        before = bench(lambda: replace_render(source, values), iterations)
+        after = bench(lambda: template.render(values), iterations)
+        print(f"{name:<24}{len(source) // 1024:>6}KB{len(values):>6}{before * 1e6:>10.1f}µs{after * 1e6:>10.1f}µs{before / after:>8.1f}x")
+
+if __name__ == "__main__":
+    main()
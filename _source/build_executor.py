@@ -0,0 +1,115 @@
+import argparse
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import profiler
+from output_writer import merge_stats, take_stats
+
+# Shared multi-process executor for the generators.
+# Work is split into chunks (one per department or niche). Templates and lookup
+# tables travel once per worker through the pool initializer, not once per task.
+
+_CONTEXT = None
+
+# Workers come from a fork server so pools can be started safely from the
+# pipeline's stage threads (refresh_site.py)
+_MP_CONTEXT = multiprocessing.get_context("forkserver") if "forkserver" in multiprocessing.get_all_start_methods() else None
+
+def _init_worker(context, profile_modes=None):
+    global _CONTEXT
+    _CONTEXT = context
+    if profile_modes:
+        profiler.enable(("timers",))
+
+def _run_chunk(render, chunk):
+    # Write counters and phase timings go back with the page count so the stage can report them
+    with profiler.phase("chunk"):
+        pages = render(_CONTEXT, chunk)
+    return pages, take_stats(), profiler.take()
+
+def _call_chunk(func, chunk):
+    return func(_CONTEXT, chunk)
+
+def add_jobs_argument(parser):
+    parser.add_argument("--jobs", "-j", type=int, default=1,
+                        help="worker processes (1 = serial, 0 = one per CPU)")
+    return parser
+
+def parse_args(description=None, configure=None):
+    parser = add_jobs_argument(argparse.ArgumentParser(description=description))
+    parser.add_argument("--force", action="store_true",
+                        help="rebuild every page, even when the build manifest says it is unchanged")
+    profiler.add_profile_argument(parser)
+    if configure:
+        configure(parser)
+    args = parser.parse_args()
+    profiler.start_from_args(args)
+    return args
+
+def resolve_jobs(jobs):
+    if not jobs or jobs < 0:
+        return os.cpu_count() or 1
+    return jobs
+
+def group_by(items, key):
+    """Split items into chunks sharing the same key, in order of first appearance."""
+    groups = {}
+    for item in items:
+        groups.setdefault(key(item), []).append(item)
+    return list(groups.values())
+
+def last_wins(items, key):
+    """Drop items whose output would be overwritten by a later item, as in a serial run."""
+    last = {}
+    for i, item in enumerate(items):
+        last[key(item)] = i
+    return [item for i, item in enumerate(items) if last[key(item)] == i]
+
+def run_chunks(render, chunks, context, jobs=1, progress=None, every=100):
+    """
+    Call render(context, chunk) for every chunk and return the total page count.
+    render must be a module-level function returning the number of pages it wrote.
+    """
+    jobs = resolve_jobs(jobs)
+    total = 0
+    reported = 0
+
+    def tick(pages):
+        nonlocal total, reported
+        total += pages
+        while progress and total // every > reported:
+            reported += 1
+            print(progress.format(count=reported * every))
+
+    if jobs == 1 or len(chunks) <= 1:
+        for chunk in chunks:
+            with profiler.phase("chunk"):
+                pages = render(context, chunk)
+            tick(pages)
+        return total
+
+    with ProcessPoolExecutor(max_workers=min(jobs, len(chunks)), mp_context=_MP_CONTEXT, initializer=_init_worker,
+                             initargs=(context, profiler.modes())) as pool:
+        futures = [pool.submit(_run_chunk, render, chunk) for chunk in chunks]
+        for future in as_completed(futures):
+            pages, stats, timings = future.result()
+            merge_stats(stats)
+            profiler.merge(timings)
+            tick(pages)
+    return total
+
+def map_chunks(func, chunks, context, jobs=1):
+    """
+    Yield func(context, chunk) for every chunk, in completion order.
+    For read-only passes whose results go back to the parent (see link_checker.py).
+    """
+    jobs = resolve_jobs(jobs)
+    if jobs == 1 or len(chunks) <= 1:
+        for chunk in chunks:
+            yield func(context, chunk)
+        return
+
+    with ProcessPoolExecutor(max_workers=min(jobs, len(chunks)), mp_context=_MP_CONTEXT, initializer=_init_worker, initargs=(context,)) as pool:
+        futures = [pool.submit(_call_chunk, func, chunk) for chunk in chunks]
+        for future in as_completed(futures):
+            yield future.result()
@@ -0,0 +1,215 @@
+import itertools
+import json
+import os
+import re
+import subprocess
+import sys
+import threading
+import time
+from build_manifest import MANIFEST_DIR
+
+# Background build queue for the dashboard.
+# An upload is staged in .build/uploads/ and a job is queued; the HTTP request
+# returns at once with the job id. A single worker thread runs refresh_site.py
+# for one job at a time and turns its output into progress events (stage
+# started/finished, page counts) that the dashboard streams over SSE.
+# Uploads arriving while a job is still queued are merged into it: only the
+# latest CSV is built. Finished jobs are appended to .build/build-history.jsonl.
+
+SOURCE_DIR = os.path.dirname(os.path.abspath(__file__))
+UPLOAD_DIR = os.path.join(MANIFEST_DIR, "uploads")
+HISTORY_PATH = os.path.join(MANIFEST_DIR, "build-history.jsonl")
+VILLES_PATH = os.path.join(SOURCE_DIR, "villes.csv")
+HISTORY_LIMIT = 50
+
+STAGE_START_RE = re.compile(r"🚀 Running (\S+)\.\.\.")
+STAGE_OK_RE = re.compile(r"✅ (\S+) finished successfully\.")
+STAGE_FAILED_RE = re.compile(r"❌ Error in (\S+): (.*)")
+PROGRESS_RE = re.compile(r"(\d+) (?:demo )?(?:pages|files)\b")
+WRITES_RE = re.compile(r"💾 (.+?): (\d+) written")
+
+
+def parse_event(line):
+    """Turn one line of refresh_site.py output into a progress event."""
+    match = STAGE_START_RE.search(line)
+    if match:
+        return {"type": "stage", "stage": match.group(1), "status": "running"}
+    match = STAGE_OK_RE.search(line)
+    if match:
+        return {"type": "stage", "stage": match.group(1), "status": "ok"}
+    match = STAGE_FAILED_RE.search(line)
+    if match:
+        return {"type": "stage", "stage": match.group(1), "status": "failed", "error": match.group(2)}
+    match = WRITES_RE.search(line)
+    if match:
+        return {"type": "writes", "stage": match.group(1), "written": int(match.group(2)), "line": line}
+    match = PROGRESS_RE.search(line)
+    if match and line.startswith(("✅", "Generated", "🏁")):
+        return {"type": "progress", "count": int(match.group(1)), "line": line}
+    return {"type": "log", "line": line}
+
+
+class BuildJob:
+    def __init__(self, job_id, sha1):
+        self.id = job_id
+        self.upload_path = os.path.join(UPLOAD_DIR, f"{job_id}.csv")
+        self.sha1 = sha1
+        self.uploads = 1
+        self.status = "queued"
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.stages = {}
+        self.written = 0
+        self.events = []
+
+    def summary(self):
+        return {
+            "id": self.id,
+            "status": self.status,
+            "sha1": self.sha1,
+            "uploads": self.uploads,
+            "created": self.created,
+            "started": self.started,
+            "finished": self.finished,
+            "seconds": round(self.finished - self.started, 2) if self.finished and self.started else None,
+            "stages": self.stages,
+            "written": self.written,
+        }
+
+
+class BuildQueue:
+    def __init__(self, command=None):
+        self.command = command or [sys.executable, "-u", os.path.join(SOURCE_DIR, "refresh_site.py")]
+        self.jobs = {}
+        self.pending = []
+        self.history = load_history()
+        self._ids = itertools.count(1)
+        self._cond = threading.Condition()
+        self._worker = None
+
+    def start(self):
+        if self._worker is None:
+            self._worker = threading.Thread(target=self._run, name="build-queue", daemon=True)
+            self._worker.start()
+        return self
+
+    def submit(self, upload_path, sha1):
+        """Queue a build of the uploaded CSV; return (job, merged)."""
+        os.makedirs(UPLOAD_DIR, exist_ok=True)
+        with self._cond:
+            if self.pending:
+                # A build is already waiting: the newest CSV replaces the one it would use
+                job = self.pending[-1]
+                os.replace(upload_path, job.upload_path)
+                job.sha1 = sha1
+                job.uploads += 1
+                self._emit(job, {"type": "merged", "uploads": job.uploads, "sha1": sha1})
+                return job, True
+            job = BuildJob(f"{int(time.time())}-{next(self._ids)}", sha1)
+            os.replace(upload_path, job.upload_path)
+            self.jobs[job.id] = job
+            self.pending.append(job)
+            self._emit(job, {"type": "queued"})
+            self._cond.notify_all()
+            return job, False
+
+    def get(self, job_id):
+        return self.jobs.get(job_id)
+
+    def events_since(self, job, index, timeout=15):
+        """Events of job from index on, waiting up to timeout for new ones."""
+        with self._cond:
+            if index >= len(job.events) and job.status in ("queued", "running"):
+                self._cond.wait(timeout)
+            return job.events[index:], job.status
+
+    def _emit(self, job, event):
+        # Called with the condition held
+        event["time"] = round(time.time(), 3)
+        job.events.append(event)
+        self._cond.notify_all()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self.pending:
+                    self._cond.wait()
+                job = self.pending.pop(0)
+                job.status = "running"
+                job.started = time.time()
+                self._emit(job, {"type": "started"})
+            # Whatever goes wrong with one job, it is marked failed and the queue goes on
+            try:
+                status = self._build(job)
+            except Exception as e:
+                with self._cond:
+                    self._emit(job, {"type": "log", "line": f"❌ {e}"})
+                status = "failed"
+            self._finish(job, status)
+
+    def _build(self, job):
+        with self._cond:
+            # The CSV is swapped in only now, never under a running build
+            os.replace(job.upload_path, VILLES_PATH)
+        env = dict(os.environ, PYTHONIOENCODING="utf-8")
+        proc = subprocess.Popen(self.command, cwd=SOURCE_DIR, env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                text=True, encoding="utf-8", errors="replace")
+        for line in proc.stdout:
+            line = line.rstrip("\n")
+            print(f"[{job.id}] {line}")
+            event = parse_event(line)
+            with self._cond:
+                if event["type"] == "stage":
+                    job.stages[event["stage"]] = event["status"]
+                elif event["type"] == "writes":
+                    job.written += event["written"]
+                self._emit(job, event)
+        return "done" if proc.wait() == 0 else "failed"
+
+    def _finish(self, job, status):
+        with self._cond:
+            job.status = status
+            job.finished = time.time()
+            self._emit(job, {"type": "finished", "status": status, "seconds": round(job.finished - job.started, 2)})
+            entry = job.summary()
+            self.history.append(entry)
+            del self.history[:-HISTORY_LIMIT]
+        try:
+            append_history(entry)
+        except OSError as e:
+            print(f"⚠️ Build history not saved: {e}")
+        print(f"{'✅' if status == 'done' else '❌'} Build {job.id} {status} in {entry['seconds']}s.")
+
+    def trend(self):
+        """Durations of recent successful builds with the change against the previous average."""
+        done = [h for h in self.history if h.get("status") == "done" and h.get("seconds")]
+        if not done:
+            return None
+        last = done[-1]
+        previous = [h["seconds"] for h in done[:-1]]
+        average = sum(previous) / len(previous) if previous else None
+        return {
+            "last_seconds": last["seconds"],
+            "previous_average": round(average, 2) if average else None,
+            "change": round(last["seconds"] / average - 1, 3) if average else None,
+            "files_per_second": round(last["written"] / last["seconds"], 1) if last.get("written") else None,
+        }
+
+
+def load_history():
+    if not os.path.exists(HISTORY_PATH):
+        return []
+    history = []
+    with open(HISTORY_PATH, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                history.append(json.loads(line))
+            except ValueError:
+                continue
+    return history[-HISTORY_LIMIT:]
+
+def append_history(entry):
+    os.makedirs(MANIFEST_DIR, exist_ok=True)
+    with open(HISTORY_PATH, "a", encoding="utf-8") as f:
+        f.write(json.dumps(entry, ensure_ascii=False) + "\n")
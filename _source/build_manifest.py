@@ -0,0 +1,96 @@
+import datetime
+import hashlib
+import json
+import os
+
+# Content-hash build manifest used for incremental rebuilds.
+# Each stage keeps a map of output path -> hash of every input that shapes the page.
+# A page is rendered again only when that hash changes or the file is missing.
+# The manifest also keeps the date each page's hash last changed, which the
+# sitemaps use as lastmod, and the pages the stage wrote once but no longer
+# builds ("retired"), which deploy.py --prune deletes.
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+OUTPUT_ROOT = os.path.normpath(os.path.join(BASE_DIR, "../output"))
+MANIFEST_DIR = os.path.join(BASE_DIR, ".build")
+
+def _encode(obj):
+    # City records stand for their CSV row through the digest of its bytes
+    digest = getattr(obj, "digest", None)
+    return digest if digest is not None else str(obj)
+
+def input_hash(*parts):
+    """Stable hash of JSON-serialisable inputs (dicts are hashed with sorted keys)."""
+    payload = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=_encode)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+def output_key(path):
+    return os.path.relpath(os.path.abspath(path), OUTPUT_ROOT).replace(os.sep, "/")
+
+class BuildManifest:
+    def __init__(self, stage, force=False):
+        self.stage = stage
+        self.force = force
+        self.path = os.path.join(MANIFEST_DIR, f"manifest-{stage}.json")
+        self.previous = {}
+        self.previous_lastmod = {}
+        self.previous_retired = []
+        self.entries = {}
+        self.lastmod = {}
+        self.today = datetime.date.today().isoformat()
+        self.skipped = 0
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    saved = json.load(f)
+                self.previous = saved.get("entries", {})
+                self.previous_lastmod = saved.get("lastmod", {})
+                self.previous_retired = saved.get("retired", [])
+            except (OSError, ValueError):
+                print(f"⚠️ Unreadable manifest {self.path}, rebuilding {stage} from scratch.")
+
+    def record(self, path, digest):
+        """Record the page's input hash and the date it last changed; tell whether it is unchanged."""
+        key = output_key(path)
+        self.entries[key] = digest
+        unchanged = self.previous.get(key) == digest
+        self.lastmod[key] = self.previous_lastmod.get(key, self.today) if unchanged else self.today
+        return unchanged
+
+    def needs_build(self, path, digest):
+        """Record the page's input hash and tell whether it must be rendered."""
+        # Recorded even with --force: a forced run must still list every page it owns
+        unchanged = self.record(path, digest)
+        if not self.force and unchanged and os.path.exists(path):
+            self.skipped += 1
+            return False
+        return True
+
+    def save(self):
+        os.makedirs(MANIFEST_DIR, exist_ok=True)
+        # Pages this stage built before and not in this run: only these can be orphans
+        retired = sorted((set(self.previous_retired) | set(self.previous)) - set(self.entries))
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"stage": self.stage, "entries": self.entries, "lastmod": self.lastmod, "retired": retired}, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+        if self.skipped:
+            print(f"♻️ {self.skipped} unchanged pages skipped ({self.stage}).")
+
+def load_lastmods(stage):
+    """{output key: date its inputs last changed} from a stage's saved manifest."""
+    path = os.path.join(MANIFEST_DIR, f"manifest-{stage}.json")
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f).get("lastmod", {})
+    except (OSError, ValueError):
+        return {}
+
+def load_retired(stage):
+    """Output keys a stage built in an earlier run but no longer builds (empty without a manifest)."""
+    path = os.path.join(MANIFEST_DIR, f"manifest-{stage}.json")
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f).get("retired", [])
+    except (OSError, ValueError):
+        return []
@@ -0,0 +1,169 @@
+import csv
+import hashlib
+import io
+import mmap
+import os
+from data_loader import cached_load
+
+# Compact city records for villes.csv.
+# Only the small fields used for grouping and linking are kept in memory.
+# The long text columns (SEO content, FAQ answers...) are parsed on demand
+# from the record's byte range in the memory-mapped CSV, so memory use stays
+# flat as the dataset grows.
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+VILLES_PATH = os.path.join(BASE_DIR, "villes.csv")
+
+SLOT_FIELDS = (
+    "slug", "ville", "departement_nom", "population", "code_insee", "gentile",
+    # Brand URLs drive the demo and niche sitemap links
+    "url_resto_complete", "url_artisan_complete", "url_beaute_complete",
+    "url_immo_complete", "url_avocat_complete", "url_sante_complete",
+)
+
+# Slot value for a column absent from the CSV header (a plain string so that
+# records survive marshal snapshots and pickling to worker processes)
+_MISSING = "\0missing"
+_SOURCES = {}
+
+
+class CitySource:
+    """A memory-mapped villes.csv shared by every City record read from it."""
+
+    def __init__(self, path, size, mtime_ns, header):
+        self.path = path
+        self.size = size
+        self.mtime_ns = mtime_ns
+        self.header = header
+        self.columns = frozenset(header)
+        self._map = None
+
+    def __reduce__(self):
+        # Worker processes re-open the file instead of receiving its bytes
+        return (open_source, (self.path, self.size, self.mtime_ns, self.header))
+
+    def read(self, offset, length):
+        if self._map is None:
+            st = os.stat(self.path)
+            if (st.st_size, st.st_mtime_ns) != (self.size, self.mtime_ns):
+                raise RuntimeError(f"{self.path} changed while cities were being read; restart the build")
+            with open(self.path, "rb") as f:
+                self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if self.size else b""
+        return self._map[offset:offset + length]
+
+
+def open_source(path, size, mtime_ns, header):
+    key = (path, size, mtime_ns)
+    if key not in _SOURCES:
+        _SOURCES[key] = CitySource(path, size, mtime_ns, header)
+    return _SOURCES[key]
+
+
+def parse_record(data):
+    """Parse one CSV record the way csv.DictReader over a text-mode file would."""
+    text = data.decode("utf-8").replace("\r\n", "\n").replace("\r", "\n")
+    return next(csv.reader(io.StringIO(text, newline="")), [])
+
+
+class City:
+    __slots__ = SLOT_FIELDS + ("digest", "_source", "_offset", "_length")
+
+    def __init__(self, source, offset, length, digest, values):
+        self._source = source
+        self._offset = offset
+        self._length = length
+        self.digest = digest
+        for name, value in zip(SLOT_FIELDS, values):
+            setattr(self, name, value)
+
+    def __repr__(self):
+        return f"City({self.slug!r}, {self.ville!r})"
+
+    def row(self):
+        """Full CSV row as a fresh dict (parsed from the mapped file, not cached)."""
+        fields = parse_record(self._source.read(self._offset, self._length))
+        header = self._source.header
+        row = dict(zip(header, fields))
+        if len(fields) > len(header):
+            row[None] = fields[len(header):]
+        elif len(fields) < len(header):
+            for name in header[len(fields):]:
+                row[name] = None
+        return row
+
+    def copy(self):
+        return self.row()
+
+    def get(self, key, default=None):
+        if key in SLOT_FIELDS:
+            value = getattr(self, key)
+            return default if value == _MISSING else value
+        if key not in self._source.columns:
+            return default
+        return self.row().get(key, default)
+
+    def __getitem__(self, key):
+        value = self.get(key, _MISSING)
+        if value == _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key):
+        return key in self._source.columns
+
+    def keys(self):
+        return list(self._source.header)
+
+
+def full_row(v):
+    """Plain dict for a City or an already loaded row."""
+    return v.row() if isinstance(v, City) else v
+
+
+def _iter_records(buf):
+    # A newline ends a record only outside quotes, i.e. after an even number of '"'
+    pos, end_of_file = 0, len(buf)
+    while pos < end_of_file:
+        end = buf.find(b"\n", pos)
+        quotes = buf[pos:end if end != -1 else end_of_file].count(b'"')
+        while quotes % 2 and end != -1:
+            nxt = buf.find(b"\n", end + 1)
+            quotes += buf[end + 1:nxt if nxt != -1 else end_of_file].count(b'"')
+            end = nxt
+        end = end_of_file if end == -1 else end + 1
+        yield pos, end - pos
+        pos = end
+
+
+def build_index(path):
+    """Scan the CSV once: header plus (offset, length, digest, slot values) per row."""
+    header, records = None, []
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return [], []
+        buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            for offset, length in _iter_records(buf):
+                data = buf[offset:offset + length]
+                fields = parse_record(data)
+                if not fields:
+                    continue  # blank line, skipped like DictReader does
+                if header is None:
+                    header = fields
+                    positions = [header.index(name) if name in header else None for name in SLOT_FIELDS]
+                    continue
+                values = tuple(
+                    (fields[i] if i < len(fields) else None) if i is not None else _MISSING
+                    for i in positions
+                )
+                records.append((offset, length, hashlib.sha1(data).hexdigest(), values))
+        finally:
+            buf.close()
+    return header or [], records
+
+
+def load_cities(path=VILLES_PATH):
+    header, records = cached_load(path, "city-index", build_index)
+    st = os.stat(path)
+    source = open_source(path, st.st_size, st.st_mtime_ns, header)
+    return [City(source, offset, length, digest, values) for offset, length, digest, values in records]
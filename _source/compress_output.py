@@ -0,0 +1,89 @@
+import gzip
+import os
+from build_executor import parse_args, run_chunks
+from build_manifest import BuildManifest, input_hash
+from output_writer import delete_file, format_bytes, report_writes, write_file
+from profiler import phase
+
+# Precompressed .gz sidecars for the static output.
+# Every HTML, XML, CSS and JS file gets a gzip copy (zlib level 9) next to it,
+# which server.py / serve_test.py send as-is to clients accepting gzip.
+# A sidecar is rebuilt only when its source size or mtime changed; generators
+# leave unchanged pages untouched (output_writer), so a refresh recompresses
+# only what was rewritten.
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+OUTPUT_DIR = os.path.normpath(os.path.join(BASE_DIR, "../output"))
+COMPRESSIBLE = (".html", ".xml", ".css", ".js")
+CHUNK_SIZE = 200
+
+def gzip_bytes(data):
+    # mtime=0 keeps the archive byte-identical for identical input
+    return gzip.compress(data, compresslevel=9, mtime=0)
+
+def compress_chunk(ctx, paths):
+    for path in paths:
+        with open(path, "rb") as f, phase("gzip"):
+            data = gzip_bytes(f.read())
+        with phase("write"):
+            write_file(path + ".gz", data)
+    return len(paths)
+
+def find_sources(root=OUTPUT_DIR):
+    sources, sidecars = [], []
+    # The numbered sitemap-*.xml.gz files there are outputs of their own (sitemaps.py)
+    sitemap_dir = os.path.join(root, "sitemaps")
+    for dirpath, _, filenames in os.walk(root):
+        for name in filenames:
+            path = os.path.join(dirpath, name)
+            if name.endswith(COMPRESSIBLE):
+                sources.append(path)
+            elif name.endswith(".gz") and name[:-3].endswith(COMPRESSIBLE) and dirpath != sitemap_dir:
+                sidecars.append(path)
+    return sorted(sources), sidecars
+
+def print_ratio_report(sources):
+    totals = {}
+    for path in sources:
+        gz_path = path + ".gz"
+        if not os.path.exists(gz_path):
+            continue
+        ext = os.path.splitext(path)[1]
+        raw, packed, files = totals.get(ext, (0, 0, 0))
+        totals[ext] = (raw + os.path.getsize(path), packed + os.path.getsize(gz_path), files + 1)
+    print("📉 Compression ratios:")
+    all_raw = all_packed = 0
+    for ext, (raw, packed, files) in sorted(totals.items()):
+        all_raw += raw
+        all_packed += packed
+        print(f"   {ext:<6} {files:>6} files {format_bytes(raw):>10} -> {format_bytes(packed):>10}  ({packed / raw if raw else 0:.1%})")
+    if all_raw:
+        print(f"   {'total':<6} {'':>12} {format_bytes(all_raw):>10} -> {format_bytes(all_packed):>10}  ({all_packed / all_raw:.1%})")
+
+def compress_output(jobs=1, force=False, root=OUTPUT_DIR):
+    print("🗜️ Compressing static output...")
+    sources, sidecars = find_sources(root)
+
+    manifest = BuildManifest("gzip", force=force)
+    todo = []
+    for path in sources:
+        st = os.stat(path)
+        if manifest.needs_build(path + ".gz", input_hash(st.st_size, st.st_mtime_ns)):
+            todo.append(path)
+
+    # Sidecars whose page no longer exists
+    for gz_path in sidecars:
+        if not os.path.exists(gz_path[:-3]):
+            delete_file(gz_path)
+
+    chunks = [todo[i:i + CHUNK_SIZE] for i in range(0, len(todo), CHUNK_SIZE)]
+    count = run_chunks(compress_chunk, chunks, {}, jobs=jobs, progress="✅ {count} files compressed...", every=1000)
+    manifest.save()
+
+    report_writes("gzip")
+    print_ratio_report(sources)
+    print(f"🏁 Compression complete! {count} files recompressed.")
+
+if __name__ == "__main__":
+    args = parse_args("Write .gz sidecars next to the generated pages")
+    compress_output(jobs=args.jobs, force=args.force)
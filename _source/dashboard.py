@@ -1,14 +1,18 @@
 import http.server
-import socketserver
+import json
 import os
-import subprocess
-import sys
-from email.message import Message
-import io
+import re
+import time
+from build_jobs import BuildQueue
+from multipart_stream import MultipartError, UploadTooLarge, parse_boundary, read_upload
+from preview import SitePreview
 
 # Agence Web Locale - Dashboard (Python 3.13+ Compatible, No-dependency)
 PORT = 8080
 SOURCE_DIR = os.path.dirname(os.path.abspath(__file__))
+MAX_UPLOAD_MB = 512
+JOBS = BuildQueue()
+PREVIEW = SitePreview()
 
 UPLOAD_PAGE = """
 <!DOCTYPE html>
@@ -57,61 +61,188 @@ UPLOAD_PAGE = """
 </html>
 """
 
+JOB_PAGE = """
+<!DOCTYPE html>
+<html lang="fr">
+<head>
+    <meta charset="UTF-8">
+    <title>Build {job_id}</title>
+    <style>
+        body { font-family: 'Inter', sans-serif; background: #f8f5f2; color: #2c3e50; max-width: 800px; margin: 40px auto; }
+        #status { font-weight: 700; }
+        pre { background: white; padding: 16px; border-radius: 12px; height: 60vh; overflow: auto; font-size: 0.8rem; }
+    </style>
+</head>
+<body>
+    <h1 style='color:green'>Fichier recu !</h1>
+    <p>{message} Job <code>{job_id}</code> : <span id="status">en attente</span> <span id="count"></span></p>
+    <pre id="log"></pre>
+    <script>
+        const log = document.getElementById('log');
+        const source = new EventSource('/jobs/{job_id}/events');
+        source.onmessage = (e) => {
+            const event = JSON.parse(e.data);
+            if (event.line) { log.textContent += event.line + "\\n"; log.scrollTop = log.scrollHeight; }
+            if (event.type === 'stage') document.getElementById('status').innerText = event.stage + ' : ' + event.status;
+            if (event.type === 'progress') document.getElementById('count').innerText = '(' + event.count + ')';
+            if (event.type === 'finished') {
+                document.getElementById('status').innerText = event.status === 'done' ? 'termine en ' + event.seconds + ' s' : 'echec';
+                source.close();
+            }
+        };
+    </script>
+</body>
+</html>
+"""
+
+JOB_EVENTS_RE = re.compile(r"^/jobs/([\w-]+)/events$")
+JOB_RE = re.compile(r"^/jobs/([\w-]+)$")
+PREVIEW_DEMO_RE = re.compile(r"^/preview/demo/([\w-]+)/([\w-]+)/?$")
+PREVIEW_CITY_RE = re.compile(r"^/preview/([\w-]+)/(?:creation-site-internet-)?([\w-]+?)(?:\.html)?$")
+
 class DashboardHandler(http.server.SimpleHTTPRequestHandler):
     def do_GET(self):
-        if self.path == '/':
+        path = self.path.split('?', 1)[0]
+        if path == '/':
             self.send_response(200)
             self.send_header('Content-type', 'text/html')
             self.end_headers()
             self.wfile.write(UPLOAD_PAGE.encode('utf-8'))
+        elif path == '/jobs':
+            jobs = sorted(JOBS.jobs.values(), key=lambda j: j.created, reverse=True)
+            self.send_json({"jobs": [j.summary() for j in jobs], "history": JOBS.history, "trend": JOBS.trend()})
+        elif JOB_RE.match(path):
+            job = JOBS.get(JOB_RE.match(path).group(1))
+            if job:
+                self.send_json(job.summary())
+            else:
+                self.send_error(404, "Job inconnu.")
+        elif JOB_EVENTS_RE.match(path):
+            self.stream_events(JOB_EVENTS_RE.match(path).group(1))
+        elif PREVIEW_DEMO_RE.match(path):
+            self.send_preview(PREVIEW.demo_page, *PREVIEW_DEMO_RE.match(path).groups())
+        elif PREVIEW_CITY_RE.match(path):
+            self.send_preview(PREVIEW.city_page, *PREVIEW_CITY_RE.match(path).groups())
         else:
             super().do_GET()
 
+    def send_json(self, data, status=200):
+        body = json.dumps(data, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_preview(self, render, *route):
+        """Render one page in memory (nothing is written to output/)."""
+        started = time.perf_counter()
+        page = render(*route)
+        if page is None:
+            self.send_error(404, "Page inconnue.")
+            return
+        html, cached = page
+        body = html.encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Cache-Control', 'no-store')
+        self.send_header('X-Preview-Cache', 'hit' if cached else 'miss')
+        self.send_header('X-Render-Ms', f"{(time.perf_counter() - started) * 1000:.1f}")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def stream_events(self, job_id):
+        """Server-Sent Events: every progress event of the job, then the stream ends."""
+        job = JOBS.get(job_id)
+        if not job:
+            self.send_error(404, "Job inconnu.")
+            return
+        # A malformed or negative Last-Event-ID replays the stream from the start
+        try:
+            last_id = int(self.headers.get('Last-Event-ID') or -1)
+        except ValueError:
+            last_id = -1
+        index = max(last_id, -1) + 1
+        self.send_response(200)
+        self.send_header('Content-type', 'text/event-stream; charset=utf-8')
+        self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+        try:
+            while True:
+                events, status = JOBS.events_since(job, index)
+                for event in events:
+                    self.wfile.write(f"id: {index}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n".encode('utf-8'))
+                    index += 1
+                if not events:
+                    if status not in ("queued", "running"):
+                        break
+                    self.wfile.write(b": keep-alive\n\n")
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
     def do_POST(self):
         if self.path == '/upload':
             try:
-                content_type = self.headers.get('Content-Type')
-                if not content_type or 'multipart/form-data' not in content_type:
-                    self.send_error(400, "Bad Request: Content-Type must be multipart/form-data")
+                try:
+                    boundary = parse_boundary(self.headers.get('Content-Type'))
+                except MultipartError as e:
+                    self.send_error(400, f"Bad Request: {e}")
+                    return
+                if self.headers.get('Content-Length') is None:
+                    self.send_error(411, "Content-Length requis.")
                     return
-
-                boundary = content_type.split("boundary=")[1].encode()
                 content_length = int(self.headers.get('Content-Length'))
-                body = self.rfile.read(content_length)
+                max_bytes = MAX_UPLOAD_MB * 1024 * 1024
+                # Form fields and part headers come on top of the file itself
+                if content_length > max_bytes + 64 * 1024:
+                    self.send_error(413, f"Fichier trop volumineux (max {MAX_UPLOAD_MB} Mo).")
+                    return
 
-                # Split parts by boundary
-                parts = body.split(b'--' + boundary)
-                file_content = None
-                
-                for part in parts:
-                    if b'filename=' in part:
-                        # Extract headers and body of the part
-                        header_end = part.find(b'\r\n\r\n')
-                        if header_end != -1:
-                            file_content = part[header_end+4:].rstrip(b'\r\n--')
-                            break
+                # The file part is streamed to a temporary file next to villes.csv
+                try:
+                    upload = read_upload(self.rfile, content_length, boundary, SOURCE_DIR, max_bytes=max_bytes)
+                except UploadTooLarge:
+                    self.close_connection = True
+                    self.send_error(413, f"Fichier trop volumineux (max {MAX_UPLOAD_MB} Mo).")
+                    return
+                except MultipartError as e:
+                    self.close_connection = True
+                    self.send_error(400, f"Bad Request: {e}")
+                    return
 
-                if file_content:
-                    upload_path = os.path.join(SOURCE_DIR, "villes.csv")
-                    with open(upload_path, 'wb') as f:
-                        f.write(file_content)
-                    print(f"✅ CSV enregistré avec succès.")
+                if upload and upload.size:
+                    os.chmod(upload.path, 0o644)
+                    print(f"✅ CSV recu ({upload.size} octets, sha1 {upload.sha1[:12]}).")
 
-                    # Run the full SEO refresh workflow
-                    subprocess.run([sys.executable, os.path.join(SOURCE_DIR, "refresh_site.py")], check=True)
-                    
-                    self.send_response(200)
-                    self.send_header('Content-type', 'text/html')
+                    # The build runs in the background; the upload returns at once
+                    job, merged = JOBS.submit(upload.path, upload.sha1)
+                    message = "Fusionne avec le build deja en attente." if merged else "Build mis en file d'attente."
+                    if 'application/json' in (self.headers.get('Accept') or ''):
+                        self.send_json({"job": job.id, "merged": merged, "events": f"/jobs/{job.id}/events"}, status=202)
+                        return
+                    body = JOB_PAGE.replace("{job_id}", job.id).replace("{message}", message).encode('utf-8')
+                    self.send_response(202)
+                    self.send_header('Content-type', 'text/html; charset=utf-8')
+                    self.send_header('Content-Length', str(len(body)))
+                    self.send_header('Location', f"/jobs/{job.id}")
                     self.end_headers()
-                    self.wfile.write(b"<html><body><h1 style='color:green'>Fichier recu !</h1><p>Analyse en cours... revenez sur le chat Gemini.</p></body></html>")
+                    self.wfile.write(body)
                 else:
+                    if upload:
+                        os.remove(upload.path)
                     self.send_error(400, "Aucun fichier trouve dans le formulaire.")
 
             except Exception as e:
                 self.send_error(500, f"Erreur serveur: {str(e)}")
 
+class DashboardServer(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+
 if __name__ == "__main__":
-    with socketserver.TCPServer(("", PORT), DashboardHandler) as httpd:
+    JOBS.start()
+    with DashboardServer(("", PORT), DashboardHandler) as httpd:
         print(f"🎉 Dashboard lance sur http://localhost:{PORT}")
         try:
             httpd.serve_forever()
@@ -0,0 +1,105 @@
+import csv
+import hashlib
+import json
+import marshal
+import os
+import sys
+
+# Shared loader for the generators' source data.
+# Parsed data is kept in a binary snapshot next to the source file
+# (villes.csv -> villes.csv.snapshot). The snapshot is reused while the
+# source is unchanged, so generator startup no longer re-parses text.
+
+SNAPSHOT_SUFFIX = ".snapshot"
+SNAPSHOT_VERSION = 1
+
+def file_digest(path):
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+def snapshot_path_for(path, kind):
+    # villes.csv -> villes.csv.snapshot; other views of the same file get their own name
+    if path.endswith("." + kind):
+        return path + SNAPSHOT_SUFFIX
+    return f"{path}.{kind}{SNAPSHOT_SUFFIX}"
+
+def _source_meta(path, kind, digest=None):
+    st = os.stat(path)
+    return {
+        "version": SNAPSHOT_VERSION,
+        "python": sys.version_info[:2],
+        "kind": kind,
+        "mtime_ns": st.st_mtime_ns,
+        "size": st.st_size,
+        "sha1": digest if digest is not None else file_digest(path),
+    }
+
+def _read_snapshot(path, kind):
+    """Return the cached data, or None when the snapshot is missing or stale."""
+    snapshot_path = snapshot_path_for(path, kind)
+    if not os.path.exists(snapshot_path):
+        return None, None
+    try:
+        with open(snapshot_path, "rb") as f:
+            # Layout: 4-byte header length, marshalled metadata, marshalled data
+            meta = marshal.loads(f.read(int.from_bytes(f.read(4), "little")))
+            st = os.stat(path)
+            if (meta.get("version") != SNAPSHOT_VERSION or tuple(meta.get("python", ())) != sys.version_info[:2]
+                    or meta.get("kind") != kind or meta.get("size") != st.st_size):
+                return None, None
+            digest = None
+            if meta.get("mtime_ns") != st.st_mtime_ns:
+                # Touched (e.g. the same CSV uploaded again): compare contents
+                digest = file_digest(path)
+                if digest != meta.get("sha1"):
+                    return None, digest
+            # marshal.load() on a file object reads in tiny steps; loads() on the bytes is much faster
+            return marshal.loads(f.read()), digest
+    except (OSError, EOFError, ValueError, TypeError, AttributeError):
+        return None, None
+
+def _write_snapshot(path, kind, data, digest=None):
+    snapshot_path = snapshot_path_for(path, kind)
+    tmp_path = snapshot_path + ".tmp"
+    try:
+        meta = _source_meta(path, kind, digest)
+        header = marshal.dumps(meta)
+        with open(tmp_path, "wb") as f:
+            f.write(len(header).to_bytes(4, "little"))
+            f.write(header)
+            f.write(marshal.dumps(data))
+        os.replace(tmp_path, snapshot_path)
+    except (OSError, ValueError) as e:
+        print(f"⚠️ Could not write snapshot {snapshot_path}: {e}")
+
+def cached_load(path, kind, parse, use_snapshot=True):
+    """Load path with parse(path), going through its binary snapshot when possible."""
+    if not use_snapshot:
+        return parse(path)
+    data, digest = _read_snapshot(path, kind)
+    if data is None:
+        data = parse(path)
+        _write_snapshot(path, kind, data, digest)
+    elif digest is not None:
+        # Same content under a new mtime: refresh the metadata for the fast path
+        _write_snapshot(path, kind, data, digest)
+    return data
+
+def parse_csv(path):
+    # Long SEO text columns exceed the csv module's default field limit
+    csv.field_size_limit(1000000)
+    with open(path, mode='r', encoding='utf-8') as f:
+        return list(csv.DictReader(f))
+
+def parse_json(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def load_csv(path, use_snapshot=True):
+    return cached_load(path, "csv", parse_csv, use_snapshot)
+
+def load_json(path, use_snapshot=True):
+    return cached_load(path, "json", parse_json, use_snapshot)
@@ -0,0 +1,159 @@
+import gzip
+import http.server
+import json
+import os
+import threading
+import time
+import generate_demos
+from build_executor import add_jobs_argument
+from city_records import full_row, load_cities
+from page_stats import DEFAULT_MODE, add_stats_argument
+from sitemaps import NICHE_DOMAINS
+from static_server import DEFAULT_CACHE_MB, ByteCache, CacheEntry, accepts_gzip, clean_path, parse_server_args
+
+# Render-on-demand server for the niche demos, instead of 5,820 files in output/demos.
+# Only the six parsed demos/*.html templates and a (niche, brand slug) -> task
+# index live in memory; the cities are the compact records of city_records.
+# A demo is rendered on request with generate_demos.render_demo, the code the
+# static build uses, so its bytes match output/demos/{niche}/{brand}/index.html.
+# Rendered pages (and their gzip) are kept in an LRU bounded in MB. The ETag is
+# the page's input hash, so a revalidation is answered without rendering.
+# Demos answer at https://{brand}.{niche domain}/ (Host header, as the worker
+# routes them) and at /demos/{niche}/{brand}/ (the static layout).
+# --export writes the full static tree with generate_demos.py instead.
+# Usage: python demo_server.py [--port 8090] [--cache-mb 32]
+#        python demo_server.py --export [-j 0]
+
+PORT = 8090
+DOMAIN_NICHES = {domain: niche for niche, domain in NICHE_DOMAINS.items()}
+
+
+class DemoSite:
+    """Templates, brand index and page cache of the demo server."""
+
+    def __init__(self, cache_mb=DEFAULT_CACHE_MB, quiet=False, stats_mode=DEFAULT_MODE):
+        with open(os.path.join(generate_demos.BASE_DIR, "departements.json"), "r", encoding="utf-8") as f:
+            depts_data = json.load(f)
+        villes = load_cities(generate_demos.VILLES_PATH)
+        self.templates = generate_demos.load_demo_templates()
+        # A later city with the same brand slug wins, as in a build
+        self.tasks = {(t[1], t[3]): t for t in generate_demos.demo_tasks(villes, self.templates, {d["nom"]: d["slug"] for d in depts_data})}
+        self.cache = ByteCache(int(cache_mb * 1024 * 1024))
+        self.quiet = quiet
+        self.stats_mode = stats_mode
+        self.rendered = 0
+        self._count_lock = threading.Lock()
+
+    def etag(self, task):
+        return f'"{generate_demos.demo_digest(task, self.templates[task[1]], self.stats_mode)[:20]}"'
+
+    def page(self, task, etag, gzipped=False):
+        """Bytes of a demo (gzip-compressed if asked), from the cache or freshly rendered."""
+        key = etag + (".gz" if gzipped else "")
+        entry = self.cache.get(key)
+        if entry is not None:
+            return entry.body
+        if gzipped:
+            body = gzip.compress(self.page(task, etag), compresslevel=6, mtime=0)
+        else:
+            row, niche, brand_name, _, dept_slug = task
+            fields = generate_demos.demo_stats([task], self.stats_mode)[(generate_demos.demo_seed(row, niche), niche)]
+            body = generate_demos.render_demo(self.templates[niche], full_row(row), niche, brand_name, dept_slug, fields).encode("utf-8")
+            with self._count_lock:
+                self.rendered += 1
+        self.cache.put(key, CacheEntry(body, None))
+        return body
+
+    def find(self, host, path):
+        """The demo task a request asks for, or None."""
+        host = (host or "").split(":")[0].lower()
+        brand, _, domain = host.partition(".")
+        if domain in DOMAIN_NICHES and path in ("/", "/index.html"):
+            return self.tasks.get((DOMAIN_NICHES[domain], brand))
+        parts = path.strip("/").split("/")
+        if len(parts) in (3, 4) and parts[0] == "demos" and parts[3:] in ([], ["index.html"]):
+            return self.tasks.get((parts[1], parts[2]))
+        return None
+
+
+class DemoHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "AgenceWebLocale/1.0"
+    # Headers and body go out in two writes: without TCP_NODELAY a keep-alive
+    # client waits ~40 ms (delayed ACK) for the body
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        self.serve(send_body=True)
+
+    def do_HEAD(self):
+        self.serve(send_body=False)
+
+    def serve(self, send_body):
+        site = self.server.site
+        path = clean_path(self.path)
+        task = site.find(self.headers.get("Host"), path) if path else None
+        if task is None:
+            self.send_error(404, "Demo not found")
+            return
+
+        gzipped = accepts_gzip(self.headers.get("Accept-Encoding"))
+        etag = site.etag(task)
+        sent_etag = etag[:-1] + '-gz"' if gzipped else etag
+        if_none_match = self.headers.get("If-None-Match")
+        if if_none_match and sent_etag in [t.strip().removeprefix("W/") for t in if_none_match.split(",")]:
+            self.send_response(304)
+            self.send_header("ETag", sent_etag)
+            self.send_header("Vary", "Accept-Encoding")
+            self.end_headers()
+            return
+
+        body = site.page(task, etag, gzipped)
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        if gzipped:
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("ETag", sent_etag)
+        self.send_header("Vary", "Accept-Encoding")
+        self.end_headers()
+        if send_body:
+            self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        if not self.server.site.quiet:
+            super().log_message(format, *args)
+
+
+class DemoServer(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, site):
+        self.site = site
+        super().__init__(address, DemoHandler)
+
+
+def configure(parser):
+    add_jobs_argument(parser)
+    add_stats_argument(parser)
+    parser.add_argument("--export", action="store_true", help="write the full static tree to output/demos (generate_demos.py) and exit")
+    parser.add_argument("--force", action="store_true", help="with --export, rebuild every demo")
+
+
+if __name__ == "__main__":
+    args = parse_server_args(PORT, "Render the niche demos on request", configure=configure)
+    if args.export:
+        generate_demos.generate_demos(jobs=args.jobs, force=args.force, stats_mode=args.stats)
+        raise SystemExit(0)
+
+    started = time.perf_counter()
+    site = DemoSite(cache_mb=args.cache_mb, quiet=args.quiet, stats_mode=args.stats)
+    with DemoServer(("", args.port), site) as httpd:
+        print(f"🎨 Serving {len(site.tasks)} demos at http://localhost:{args.port}/demos/{{niche}}/{{brand}}/ "
+              f"(loaded in {time.perf_counter() - started:.2f}s, {args.cache_mb:g} MB cache)")
+        try:
+            httpd.serve_forever()
+        except KeyboardInterrupt:
+            cache = site.cache
+            print(f"\n👋 Server stopped: {site.rendered} renders, {cache.hits} cache hits, {cache.misses} misses, "
+                  f"{cache.size / 1e6:.1f} MB cached.")
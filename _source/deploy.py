@@ -0,0 +1,224 @@
+import argparse
+import hashlib
+import json
+import os
+import re
+import shutil
+import time
+from build_executor import add_jobs_argument, map_chunks
+from build_manifest import MANIFEST_DIR, OUTPUT_ROOT, load_retired
+from output_writer import delete_file, format_bytes, report_writes
+
+# Deploy manifest and delta deploy of output/.
+# The manifest maps every file under output/ to its SHA-1 and size. It is
+# kept in .build/deploy-manifest.json, and each run prints what was added,
+# changed or removed since the previous one. Files whose size and mtime did
+# not change keep their previous hash, so a refresh only reads what the
+# generators rewrote.
+# Orphans are pages (and their .gz sidecars) a generator wrote in an earlier
+# run and no longer builds: cities removed from villes.csv, renamed demo
+# brands... Each stage manifest records them as "retired", so a file no
+# generator ever wrote (the departement-*/region-* hubs) is never one.
+# --prune deletes them before the scan.
+# --target DIR deploys by digest to a directory standing in for the host. It
+# copies only the files whose hash differs from DIR/.deploy-manifest.json and
+# deletes the files the site no longer has.
+# Usage: python deploy.py [--prune] [--target DIR] [--dry-run] [-j 0]
+
+MANIFEST_PATH = os.path.join(MANIFEST_DIR, "deploy-manifest.json")
+TARGET_DIR = os.path.join(MANIFEST_DIR, "deploy-target")
+TARGET_MANIFEST = ".deploy-manifest.json"
+CHUNK_SIZE = 500
+BLOCK_SIZE = 1 << 20
+
+# Stages whose retired pages are pruned
+PAGE_STAGES = ("villes", "departements", "demos", "site")
+# Hand-made hubs the worker still serves: never pruned, whatever a manifest says
+PROTECTED = re.compile(r"^(?:departement|region)-[^/]*\.html$")
+
+
+def hash_file(path):
+    sha1 = hashlib.sha1()
+    with open(path, "rb") as f:
+        while True:
+            block = f.read(BLOCK_SIZE)
+            if not block:
+                return sha1.hexdigest()
+            sha1.update(block)
+
+
+def hash_chunk(ctx, items):
+    return [(key, hash_file(os.path.join(ctx["root"], key))) for key in items]
+
+
+def list_files(root):
+    """{key: os.stat_result} of every file under root, keys relative with / separators."""
+    files = {}
+    for dirpath, _, filenames in os.walk(root):
+        rel_dir = os.path.relpath(dirpath, root).replace(os.sep, "/")
+        for name in filenames:
+            # write_file's temporary files and a target's own manifest are not part of the site
+            if name.endswith(".tmp") or name == TARGET_MANIFEST:
+                continue
+            key = name if rel_dir == "." else f"{rel_dir}/{name}"
+            files[key] = os.stat(os.path.join(dirpath, name))
+    return files
+
+
+def scan(root=OUTPUT_ROOT, previous=None, jobs=1):
+    """{key: {"sha1", "size", "mtime_ns"}} of every file under root."""
+    previous = previous or {}
+    entries, todo = {}, []
+    for key, st in list_files(root).items():
+        old = previous.get(key)
+        if old and old["size"] == st.st_size and old.get("mtime_ns") == st.st_mtime_ns:
+            entries[key] = old
+        else:
+            entries[key] = {"sha1": None, "size": st.st_size, "mtime_ns": st.st_mtime_ns}
+            todo.append(key)
+    chunks = [todo[i:i + CHUNK_SIZE] for i in range(0, len(todo), CHUNK_SIZE)]
+    for results in map_chunks(hash_chunk, chunks, {"root": root}, jobs=jobs):
+        for key, sha1 in results:
+            entries[key]["sha1"] = sha1
+    return dict(sorted(entries.items())), len(todo)
+
+
+def diff(old, new):
+    """(added, changed, removed) keys between two manifests, compared by SHA-1."""
+    added = [key for key in new if key not in old]
+    changed = [key for key in new if key in old and old[key]["sha1"] != new[key]["sha1"]]
+    removed = [key for key in old if key not in new]
+    return added, changed, removed
+
+
+def print_diff(label, changes, new, old, limit=5):
+    added, changed, removed = changes
+    print(f"📊 {label}: {len(added)} added ({format_bytes(sum(new[k]['size'] for k in added))}), "
+          f"{len(changed)} changed ({format_bytes(sum(new[k]['size'] for k in changed))}), "
+          f"{len(removed)} removed ({format_bytes(sum(old[k]['size'] for k in removed))})")
+    for sign, keys in (("+", added), ("~", changed), ("-", removed)):
+        for key in keys[:limit]:
+            print(f"   {sign} {key}")
+        if len(keys) > limit:
+            print(f"   {sign} ... {len(keys) - limit} more")
+
+
+def find_orphans(root=OUTPUT_ROOT, files=None):
+    """Pages and sidecars under root that a stage built once and no longer builds."""
+    files = files if files is not None else list_files(root)
+    retired = set()
+    for stage in PAGE_STAGES:
+        retired.update(load_retired(stage))
+    orphans = []
+    for key in files:
+        page = key[:-3] if key.endswith(".gz") else key
+        if page in retired and not PROTECTED.match(page):
+            orphans.append(key)
+    return sorted(orphans)
+
+
+def remove_empty_dirs(root, keys):
+    for directory in sorted({os.path.dirname(key) for key in keys}, key=len, reverse=True):
+        while directory:
+            path = os.path.join(root, directory)
+            if not os.path.isdir(path) or os.listdir(path):
+                break
+            os.rmdir(path)
+            directory = os.path.dirname(directory)
+
+
+def prune(orphans, root=OUTPUT_ROOT):
+    for key in orphans:
+        delete_file(os.path.join(root, key))
+    remove_empty_dirs(root, orphans)
+    report_writes("prune")
+
+
+def load_manifest(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f).get("files", {})
+    except (OSError, ValueError):
+        return {}
+
+
+def save_manifest(path, files, keep=("sha1", "size", "mtime_ns")):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"generated": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+                   "files": {key: {k: entry[k] for k in keep} for key, entry in files.items()}}, f, indent=0)
+    os.replace(tmp_path, path)
+
+
+def update_manifest(root=OUTPUT_ROOT, jobs=1, prune_orphans=False):
+    """Rescan root, print what changed since the last manifest and save the new one."""
+    print("🧾 Updating deploy manifest...")
+    previous = load_manifest(MANIFEST_PATH)
+    orphans = find_orphans(root)
+    if orphans and prune_orphans:
+        print(f"🧹 Deleting {len(orphans)} orphaned file(s)...")
+        prune(orphans, root)
+    elif orphans:
+        print(f"🧹 {len(orphans)} orphaned file(s), e.g. {', '.join(orphans[:3])} (--prune deletes them)")
+
+    started = time.perf_counter()
+    files, hashed = scan(root, previous, jobs=jobs)
+    print(f"🔎 {len(files)} files, {hashed} hashed in {time.perf_counter() - started:.2f}s")
+    print_diff("Since the last build", diff(previous, files), files, previous)
+    save_manifest(MANIFEST_PATH, files)
+    return files
+
+
+def upload(root, target, key):
+    """Copy one file to the stand-in host; the seam for a real upload client."""
+    dest = os.path.join(target, key)
+    os.makedirs(os.path.dirname(dest), exist_ok=True)
+    tmp_path = dest + ".tmp"
+    shutil.copyfile(os.path.join(root, key), tmp_path)
+    os.replace(tmp_path, dest)
+
+
+def remove(target, key):
+    try:
+        os.remove(os.path.join(target, key))
+    except FileNotFoundError:
+        pass
+
+
+def deploy(files, root=OUTPUT_ROOT, target=TARGET_DIR, dry_run=False):
+    """Upload the files whose digest the target lacks and delete the ones the site dropped."""
+    manifest_path = os.path.join(target, TARGET_MANIFEST)
+    deployed = load_manifest(manifest_path)
+    added, changed, removed = changes = diff(deployed, files)
+    print_diff(f"Delta for {target}", changes, files, deployed)
+    if dry_run:
+        print("🧪 Dry run: nothing uploaded.")
+        return changes
+
+    started = time.perf_counter()
+    for key in added + changed:
+        upload(root, target, key)
+    for key in removed:
+        remove(target, key)
+    remove_empty_dirs(target, removed)
+    # Written last: an interrupted deploy is simply resumed by the next one
+    save_manifest(manifest_path, files, keep=("sha1", "size"))
+    uploaded = sum(files[key]["size"] for key in added + changed)
+    print(f"🚀 Deployed {len(added) + len(changed)} file(s) ({format_bytes(uploaded)}), "
+          f"deleted {len(removed)} in {time.perf_counter() - started:.2f}s")
+    return changes
+
+
+if __name__ == "__main__":
+    parser = add_jobs_argument(argparse.ArgumentParser(description="Deploy manifest, stale page pruning and delta deploy of output/"))
+    parser.add_argument("--prune", action="store_true", help="delete generated pages no stage manifest lists any more")
+    parser.add_argument("--target", nargs="?", const=TARGET_DIR,
+                        help=f"deploy the delta to this directory (default: {os.path.relpath(TARGET_DIR)})")
+    parser.add_argument("--dry-run", action="store_true", help="show the delta without uploading")
+    args = parser.parse_args()
+
+    files = update_manifest(jobs=args.jobs, prune_orphans=args.prune)
+    if args.target:
+        deploy(files, target=args.target, dry_run=args.dry_run)
+    print("🏁 Deploy manifest complete.")
@@ -1,9 +1,17 @@
-import csv
 import os
 import time
 import json
-import random
 from datetime import datetime
+from template_engine import load_template
+from build_executor import group_by, last_wins, parse_args, run_chunks
+from build_manifest import BuildManifest, input_hash
+from city_records import load_cities
+from live_fields import add_live_fields_argument, live_span, page_fields, script_tag, site_fields, write_live_fields
+from neighbour_index import load_neighbour_index
+from output_writer import report_writes, write_file
+from page_stats import DEFAULT_MODE, add_stats_argument, city_stats
+from page_urls import city_page_url, slugify
+from profiler import phase
 
 # CONFIGURATION
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -26,37 +34,32 @@ FEMALE_NAMES = {
     "rose", "victoire", "agathe", "adèle", "clémence", "margaux", "marion", "elsa"
 }
 
-FRENCH_MONTHS = {
-    1: "janvier", 2: "février", 3: "mars", 4: "avril", 5: "mai", 6: "juin",
-    7: "juillet", 8: "août", 9: "septembre", 10: "octobre", 11: "novembre", 12: "décembre"
+# Keys computed per page on top of the CSV columns
+GENERATED_KEYS = {
+    "accroche_hero", "sous_titre_hero", "description_p1", "description_p2",
+    "url_resto", "url_artisan", "url_beaute", "url_immo", "url_avocat", "url_sante",
+    "schema_json_ld", "villes_proches_html", "nb_sites_realises", "nb_avis", "note_google",
+    "delai_jours", "mois_actuel", "annee_actuelle", "dernier_site_mois", "avatar_url",
+    "temoignage_prenom", "temoignage_metier", "places_restantes", "prix_vitrine_mensuel",
+    "prix_vitrine_plus_mensuel", "prix_creation", "url_page", "slug_departement",
+    "maillage_footer_france", "year", "h1_page", "meta_title", "meta_description",
+    "faq_6_question", "faq_6_reponse", "faq_7_question", "faq_7_reponse",
+    "faq_8_question", "faq_8_reponse", "faq_9_question", "faq_9_reponse",
+    "faq_10_question", "faq_10_reponse", "live_fields_script"
 }
 
-def slugify(text):
-    text = str(text).lower().strip()
-    replacements = [
-        (" ", "-"), ("'", "-"), ("à", "a"), ("â", "a"), ("ä", "a"),
-        ("é", "e"), ("è", "e"), ("ê", "e"), ("ë", "e"),
-        ("î", "i"), ("ï", "i"), ("ô", "o"), ("ö", "o"),
-        ("ù", "u"), ("û", "u"), ("ü", "u"), ("ç", "c"),
-        ("œ", "oe"), ("æ", "ae")
-    ]
-    for old, new in replacements:
-        text = text.replace(old, new)
-    return text
+# Fields that change with the date (see live_fields.py)
+LIVE_KEYS = ("mois_actuel", "annee_actuelle", "dernier_site_mois", "year", "places_restantes")
+# Pseudo-random fields that stay put (see page_stats.py)
+STAT_KEYS = ("nb_sites_realises", "nb_avis", "note_google", "delai_jours")
 
 def is_female_name(name):
     if not name: return False
     return name.lower().strip() in FEMALE_NAMES
 
 def load_data():
-    villes = []
-    if not os.path.exists(VILLES_PATH): return villes
-    csv.field_size_limit(1000000)
-    with open(VILLES_PATH, mode='r', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            villes.append(row)
-    return villes
+    if not os.path.exists(VILLES_PATH): return []
+    return load_cities(VILLES_PATH)
 
 def normalize_row(row):
     normalized = row.copy()
@@ -83,12 +86,13 @@ def normalize_row(row):
         
     return normalized
 
-def generate_maillage_footer():
+def generate_maillage_footer(depts=None):
     try:
-        with open(DEPARTEMENTS_PATH, "r", encoding="utf-8") as f:
-            depts = json.load(f)
-            links = [f'<a href="/departement/{d["slug"]}">{d["nom"]}</a>' for d in depts]
-            return " ".join(links)
+        if depts is None:
+            with open(DEPARTEMENTS_PATH, "r", encoding="utf-8") as f:
+                depts = json.load(f)
+        links = [f'<a href="/departement/{d["slug"]}">{d["nom"]}</a>' for d in depts]
+        return " ".join(links)
     except: return ""
 
 def generate_schema(v, dept_slug, current_url):
@@ -128,121 +132,167 @@ def generate_schema(v, dept_slug, current_url):
     return f"""<script type="application/ld+json">{json.dumps(local_business, ensure_ascii=False)}</script>
 <script type="application/ld+json">{json.dumps(breadcrumb_schema, ensure_ascii=False)}</script>"""
 
-def generate_site():
+def render_city_html(ctx, v, neighbours):
+    # normalize_row already returns a fresh dict (City records parse their long fields here)
+    with phase("normalize"):
+        replacements = v_normalized = normalize_row(v)
+    dept_nom = v_normalized.get("departement_nom", "")
+    dept_slug = ctx["dept_name_to_slug"].get(dept_nom, slugify(dept_nom))
+    page_url = f"/{dept_slug}/creation-site-internet-{v['slug']}"
+    
+    # SEO & Schema
+    with phase("schema"):
+        replacements["schema_json_ld"] = generate_schema(v, dept_slug, page_url)
+    
+    # Nearby Cities Maillage
+    with phase("neighbours"):
+        replacements["villes_proches_html"] = " ".join([f'<a href="/{n_dept_slug}/creation-site-internet-{slug}">{ville}</a>' for slug, ville, n_dept_slug in neighbours])
+
+    # Dynamic Stats (drawn for the whole batch by page_stats.city_stats)
+    stats = ctx["stats"][v['slug']]
+    replacements.update((key, stats[key]) for key in STAT_KEYS)
+
+    # Freshness
+    now = ctx["now"]
+    live = site_fields(now)
+    
+    # UI Avatars
+    prenom = v_normalized.get("Prénom Aléatoire", "Marie")
+    bg = "e17055" if is_female_name(prenom) else "2c3e50"
+    replacements["avatar_url"] = f"https://ui-avatars.com/api/?name={prenom}&background={bg}&color=fff&size=150&bold=true"
+    replacements["temoignage_prenom"] = prenom
+    replacements["temoignage_metier"] = v_normalized.get("Métier Aléatoire", "Gérant")
+
+    # FOMO
+    live.update(page_fields(stats))
+
+    # Pricing (dynamique mais avec valeurs par défaut)
+    replacements["prix_vitrine_mensuel"] = str(v_normalized.get("prix_mensuel", 289))
+    replacements["prix_vitrine_plus_mensuel"] = str(v_normalized.get("prix_mensuel_plus", 350))
+    replacements["prix_creation"] = "0"
+    
+    # Defaults for others
+    replacements["url_page"] = page_url
+    replacements["slug_departement"] = dept_slug
+    replacements["maillage_footer_france"] = ctx["maillage_footer"]
+
+    # With --live-fields the dated values become spans that script.js updates
+    if ctx["live_fields"]:
+        replacements.update((key, live_span(key, live[key])) for key in LIVE_KEYS)
+        replacements["live_fields_script"] = script_tag(v['slug'])
+    else:
+        replacements.update((key, live[key]) for key in LIVE_KEYS)
+        replacements["live_fields_script"] = ""
+    
+    # FAQ Titles
+    ville = v.get("ville", "votre ville")
+    replacements["h1_page"] = f"Création Site Internet à {ville}"
+    replacements["meta_title"] = f"Agence Web {ville} - Création Site Internet & SEO"
+    replacements["meta_description"] = f"Besoin d'un site internet à {ville} ? Notre agence web crée votre site vitrine ou e-commerce optimisé SEO. Devis gratuit."
+    
+    replacements["faq_6_question"] = f"Quel est le prix d'un site à {ville} ?"
+    replacements["faq_6_reponse"] = "Nos tarifs débutent à 49€/mois sans frais de création. C'est une solution tout-inclus pour les entreprises locales."
+    replacements["faq_7_question"] = "Le site est-il optimisé pour Google ?"
+    replacements["faq_7_reponse"] = f"Oui, chaque site créé à {ville} bénéficie d'une optimisation technique SEO complète pour apparaître en haut des résultats."
+    replacements["faq_8_question"] = "Proposez-vous une maintenance ?"
+    replacements["faq_8_reponse"] = "Absolument. La maintenance, l'hébergement et les mises à jour de sécurité sont incluses dans tous nos forfaits."
+    replacements["faq_9_question"] = "Puis-je modifier mon site moi-même ?"
+    replacements["faq_9_reponse"] = "Oui, vous disposez d'un accès administrateur pour modifier vos textes et photos en toute autonomie."
+    replacements["faq_10_question"] = "Quels sont les délais de création ?"
+    replacements["faq_10_reponse"] = "En moyenne, votre site est mis en ligne sous 10 à 15 jours après validation de la maquette."
+
+    with phase("render"):
+        return ctx["template"].render(replacements)
+
+def render_city(ctx, v, neighbours):
+    content = render_city_html(ctx, v, neighbours)
+    with phase("write"):
+        write_file(os.path.join(OUTPUT_DIR, city_page_url(v, ctx["dept_name_to_slug"])[1:] + ".html"), content)
+
+def render_chunk(ctx, tasks):
+    for v, neighbours in tasks:
+        render_city(ctx, v, neighbours)
+    return len(tasks)
+
+def load_city_template(villes):
+    csv_keys = set(villes[0].keys()) if villes else set()
+    return load_template(TEMPLATE_PATH, known=csv_keys | GENERATED_KEYS, required=("ville", "url_page", "villes_proches_html"))
+
+def neighbour_links(v, neighbour_index, by_slug, dept_name_to_slug):
+    """(slug, ville, dept_slug) of the cities linked from v's page."""
+    links = []
+    for slug in neighbour_index.get(v["slug"], []):
+        ov = by_slug[slug]
+        ov_dept = ov.get("departement_nom", "")
+        links.append((slug, ov["ville"], dept_name_to_slug.get(ov_dept, slugify(ov_dept))))
+    return links
+
+def page_digest(v, neighbours, template, footer_hash, now, live_fields=False, stats_mode=DEFAULT_MODE):
+    # Everything that shapes a city page: the row, the template, the neighbour links,
+    # the month (unless the dated fields come from assets/live-fields.json) and the
+    # stats mode (left out by default, so compat pages keep their digests)
+    extra = () if stats_mode == DEFAULT_MODE else (stats_mode,)
+    if live_fields:
+        return input_hash(v, neighbours, template.hash, footer_hash, "live", *extra)
+    return input_hash(v, neighbours, template.hash, footer_hash, now.year, now.month, *extra)
+
+def generate_site(jobs=1, force=False, villes=None, depts_data=None, live_fields=False, stats_mode=DEFAULT_MODE):
     print("🚀 Starting Generation (Technical SEO Mode)...")
     if not os.path.exists(OUTPUT_DIR): os.makedirs(OUTPUT_DIR)
 
-    villes = load_data()
-    with open(DEPARTEMENTS_PATH, "r", encoding="utf-8") as f:
-        depts_data = json.load(f)
+    # The pipeline (refresh_site.py) passes the data it already loaded
+    with phase("load"):
+        if villes is None:
+            villes = load_data()
+        if depts_data is None:
+            with open(DEPARTEMENTS_PATH, "r", encoding="utf-8") as f:
+                depts_data = json.load(f)
     dept_name_to_slug = {d["nom"]: d["slug"] for d in depts_data}
     
-    cities_by_dept = {}
-    for v in villes:
-        d = v.get("departement_nom", "Autres")
-        if d not in cities_by_dept: cities_by_dept[d] = []
-        cities_by_dept[d].append(v)
+    # Nearest cities from the shared neighbour index (adjacency graph, then department by population)
+    with phase("neighbour index"):
+        neighbour_index = load_neighbour_index("villes", villes, k=12)
+    by_slug = {v["slug"]: v for v in villes}
 
-    with open(TEMPLATE_PATH, "r", encoding="utf-8") as f:
-        template = f.read()
+    template = load_city_template(villes)
 
-    maillage_footer = generate_maillage_footer()
+    maillage_footer = generate_maillage_footer(depts_data)
     if TEST_MODE: villes = villes[:5]
 
-    count = 0
-    sitemap_entries = []
-    
-    for v in villes:
-        v_normalized = normalize_row(v)
-        replacements = v_normalized.copy()
-        dept_nom = v_normalized.get("departement_nom", "")
-        dept_slug = dept_name_to_slug.get(dept_nom, slugify(dept_nom))
-        page_url = f"/{dept_slug}/creation-site-internet-{v['slug']}"
-        
-        # SEO & Schema
-        replacements["schema_json_ld"] = generate_schema(v, dept_slug, page_url)
-        
-        # Nearby Cities Maillage
-        dept_villes = cities_by_dept.get(dept_nom, [])
-        others = [ov for ov in dept_villes if ov['slug'] != v['slug']]
-        random.seed(v['slug'])
-        selected = random.sample(others, min(len(others), 12))
-        replacements["villes_proches_html"] = " ".join([f'<a href="/{dept_slug}/creation-site-internet-{ov["slug"]}">{ov["ville"]}</a>' for ov in selected])
-
-        # Dynamic Stats
-        random.seed(v['slug'] + "stats")
-        replacements["nb_sites_realises"] = str(random.randint(45, 85))
-        replacements["nb_avis"] = str(random.randint(110, 160))
-        replacements["note_google"] = str(round(random.uniform(4.8, 5.0), 1))
-        replacements["delai_jours"] = str(random.randint(7, 15))
-
-        # Freshness
-        now = datetime.now()
-        replacements["mois_actuel"] = FRENCH_MONTHS[now.month]
-        replacements["annee_actuelle"] = str(now.year)
-        replacements["dernier_site_mois"] = f"{FRENCH_MONTHS[now.month]} {now.year}"
-        
-        # UI Avatars
-        prenom = v_normalized.get("Prénom Aléatoire", "Marie")
-        bg = "e17055" if is_female_name(prenom) else "2c3e50"
-        replacements["avatar_url"] = f"https://ui-avatars.com/api/?name={prenom}&background={bg}&color=fff&size=150&bold=true"
-        replacements["temoignage_prenom"] = prenom
-        replacements["temoignage_metier"] = v_normalized.get("Métier Aléatoire", "Gérant")
-
-        # FOMO
-        random.seed(v['slug'] + str(now.month))
-        replacements["places_restantes"] = str(random.randint(2, 4))
-
-        # Pricing (dynamique mais avec valeurs par défaut)
-        replacements["prix_vitrine_mensuel"] = str(v_normalized.get("prix_mensuel", 289))
-        replacements["prix_vitrine_plus_mensuel"] = str(v_normalized.get("prix_mensuel_plus", 350))
-        replacements["prix_creation"] = "0"
-        
-        # Defaults for others
-        replacements["url_page"] = page_url
-        replacements["slug_departement"] = dept_slug
-        replacements["maillage_footer_france"] = maillage_footer
-        replacements["year"] = str(now.year)
-        
-        # FAQ Titles
-        ville = v.get("ville", "votre ville")
-        replacements["h1_page"] = f"Création Site Internet à {ville}"
-        replacements["meta_title"] = f"Agence Web {ville} - Création Site Internet & SEO"
-        replacements["meta_description"] = f"Besoin d'un site internet à {ville} ? Notre agence web crée votre site vitrine ou e-commerce optimisé SEO. Devis gratuit."
-        
-        replacements["faq_6_question"] = f"Quel est le prix d'un site à {ville} ?"
-        replacements["faq_6_reponse"] = "Nos tarifs débutent à 49€/mois sans frais de création. C'est une solution tout-inclus pour les entreprises locales."
-        replacements["faq_7_question"] = "Le site est-il optimisé pour Google ?"
-        replacements["faq_7_reponse"] = f"Oui, chaque site créé à {ville} bénéficie d'une optimisation technique SEO complète pour apparaître en haut des résultats."
-        replacements["faq_8_question"] = "Proposez-vous une maintenance ?"
-        replacements["faq_8_reponse"] = "Absolument. La maintenance, l'hébergement et les mises à jour de sécurité sont incluses dans tous nos forfaits."
-        replacements["faq_9_question"] = "Puis-je modifier mon site moi-même ?"
-        replacements["faq_9_reponse"] = "Oui, vous disposez d'un accès administrateur pour modifier vos textes et photos en toute autonomie."
-        replacements["faq_10_question"] = "Quels sont les délais de création ?"
-        replacements["faq_10_reponse"] = "En moyenne, votre site est mis en ligne sous 10 à 15 jours après validation de la maquette."
-
-        content = template
-        for key, val in replacements.items():
-            content = content.replace("{{" + key + "}}", str(val))
-            
-        dept_dir = os.path.join(OUTPUT_DIR, dept_slug)
-        if not os.path.exists(dept_dir): os.makedirs(dept_dir)
-        with open(os.path.join(dept_dir, f"creation-site-internet-{v['slug']}.html"), "w", encoding="utf-8") as f:
-            f.write(content)
-            
-        sitemap_entries.append(f"https://agence-web-locale.fr{page_url}")
-        count += 1
-        if count % 100 == 0: print(f"✅ {count} pages...")
-
-    # Sitemap
-    if not TEST_MODE:
-        with open(os.path.join(OUTPUT_DIR, "sitemap.xml"), "w", encoding="utf-8") as f:
-            f.write('<?xml version="1.0" encoding="UTF-8"?>\n<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n')
-            for url in sitemap_entries:
-                f.write(f'  <url><loc>{url}</loc><lastmod>{now.strftime("%Y-%m-%d")}</lastmod></url>\n')
-            f.write('</urlset>')
+    now = datetime.now()
+    ctx = {
+        "template": template,
+        "dept_name_to_slug": dept_name_to_slug,
+        "maillage_footer": maillage_footer,
+        "now": now,
+        "live_fields": live_fields
+    }
+    manifest = BuildManifest("villes", force=force)
+    footer_hash = input_hash(maillage_footer)
+
+    # Only pages whose inputs changed are rendered (see page_digest)
+    tasks = []
+    with phase("manifest"):
+        for v in last_wins(villes, lambda v: city_page_url(v, dept_name_to_slug)):
+            neighbours = neighbour_links(v, neighbour_index, by_slug, dept_name_to_slug)
+            path = os.path.join(OUTPUT_DIR, city_page_url(v, dept_name_to_slug)[1:] + ".html")
+            if manifest.needs_build(path, page_digest(v, neighbours, template, footer_hash, now, live_fields, stats_mode)):
+                tasks.append((v, neighbours))
+
+    # Stats of every city in one batch; workers only get those of the pages they render
+    with phase("stats"):
+        stats = city_stats([v["slug"] for v in villes], now.month, stats_mode)
+    ctx["stats"] = {v["slug"]: stats[v["slug"]] for v, _ in tasks}
 
+    # One chunk per department; a later row with the same output path wins (see last_wins)
+    chunks = group_by(tasks, lambda t: t[0].get("departement_nom", ""))
+    count = run_chunks(render_chunk, chunks, ctx, jobs=jobs, progress="✅ {count} pages...")
+    manifest.save()
+    if live_fields:
+        print(f"🕒 Dated fields of {len(villes)} pages in {write_live_fields(stats, now)}")
+    report_writes("villes")
     print(f"🏁 Done! {count} pages.")
 
 if __name__ == "__main__":
-    generate_site()
+    args = parse_args("Generate the city pages", configure=lambda parser: add_stats_argument(add_live_fields_argument(parser)))
+    generate_site(jobs=args.jobs, force=args.force, live_fields=args.live_fields, stats_mode=args.stats)
@@ -1,9 +1,14 @@
-import csv
 import os
-import random
 import json
 import re
 from datetime import datetime
+from template_engine import load_template
+from build_executor import group_by, last_wins, parse_args, run_chunks
+from build_manifest import BuildManifest, input_hash
+from city_records import full_row, load_cities
+from output_writer import report_writes, write_file
+from page_stats import DEFAULT_MODE, add_stats_argument, demo_fields
+from profiler import phase
 
 # CONFIGURATION
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -20,6 +25,13 @@ NICHES = {
     "sante": "sante.html"
 }
 
+DEMO_KEYS = {
+    "ville", "departement_nom", "demo_owner_name", "demo_phone", "demo_siret", "demo_email",
+    "demo_address", "demo_tva", "demo_rpps", "demo_assurance", "demo_carte_pro",
+    "demo_brand_name", "demo_brand_main", "demo_brand_sub", "ville_slug", "departement_slug",
+    "quartiers", "fait_local"
+}
+
 def slugify(text):
     text = str(text).lower().strip()
     replacements = [
@@ -51,140 +63,170 @@ def extract_brand_from_url(url):
         return name
     return None
 
-def generate_random_siret(city_seed, dept_num="75"):
-    random.seed(city_seed)
-    num = "".join([str(random.randint(0, 9)) for _ in range(9)])
-    nic = "".join([str(random.randint(0, 9)) for _ in range(5)])
-    return f"{num} {nic}"
+def demo_seed(row, niche):
+    return row.get("ville", "Paris") + niche
+
+def demo_stats(tasks, stats_mode=DEFAULT_MODE):
+    """{(seed, niche): fake contact details} of every task, drawn in one batch (see page_stats.py)."""
+    items = list(dict.fromkeys((demo_seed(row, niche), niche) for row, niche, *_ in tasks))
+    return dict(zip(items, demo_fields(items, stats_mode)))
 
-def generate_professional_data(row, niche):
+def generate_professional_data(row, niche, fields):
     city = row.get("ville", "Paris")
-    slug = row.get("slug", "paris")
     dept_nom = row.get("departement_nom", "Paris")
-    seed = city + niche
-    random.seed(seed)
-    
-    first_names = ["Marc-André", "Jean-Baptiste", "Lucie", "Aurélie", "Thomas", "Antoine", "Sophie", "Élodie", "Nicolas", "Benoit"]
-    last_names = ["Valéry", "Moreau", "Lefebvre", "Roux", "Girard", "Petit", "Simon", "Bertrand", "Lauzier", "Gaillard"]
-    
-    owner = f"{random.choice(first_names)} {random.choice(last_names)}"
-    phone = f"0{random.randint(1, 5)} {random.randint(40, 99)} {random.randint(10, 99)} {random.randint(10, 99)} {random.randint(10, 99)}"
-    
-    # Simple SIRET logic
-    siret = generate_random_siret(seed)
+    siret = fields["siret"]
     
     data = {
         "ville": city,
         "departement_nom": dept_nom,
-        "demo_owner_name": owner,
-        "demo_phone": phone,
+        "demo_owner_name": fields["owner"],
+        "demo_phone": fields["phone"],
         "demo_siret": siret,
         "demo_email": f"contact@{slugify(city)}-{niche}.fr",
-        "demo_address": f"{random.randint(1, 150)} Boulevard de la République, {row.get('population', '75000')[:2]}000 {city}"
+        "demo_address": f"{fields['street']} Boulevard de la République, {row.get('population', '75000')[:2]}000 {city}"
     }
     
     if niche == "avocat":
-        data["demo_tva"] = f"FR {random.randint(10, 99)} {siret.split()[0]}"
+        data["demo_tva"] = f"FR {fields['tva']} {siret.split()[0]}"
     elif niche == "sante":
-        data["demo_rpps"] = "".join([str(random.randint(0, 9)) for _ in range(11)])
-        data["demo_tva"] = f"FR {random.randint(10, 99)} {siret.split()[0]}"
+        data["demo_rpps"] = fields["rpps"]
+        data["demo_tva"] = f"FR {fields['tva']} {siret.split()[0]}"
     elif niche == "artisan":
-        data["demo_assurance"] = f"AXA-{random.randint(100000, 999999)}"
+        data["demo_assurance"] = f"AXA-{fields['assurance']}"
     elif niche == "immo":
-        data["demo_carte_pro"] = f"CPI {random.randint(10, 99)}01 {random.randint(2018, 2024)} 000 0{random.randint(100, 999)}"
+        data["demo_carte_pro"] = f"CPI {fields['carte_pro']}"
         
     return data
 
-def generate_demos():
-    print("🎨 Starting Ultimate Demo Generation...")
+# Mapping between niche key and CSV column prefix
+NICHE_TO_COL = {
+    "restaurant": "resto",
+    "artisan": "artisan",
+    "avocat": "avocat",
+    "immo": "immo",
+    "beaute": "beaute",
+    "sante": "sante"
+}
+
+def get_brand_name(row, niche):
+    # Get brand name from CSV URL
+    col_prefix = NICHE_TO_COL.get(niche, niche)
+    url_col = f"url_{col_prefix}_complete"
+    csv_url = row.get(url_col)
+    brand_name = extract_brand_from_url(csv_url)
     
-    # Load villes
-    villes = []
-    with open(VILLES_PATH, mode='r', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            villes.append(row)
+    if not brand_name:
+        brand_name = f"{niche.title()} {row.get('ville')}"
+    return brand_name
+
+def render_demo(template, row, niche, brand_name, dept_slug, fields):
+    # Prepare data (fields: the page's demo_stats entry)
+    with phase("fields"):
+        data = generate_professional_data(row, niche, fields)
+    data["demo_brand_name"] = brand_name
+    data["ville_slug"] = row.get("slug")
+    data["departement_slug"] = dept_slug
+    data["quartiers"] = row.get("quartiers", "")
+    data["fait_local"] = row.get("fait_local", "")
     
-    # Load templates
+    # Split brand name for logo if possible
+    parts = brand_name.split()
+    if len(parts) > 1:
+        data["demo_brand_main"] = parts[0].upper()
+        data["demo_brand_sub"] = " ".join(parts[1:]).upper()
+    else:
+        data["demo_brand_main"] = brand_name.upper()
+        data["demo_brand_sub"] = ""
+
+    # Variables for template
+    with phase("render"):
+        return template.render(data)
+
+def load_demo_templates():
     templates = {}
     for niche, filename in NICHES.items():
         path = os.path.join(DEMOS_SOURCE_DIR, filename)
         if os.path.exists(path):
-            with open(path, "r", encoding="utf-8") as f:
-                templates[niche] = f.read()
-    
-    # Load department slugs
-    with open(os.path.join(BASE_DIR, "departements.json"), "r", encoding="utf-8") as f:
-        depts_data = json.load(f)
-    dept_name_to_slug = {d["nom"]: d["slug"] for d in depts_data}
-    
-    # Generate for each city
-    count = 0
-    
-    # Mapping between niche key and CSV column prefix
-    NICHE_TO_COL = {
-        "restaurant": "resto",
-        "artisan": "artisan",
-        "avocat": "avocat",
-        "immo": "immo",
-        "beaute": "beaute",
-        "sante": "sante"
-    }
-    
+            templates[niche] = load_template(path, known=DEMO_KEYS, required=("demo_brand_name",))
+    return templates
+
+def demo_tasks(villes, niches, dept_name_to_slug):
+    """One (row, niche, brand_name, brand_slug, dept_slug) task per city and niche."""
+    tasks = []
     for row in villes:
-        city_slug = row.get("slug")
         dept_nom = row.get("departement_nom")
         dept_slug = dept_name_to_slug.get(dept_nom, slugify(dept_nom))
+        for niche in niches:
+            brand_name = get_brand_name(row, niche)
+            tasks.append((row, niche, brand_name, slugify(brand_name), dept_slug))
+    return tasks
+
+def demo_digest(task, template, stats_mode=DEFAULT_MODE):
+    # The task (row, niche, brand), the template and a non-default stats mode
+    if stats_mode == DEFAULT_MODE:
+        return input_hash(task, template.hash)
+    return input_hash(task, template.hash, stats_mode)
+
+def demo_lastmods(tasks, templates, stats_mode=DEFAULT_MODE):
+    """{output key: date its inputs last changed} of every demo, from the brand index and templates alone."""
+    # A manifest of its own that no page backs: demo_server.py renders the demos on request
+    manifest = BuildManifest("demo-index")
+    for t in last_wins(tasks, lambda t: (t[1], t[3])):
+        manifest.record(os.path.join(OUTPUT_DIR, t[1], t[3], "index.html"), demo_digest(t, templates[t[1]], stats_mode))
+    manifest.save()
+    return manifest.lastmod
+
+def render_chunk(ctx, tasks):
+    city, fields = None, None
+    for row, niche, brand_name, brand_slug, dept_slug in tasks:
+        # Tasks of one city are adjacent: parse its long fields once for all niches
+        if row is not city:
+            with phase("normalize"):
+                city, fields = row, full_row(row)
+        content = render_demo(ctx["templates"][niche], fields, niche, brand_name, dept_slug, ctx["stats"][(demo_seed(row, niche), niche)])
         
-        for niche, template_content in templates.items():
-            # Get brand name from CSV URL
-            col_prefix = NICHE_TO_COL.get(niche, niche)
-            url_col = f"url_{col_prefix}_complete"
-            csv_url = row.get(url_col)
-            brand_name = extract_brand_from_url(csv_url)
-            
-            if not brand_name:
-                brand_name = f"{niche.title()} {row.get('ville')}"
-            
-            brand_slug = slugify(brand_name)
-            
-            # Prepare data
-            data = generate_professional_data(row, niche)
-            data["demo_brand_name"] = brand_name
-            data["ville_slug"] = city_slug
-            data["departement_slug"] = dept_slug
-            data["quartiers"] = row.get("quartiers", "")
-            data["fait_local"] = row.get("fait_local", "")
-            
-            # Split brand name for logo if possible
-            parts = brand_name.split()
-            if len(parts) > 1:
-                data["demo_brand_main"] = parts[0].upper()
-                data["demo_brand_sub"] = " ".join(parts[1:]).upper()
-            else:
-                data["demo_brand_main"] = brand_name.upper()
-                data["demo_brand_sub"] = ""
-
-            # Variables for template
-            content = template_content
-            for key, value in data.items():
-                content = content.replace("{{" + key + "}}", str(value))
-            
-            # Output path
-            # Strategy: /output/demos/[niche]/[brand-slug]/index.html
-            target_dir = os.path.join(OUTPUT_DIR, niche, brand_slug)
-            if not os.path.exists(target_dir):
-                os.makedirs(target_dir)
-            
-            with open(os.path.join(target_dir, "index.html"), "w", encoding="utf-8") as f:
-                f.write(content)
-            
-            count += 1
-            
-        if count % 100 == 0:
-            print(f"✅ {count} demo pages generated...")
+        # Output path
+        # Strategy: /output/demos/[niche]/[brand-slug]/index.html
+        with phase("write"):
+            write_file(os.path.join(OUTPUT_DIR, niche, brand_slug, "index.html"), content)
+    return len(tasks)
+
+def generate_demos(jobs=1, force=False, villes=None, depts_data=None, stats_mode=DEFAULT_MODE):
+    print("🎨 Starting Ultimate Demo Generation...")
+    
+    # Load villes
+    if villes is None:
+        villes = load_cities(VILLES_PATH)
+    
+    templates = load_demo_templates()
+    
+    # Load department slugs
+    if depts_data is None:
+        with open(os.path.join(BASE_DIR, "departements.json"), "r", encoding="utf-8") as f:
+            depts_data = json.load(f)
+    dept_name_to_slug = {d["nom"]: d["slug"] for d in depts_data}
+    
+    tasks = demo_tasks(villes, templates, dept_name_to_slug)
+
+    # A later city with the same brand slug wins, as in a serial run; pages whose
+    # row, brand and template are unchanged since the last build are skipped
+    manifest = BuildManifest("demos", force=force)
+    with phase("manifest"):
+        tasks = [
+            t for t in last_wins(tasks, lambda t: (t[1], t[3]))
+            if manifest.needs_build(os.path.join(OUTPUT_DIR, t[1], t[3], "index.html"), demo_digest(t, templates[t[1]], stats_mode))
+        ]
+
+    # One chunk per department (each row is shipped once for its six niches)
+    chunks = group_by(tasks, lambda t: t[4])
+    with phase("stats"):
+        stats = demo_stats(tasks, stats_mode)
+    count = run_chunks(render_chunk, chunks, {"templates": templates, "stats": stats}, jobs=jobs, progress="✅ {count} demo pages generated...")
+    manifest.save()
 
+    report_writes("demos")
     print(f"🏁 Generation Complete! {count} total demo pages in {OUTPUT_DIR}")
 
 if __name__ == "__main__":
-    generate_demos()
+    args = parse_args("Generate the niche demo pages", configure=add_stats_argument)
+    generate_demos(jobs=args.jobs, force=args.force, stats_mode=args.stats)
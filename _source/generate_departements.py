@@ -1,8 +1,13 @@
-import csv
 import json
 import os
 import re
 import unicodedata
+from template_engine import load_template
+from build_executor import last_wins, parse_args, run_chunks
+from build_manifest import BuildManifest, input_hash
+from city_records import load_cities
+from output_writer import report_writes, write_file
+from profiler import phase
 
 # CONFIGURATION
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -11,62 +16,34 @@ VILLES_PATH = os.path.join(BASE_DIR, "villes.csv")
 DEPARTEMENTS_PATH = os.path.join(BASE_DIR, "departements.json")
 TEMPLATE_PATH = os.path.join(BASE_DIR, "template_departement.html")
 
+DEPT_KEYS = {"departement_nom", "departement_code", "villes_maillage", "meta_title", "meta_description", "url_page", "dept_slug"}
+
 def slugify(text):
     text = unicodedata.normalize('NFD', text).encode('ascii', 'ignore').decode('utf-8')
     text = re.sub(r'[^\w\s-]', '', text).strip().lower()
     return re.sub(r'[-\s]+', '-', text)
 
 def load_data():
-    villes = []
     if not os.path.exists(VILLES_PATH):
         print(f"❌ File not found: {VILLES_PATH}")
-        return villes
-    with open(VILLES_PATH, "r", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            villes.append(row)
-    return villes
-
-def generate_departements():
-    print("🚀 Starting Department Generation...")
-    
-    if not os.path.exists(OUTPUT_DIR):
-        os.makedirs(OUTPUT_DIR)
-
-    villes = load_data()
-    with open(DEPARTEMENTS_PATH, "r", encoding="utf-8") as f:
-        depts_data = json.load(f)
-    
-    with open(TEMPLATE_PATH, "r", encoding="utf-8") as f:
-        template = f.read()
-
-    # Group cities by department name
-    dept_to_villes = {}
-    for v in villes:
-        d_nom = v.get("departement_nom")
-        if d_nom:
-            if d_nom not in dept_to_villes:
-                dept_to_villes[d_nom] = []
-            dept_to_villes[d_nom].append(v)
+        return []
+    return load_cities(VILLES_PATH)
 
-    count = 0
-    for dept in depts_data:
+def render_chunk(ctx, items):
+    for dept, dept_villes in items:
         nom = dept["nom"]
         slug = dept["slug"]
         code = dept["code"]
         
-        dept_villes = dept_to_villes.get(nom, [])
-        if not dept_villes:
-            continue
-            
         # Sort cities by population or name (defaulting to name for consistency)
         dept_villes.sort(key=lambda x: x.get("ville", ""))
         
         villes_html = ""
-        for v in dept_villes:
-            # Important: Link to the SILO path /[dept_slug]/creation-site-internet-[ville_slug]
-            city_url = f"/{slug}/creation-site-internet-{v['slug']}"
-            villes_html += f'''
+        with phase("city links"):
+            for v in dept_villes:
+                # Important: Link to the SILO path /[dept_slug]/creation-site-internet-[ville_slug]
+                city_url = f"/{slug}/creation-site-internet-{v['slug']}"
+                villes_html += f'''
             <div class="city-card">
                 <h3>{v['ville']}</h3>
                 <p style="font-size:0.85rem; color:#636e72; margin-bottom:15px;">Expertise web locale pour {v.get('gentile', 'les professionnels')} de {v['ville']}.</p>
@@ -84,23 +61,58 @@ def generate_departements():
             "dept_slug": slug
         }
 
-        content = template
-        for key, value in replacements.items():
-            placeholder = "{{" + key + "}}"
-            content = content.replace(placeholder, str(value))
+        with phase("render"):
+            content = ctx["template"].render(replacements)
             
         # Write file as /departement/[slug]/index.html
-        dept_hub_dir = os.path.join(OUTPUT_DIR, "departement", slug)
-        if not os.path.exists(dept_hub_dir):
-            os.makedirs(dept_hub_dir)
-            
-        output_path = os.path.join(dept_hub_dir, "index.html")
-        
-        with open(output_path, "w", encoding="utf-8") as f:
-            f.write(content)
-        count += 1
+        with phase("write"):
+            write_file(os.path.join(OUTPUT_DIR, "departement", slug, "index.html"), content)
+    return len(items)
+
+def generate_departements(jobs=1, force=False, villes=None, depts_data=None):
+    print("🚀 Starting Department Generation...")
+    
+    if not os.path.exists(OUTPUT_DIR):
+        os.makedirs(OUTPUT_DIR)
+
+    if villes is None:
+        villes = load_data()
+    if depts_data is None:
+        with open(DEPARTEMENTS_PATH, "r", encoding="utf-8") as f:
+            depts_data = json.load(f)
+    
+    template = load_template(TEMPLATE_PATH, known=DEPT_KEYS, required=("villes_maillage",))
+
+    # Group cities by department name
+    dept_to_villes = {}
+    for v in villes:
+        d_nom = v.get("departement_nom")
+        if d_nom:
+            if d_nom not in dept_to_villes:
+                dept_to_villes[d_nom] = []
+            dept_to_villes[d_nom].append(v)
+
+    items = []
+    for dept in depts_data:
+        dept_villes = dept_to_villes.get(dept["nom"], [])
+        if dept_villes:
+            items.append((dept, dept_villes))
+    items = last_wins(items, lambda item: item[0]["slug"])
+
+    # A hub is rebuilt when its department, its list of cities or the template changes
+    manifest = BuildManifest("departements", force=force)
+    chunks = []
+    for dept, dept_villes in items:
+        cities = [(v["ville"], v["slug"], v.get("gentile", "les professionnels")) for v in sorted(dept_villes, key=lambda x: x.get("ville", ""))]
+        path = os.path.join(OUTPUT_DIR, "departement", dept["slug"], "index.html")
+        if manifest.needs_build(path, input_hash(dept, cities, template.hash)):
+            chunks.append([(dept, dept_villes)])
+    count = run_chunks(render_chunk, chunks, {"template": template}, jobs=jobs)
+    manifest.save()
 
+    report_writes("departements")
     print(f"🏁 Department Generation Complete! {count} pages in /output")
 
 if __name__ == "__main__":
-    generate_departements()
+    args = parse_args("Generate the department hub pages")
+    generate_departements(jobs=args.jobs, force=args.force)
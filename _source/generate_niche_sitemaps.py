@@ -1,87 +1,52 @@
-import csv
-import os
+import argparse
 import json
+import os
+from city_records import load_cities
+from generate_demos import demo_lastmods, demo_tasks, load_demo_templates
+from output_writer import report_writes
+from page_stats import DEFAULT_MODE, add_stats_argument
+import profiler
+from sitemaps import NICHE_DOMAINS, SITEMAP_DIR, SitemapWriter, niche_urls, write_index
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 VILLES_PATH = os.path.join(BASE_DIR, "villes.csv")
-OUTPUT_DIR = os.path.join(BASE_DIR, "../output/sitemaps")
-
-NICHES = {
-    "restaurant": "sites-restaurants.fr",
-    "artisan": "sitesartisans.fr",
-    "beaute": "sites-beaute.fr",
-    "immo": "sites-immobiliers.fr",
-    "avocat": "sites-avocats.fr",
-    "sante": "sites-sante.fr"
-}
-
-def slugify(text):
-    text = str(text).lower().strip()
-    replacements = [
-        (" ", "-"), ("'", "-"), ("à", "a"), ("â", "a"), ("ä", "a"),
-        ("é", "e"), ("è", "e"), ("ê", "e"), ("ë", "e"),
-        ("î", "i"), ("ï", "i"), ("ô", "o"), ("ö", "o"),
-        ("ù", "u"), ("û", "u"), ("ü", "u"), ("ç", "c"),
-        ("œ", "oe"), ("æ", "ae")
-    ]
-    for old, new in replacements:
-        text = text.replace(old, new)
-    return text
-
-def extract_brand_from_url(url):
-    if not url: return None
-    try:
-        brand = url.split('/')[-1].replace('-link', '').replace('link', '')
-        return brand if brand else None
-    except: return None
-
-def generate_niche_sitemaps():
+DEPARTEMENTS_PATH = os.path.join(BASE_DIR, "departements.json")
+
+# The worker serves https://{domain}/sitemap.xml from sitemaps/sitemap-{niche}.xml,
+# which is the index of that niche's gzipped sitemap files.
+# The demos it lists live on other hosts (https://{brand}.{domain}/), which the
+# sitemap protocol only accepts through cross-submission: the worker answers
+# /robots.txt on every brand host with "Sitemap: https://{domain}/sitemap.xml".
+# Submit each niche sitemap in a Search Console *domain* property
+# (sc-domain:{domain}), which covers all its subdomains; a URL-prefix property
+# for https://{domain}/ would reject every brand URL.
+# lastmod comes from the demo index (brand rows and template hashes), so the
+# sitemaps do not need the static demos of generate_demos.py.
+
+def generate_niche_sitemaps(villes=None, depts=None, stats_mode=DEFAULT_MODE):
     print("🌐 Generating Niche Sitemaps...")
-    if not os.path.exists(OUTPUT_DIR): os.makedirs(OUTPUT_DIR)
-
-    villes = []
-    with open(VILLES_PATH, mode='r', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            villes.append(row)
-
-    NICHE_TO_COL = {
-        "restaurant": "resto",
-        "artisan": "artisan",
-        "avocat": "avocat",
-        "immo": "immo",
-        "beaute": "beaute",
-        "sante": "sante"
-    }
-
-    for niche, domain in NICHES.items():
-        print(f"  - {domain}")
-        sitemap_entries = []
-        col_prefix = NICHE_TO_COL.get(niche)
-        url_col = f"url_{col_prefix}_complete"
-
-        for row in villes:
-            csv_url = row.get(url_col)
-            brand_name = extract_brand_from_url(csv_url)
-            if not brand_name:
-                brand_name = f"{niche.title()} {row.get('ville')}"
-            
-            brand_slug = slugify(brand_name)
-            loc = f"https://{domain}/{niche}/{brand_slug}/"
-            # Note: The worker handles the routing, so we use the final SEO domain.
-            # But the demos are generated at output/[niche]/[brand-slug]/
-            # The worker routes [domain]/... to Netlify/[niche]/[brand-slug]/
-            # So the loc should be the domain loc.
-            sitemap_entries.append(loc)
-
-        # Write sitemap file for this niche
-        with open(os.path.join(OUTPUT_DIR, f"sitemap-{niche}.xml"), "w", encoding="utf-8") as f:
-            f.write('<?xml version="1.0" encoding="UTF-8"?>\n<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n')
-            for url in sitemap_entries:
-                f.write(f'  <url><loc>{url}</loc></url>\n')
-            f.write('</urlset>')
 
-    print(f"🏁 Done! 6 niche sitemaps generated in {OUTPUT_DIR}")
+    if villes is None:
+        villes = load_cities(VILLES_PATH)
+    if depts is None:
+        with open(DEPARTEMENTS_PATH, "r", encoding="utf-8") as f:
+            depts = json.load(f)
+    # Same brand slugs and digests as the demo pages themselves
+    templates = load_demo_templates()
+    tasks = demo_tasks(villes, templates, {d["nom"]: d["slug"] for d in depts})
+    lastmods = demo_lastmods(tasks, templates, stats_mode)
+
+    for niche, domain in NICHE_DOMAINS.items():
+        with profiler.phase(f"sitemap-{niche}"), SitemapWriter(SITEMAP_DIR, f"sitemap-{niche}", f"https://{domain}/sitemaps") as writer:
+            for loc, lastmod in niche_urls(tasks, niche, lastmods):
+                writer.add(loc, lastmod)
+        write_index(os.path.join(SITEMAP_DIR, f"sitemap-{niche}.xml"), writer.files)
+        print(f"  - {domain}: {writer.count} URLs")
+
+    report_writes("niche sitemaps")
+    print(f"🏁 Done! {len(NICHE_DOMAINS)} niche sitemaps generated in {SITEMAP_DIR}")
 
 if __name__ == "__main__":
-    generate_niche_sitemaps()
+    args = add_stats_argument(profiler.add_profile_argument(argparse.ArgumentParser(description="Generate the niche sitemaps"))).parse_args()
+    profiler.start_from_args(args)
+    generate_niche_sitemaps(stats_mode=args.stats)
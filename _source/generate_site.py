@@ -1,10 +1,16 @@
 import json
 import os
-import random
-import hashlib
 import math
 from datetime import datetime, timedelta
-from collections import defaultdict
+from template_engine import load_template
+from build_executor import group_by, last_wins, parse_args, run_chunks
+from build_manifest import BuildManifest, input_hash
+from data_loader import load_json
+from live_fields import add_live_fields_argument, live_span, script_tag, site_fields, write_live_script
+from neighbour_index import load_neighbour_index
+from output_writer import report_writes, write_file
+from page_stats import DEFAULT_MODE, stable_randint
+from profiler import phase
 
 # Configuration
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -14,17 +20,18 @@ niche_path = os.path.join(BASE_DIR, "niche_data.json")
 output_dir = os.path.join(BASE_DIR, "../output")
 depts_path = os.path.join(BASE_DIR, "departements.json")
 
+SITE_KEYS = {
+    "ville", "page_title", "domain", "page_url", "code_postal", "telephone", "date_modified",
+    "services_html", "process_html", "pricing_html", "faq_html", "maillage_interne",
+    "departement_nom", "image_url", "year", "words_json", "live_fields_script"
+}
+
 def get_current_date():
     return datetime.now().strftime("%Y-%m-%d")
 
-def get_stable_random(seed_str, min_val, max_val):
+def get_stable_random(seed_str, min_val, max_val, stats_mode=DEFAULT_MODE):
     period = datetime.now().isocalendar()[1] // 2
-    seed_data = f"{seed_str}-{period}"
-    seed_hash = int(hashlib.md5(seed_data.encode()).hexdigest(), 16)
-    random.seed(seed_hash)
-    val = random.randint(min_val, max_val)
-    random.seed()
-    return val
+    return stable_randint(f"{seed_str}-{period}", min_val, max_val, stats_mode)
 
 def get_prochaine_dispo():
     now = datetime.now()
@@ -38,40 +45,9 @@ def get_mois_actuel():
     months_fr = ["janvier", "février", "mars", "avril", "mai", "juin", "juillet", "août", "septembre", "octobre", "novembre", "décembre"]
     return months_fr[datetime.now().month-1]
 
-def generate_pages():
-    if not os.path.exists(output_dir):
-        os.makedirs(output_dir)
-
-    with open(template_path, "r", encoding="utf-8") as f:
-        template_content = f.read()
-
-    with open(data_path, "r", encoding="utf-8") as f:
-        all_cities = json.load(f)
-
-    with open(niche_path, "r", encoding="utf-8") as f:
-        niche = json.load(f)
-
-    # Load department slugs
-    dept_name_to_slug = {}
-    if os.path.exists(depts_path):
-        with open(depts_path, "r", encoding="utf-8") as f:
-            depts_data = json.load(f)
-            for d in depts_data:
-                dept_name_to_slug[d["nom"]] = d["slug"]
-
-    # Group cities by department for internal linking
-    cities_by_dept = defaultdict(list)
-    for city in all_cities:
-        dept = city.get("departement_nom", "")
-        if dept:
-            cities_by_dept[dept].append(city)
-
-    for dept in cities_by_dept:
-        cities_by_dept[dept].sort(key=lambda x: int(x.get("population", 0) or 0), reverse=True)
-
-    print(f"Generating site for niche: {niche['niche_name']}")
-    count = 0
-    for row in all_cities:
+def render_chunk(ctx, tasks):
+    niche = ctx["niche"]
+    for row, siblings in tasks:
         ville = row.get("ville", "")
         slug = row.get("slug", "").strip().lower()
         dept_name = row.get("departement_nom", "")
@@ -81,9 +57,8 @@ def generate_pages():
         page_title = f"Agence Web {ville} ({cp}) - Création Site Internet Premium - {niche['domain']}"
         
         # Internal Linking
-        dept_cities = cities_by_dept.get(dept_name, [])
-        siblings = [c for c in dept_cities if c.get("slug") != slug][:20]
-        maillage_html = " ".join([f'<a href="{niche["base_path"]}/{c["slug"]}.html">Expert Web {c["ville"]}</a>' for c in siblings])
+        with phase("neighbours"):
+            maillage_html = " ".join([f'<a href="{niche["base_path"]}/{s_slug}.html">Expert Web {s_ville}</a>' for s_slug, s_ville in siblings])
 
         # Services HTML Generation
         services_html = ""
@@ -149,39 +124,90 @@ def generate_pages():
             '''
 
         replacements = {
-            "{{ville}}": ville,
-            "{{page_title}}": page_title,
-            "{{domain}}": niche["domain"],
-            "{{page_url}}": f"{niche['base_path']}/{slug}.html",
-            "{{code_postal}}": cp,
-            "{{telephone}}": niche["contact"]["phone"],
-            "{{date_modified}}": get_current_date(),
-            "{{services_html}}": services_html,
-            "{{process_html}}": process_html,
-            "{{pricing_html}}": pricing_html,
-            "{{faq_html}}": faq_html,
-            "{{maillage_interne}}": maillage_html,
-            "{{departement_nom}}": dept_name,
-            "{{image_url}}": f"https://{niche['domain']}/assets/hero-{slug}.jpg",
-            "{{year}}": datetime.now().year,
-            "{{words_json}}": json.dumps(niche["hero"]["words"], ensure_ascii=False)
+            "ville": ville,
+            "page_title": page_title,
+            "domain": niche["domain"],
+            "page_url": f"{niche['base_path']}/{slug}.html",
+            "code_postal": cp,
+            "telephone": niche["contact"]["phone"],
+            "date_modified": get_current_date(),
+            "services_html": services_html,
+            "process_html": process_html,
+            "pricing_html": pricing_html,
+            "faq_html": faq_html,
+            "maillage_interne": maillage_html,
+            "departement_nom": dept_name,
+            "image_url": f"https://{niche['domain']}/assets/hero-{slug}.jpg",
+            "year": datetime.now().year,
+            "words_json": json.dumps(niche["hero"]["words"], ensure_ascii=False)
         }
 
-        content = template_content
-        for key, value in replacements.items():
-            content = content.replace(key, str(value))
-        
-        filename = f"{slug}.html"
-        filepath = os.path.join(output_dir, filename)
+        # With --live-fields the dated values become spans that script.js updates
+        # (assets/live-fields.json is written by generate.py)
+        if ctx["live_fields"]:
+            live = site_fields(datetime.now())
+            replacements.update((key, live_span(key, live[key])) for key in ("date_modified", "year"))
+            replacements["live_fields_script"] = script_tag(slug)
+        else:
+            replacements["live_fields_script"] = ""
+
+        with phase("render"):
+            content = ctx["template"].render(replacements)
         
-        with open(filepath, "w", encoding="utf-8") as out:
-            out.write(content)
-        
-        count += 1
-        if count % 100 == 0:
-            print(f"Generated {count} pages...")
+        with phase("write"):
+            write_file(os.path.join(output_dir, f"{slug}.html"), content)
+    return len(tasks)
+
+def generate_pages(jobs=1, force=False, live_fields=False):
+    if not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+
+    template = load_template(template_path, known=SITE_KEYS)
+
+    all_cities = load_json(data_path)
+
+    with open(niche_path, "r", encoding="utf-8") as f:
+        niche = json.load(f)
+
+    # Load department slugs
+    dept_name_to_slug = {}
+    if os.path.exists(depts_path):
+        with open(depts_path, "r", encoding="utf-8") as f:
+            depts_data = json.load(f)
+            for d in depts_data:
+                dept_name_to_slug[d["nom"]] = d["slug"]
+
+    # Internal linking from the shared neighbour index (adjacency graph, then department by population)
+    with phase("neighbour index"):
+        neighbour_index = load_neighbour_index("site", all_cities, k=20)
+    by_slug = {city["slug"]: city for city in all_cities}
 
+    print(f"Generating site for niche: {niche['niche_name']}")
+    ctx = {"template": template, "niche": niche, "live_fields": live_fields}
+
+    # A page is rebuilt when its row, its sibling links, the niche data, the
+    # template or the date stamped into it changes (no date with --live-fields)
+    manifest = BuildManifest("site", force=force)
+    niche_hash = input_hash(niche)
+    pages = []
+    for row in last_wins(all_cities, lambda c: c.get("slug", "").strip().lower()):
+        slug = row.get("slug", "").strip().lower()
+        siblings = [(s, by_slug[s]["ville"]) for s in neighbour_index.get(row["slug"], [])]
+        digest = input_hash(row, siblings, niche_hash, template.hash, "live" if live_fields else get_current_date())
+        if manifest.needs_build(os.path.join(output_dir, f"{slug}.html"), digest):
+            pages.append((row, siblings))
+
+    # One chunk per department; a later row with the same slug wins (see last_wins)
+    chunks = group_by(pages, lambda t: t[0].get("departement_nom", ""))
+    count = run_chunks(render_chunk, chunks, ctx, jobs=jobs, progress="Generated {count} pages...")
+    manifest.save()
+    if live_fields:
+        # live-fields.json itself comes from generate.py
+        write_live_script()
+
+    report_writes("site")
     print(f"🏁 Successfully generated {count} pages in {output_dir}")
 
 if __name__ == "__main__":
-    generate_pages()
+    args = parse_args("Generate the niche city pages", configure=add_live_fields_argument)
+    generate_pages(jobs=args.jobs, force=args.force, live_fields=args.live_fields)
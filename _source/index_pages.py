@@ -1,62 +1,185 @@
+import argparse
+import gzip
+import io
 import json
 import os
 import datetime
-import requests
+import random
 import re
-from google_auth_oauthlib.flow import InstalledAppFlow
-from google.auth.transport.requests import Request
-from google.oauth2.credentials import Credentials
+import sqlite3
+import threading
+import time
+import uuid
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from email.parser import BytesParser
+from email.policy import HTTP
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
 
 # Configuration
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 CLIENT_SECRET_FILE = os.path.join(BASE_DIR, "client_secret.json")
 TOKEN_FILE = os.path.join(BASE_DIR, "token.json")
+DB_FILE = os.path.join(BASE_DIR, "indexing_state.sqlite")
+# Former JSON state, imported into the database on first run
 STATE_FILE = os.path.join(BASE_DIR, "indexing_state.json")
 SITEMAP_URL = "https://france-bal.fr/sitemap.xml"
 DAILY_LIMIT = 199
 ENDPOINT = "https://indexing.googleapis.com/v3/urlNotifications:publish"
+BATCH_ENDPOINT = "https://indexing.googleapis.com/batch"
+PUBLISH_PATH = "/v3/urlNotifications:publish"
+BATCH_SIZE = 100  # API maximum per batch call
+MAX_WORKERS = 4
+MAX_RETRIES = 5
+BACKOFF_BASE = 1.0  # seconds, doubled on every retry
 
 SCOPES = ["https://www.googleapis.com/auth/indexing"]
 
-def load_state():
-    if os.path.exists(STATE_FILE):
-        with open(STATE_FILE, "r") as f:
-            return json.load(f)
-    return {"submitted": [], "last_run": "", "today_count": 0}
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS submissions (
+    url TEXT PRIMARY KEY,
+    submitted_at TEXT NOT NULL,
+    status INTEGER NOT NULL,
+    lastmod TEXT
+);
+CREATE TABLE IF NOT EXISTS daily_quota (
+    day TEXT PRIMARY KEY,
+    used INTEGER NOT NULL
+);
+"""
 
-def save_state(state):
-    with open(STATE_FILE, "w") as f:
-        json.dump(state, f, indent=2)
+def open_state(path=DB_FILE, legacy_path=STATE_FILE):
+    db = sqlite3.connect(path)
+    db.executescript(SCHEMA)
+    if os.path.exists(legacy_path) and not db.execute("SELECT 1 FROM submissions LIMIT 1").fetchone():
+        with open(legacy_path, "r") as f:
+            state = json.load(f)
+        when = state.get("last_run") or datetime.date.today().isoformat()
+        with db:
+            db.executemany("INSERT OR IGNORE INTO submissions (url, submitted_at, status, lastmod) VALUES (?, ?, 200, NULL)",
+                           ((url, when) for url in state.get("submitted", [])))
+            if state.get("last_run"):
+                db.execute("INSERT OR REPLACE INTO daily_quota (day, used) VALUES (?, ?)", (state["last_run"], state.get("today_count", 0)))
+        os.replace(legacy_path, legacy_path + ".migrated")
+        print(f"📦 {len(state.get('submitted', []))} URLs importées depuis {os.path.basename(legacy_path)}.")
+    return db
 
-def get_sitemap_urls():
-    try:
-        # Priority: Local relative to script
-        path_output = os.path.join(BASE_DIR, "output/sitemap.xml")
-        path_root = os.path.join(BASE_DIR, "../sitemap.xml")
-        
-        if os.path.exists(path_output):
-            path = path_output
-        elif os.path.exists(path_root):
-            path = path_root
-        elif os.path.exists("sitemap.xml"):
-            path = "sitemap.xml"
-        else:
-            print("⚠️ Sitemap local introuvable, tentative de téléchargement...")
-            response = requests.get(SITEMAP_URL)
-            content = response.text
-            path = None
-        
-        if path:
-            with open(path, "r", encoding="utf-8") as f:
-                content = f.read()
-        
-        urls = re.findall(r'<loc>(.*?)</loc>', content)
-        return urls
-    except Exception as e:
-        print(f"❌ Erreur lors de la lecture du sitemap : {e}")
-        return []
+def quota_used(db, day):
+    row = db.execute("SELECT used FROM daily_quota WHERE day = ?", (day,)).fetchone()
+    return row[0] if row else 0
+
+def select_urls(db, entries, limit):
+    """
+    Load the sitemap entries into a temporary table and pick at most limit URLs:
+    never accepted ones first, then those whose lastmod changed since they were
+    accepted. Returns (urls, {url: lastmod}, total, new, changed).
+    """
+    db.execute("CREATE TEMP TABLE IF NOT EXISTS sitemap (pos INTEGER PRIMARY KEY, url TEXT UNIQUE, lastmod TEXT)")
+    db.execute("DELETE FROM sitemap")
+    db.executemany("INSERT OR IGNORE INTO sitemap (url, lastmod) VALUES (?, ?)", entries)
+    total = db.execute("SELECT COUNT(*) FROM sitemap").fetchone()[0]
+    # URLs imported from the JSON state have no known lastmod: take the current one as submitted
+    with db:
+        db.execute("""
+            UPDATE submissions SET lastmod = (SELECT lastmod FROM sitemap WHERE sitemap.url = submissions.url)
+            WHERE lastmod IS NULL AND status = 200 AND url IN (SELECT url FROM sitemap)
+        """)
+    rows = db.execute("""
+        SELECT s.url, s.lastmod, x.status = 200 AS known
+        FROM sitemap s LEFT JOIN submissions x ON x.url = s.url
+        WHERE x.url IS NULL OR x.status != 200 OR (s.lastmod IS NOT NULL AND s.lastmod IS NOT x.lastmod)
+        ORDER BY known IS 1, s.pos
+    """).fetchall()
+    changed = sum(1 for _, _, known in rows if known == 1)
+    picked = rows[:max(limit, 0)]
+    return [url for url, _, _ in picked], {url: lastmod for url, lastmod, _ in picked}, total, len(rows) - changed, changed
+
+def record_results(db, results, lastmods, day):
+    """Store the answer for every URL; lastmod only moves forward on success."""
+    now = datetime.datetime.now().isoformat(timespec="seconds")
+    answered = [(url, status) for url, status in results.items() if not is_retryable(status)]
+    with db:
+        db.executemany("""
+            INSERT INTO submissions (url, submitted_at, status, lastmod) VALUES (?, ?, ?, ?)
+            ON CONFLICT(url) DO UPDATE SET
+                submitted_at = excluded.submitted_at,
+                status = excluded.status,
+                lastmod = CASE WHEN excluded.status = 200 THEN excluded.lastmod ELSE submissions.lastmod END
+            WHERE excluded.status = 200 OR submissions.status != 200
+        """, ((url, now, status, lastmods.get(url)) for url, status in results.items()))
+        # Every item the API answered counts against the quota, accepted or not
+        db.execute("""
+            INSERT INTO daily_quota (day, used) VALUES (?, ?)
+            ON CONFLICT(day) DO UPDATE SET used = used + excluded.used
+        """, (day, len(answered)))
+
+def is_remote(source):
+    return re.match(r"https?://", source) is not None
+
+def open_sitemap(source):
+    """Binary stream of a local or remote sitemap, gunzipped when needed."""
+    if is_remote(source):
+        response = requests.get(source, stream=True, timeout=60)
+        response.raise_for_status()
+        response.raw.decode_content = True
+        stream = io.BufferedReader(response.raw)
+    else:
+        stream = open(source, "rb")
+    if stream.peek(2)[:2] == b"\x1f\x8b":
+        return gzip.GzipFile(fileobj=stream)
+    return stream
+
+def child_sitemap(index_source, loc):
+    """Local copy of a sitemap listed in a local index, else its URL."""
+    if is_remote(index_source):
+        return loc
+    base = os.path.dirname(os.path.abspath(index_source))
+    path = urlsplit(loc).path
+    for candidate in (os.path.join(base, path.lstrip("/")), os.path.join(base, os.path.basename(path))):
+        if os.path.exists(candidate):
+            return candidate
+    return loc
+
+def iter_sitemap(source):
+    """Yield (loc, lastmod) from a sitemap or sitemap index, parsed incrementally."""
+    with open_sitemap(source) as stream:
+        root = None
+        for event, elem in ET.iterparse(stream, events=("start", "end")):
+            if event == "start":
+                if root is None:
+                    root = elem
+                continue
+            tag = elem.tag.rsplit("}", 1)[-1]
+            if tag not in ("url", "sitemap"):
+                continue
+            fields = {child.tag.rsplit("}", 1)[-1]: (child.text or "").strip() for child in elem}
+            loc, lastmod = fields.get("loc"), fields.get("lastmod") or None
+            # Processed entries are dropped so memory stays flat on big sitemaps
+            root.clear()
+            if not loc:
+                continue
+            if tag == "sitemap":
+                yield from iter_sitemap(child_sitemap(source, loc))
+            else:
+                yield loc, lastmod
+
+def find_sitemap():
+    # Priority: Local relative to script
+    for path in (os.path.join(BASE_DIR, "output/sitemap.xml"), os.path.join(BASE_DIR, "../sitemap.xml"), "sitemap.xml"):
+        if os.path.exists(path):
+            return path
+    print("⚠️ Sitemap local introuvable, tentative de téléchargement...")
+    return SITEMAP_URL
 
 def get_credentials():
+    # Imported here so the script can run against the local stand-in (--no-auth)
+    # without the Google client libraries
+    from google_auth_oauthlib.flow import InstalledAppFlow
+    from google.auth.transport.requests import Request
+    from google.oauth2.credentials import Credentials
+
     creds = None
     if os.path.exists(TOKEN_FILE):
         creds = Credentials.from_authorized_user_file(TOKEN_FILE, SCOPES)
@@ -77,83 +200,241 @@ def get_credentials():
     
     return creds
 
+class GoogleAuth:
+    """Bearer token from the OAuth credentials, refreshed once on a 401."""
+
+    def __init__(self, creds):
+        self.creds = creds
+        self._lock = threading.Lock()
+
+    def token(self):
+        return self.creds.token
+
+    def refresh(self, stale_token):
+        from google.auth.transport.requests import Request
+        with self._lock:
+            # Another thread may already have refreshed it
+            if self.creds.token == stale_token:
+                print("⚠️ Token expiré. Refreshing...")
+                self.creds.refresh(Request())
+
+class StaticAuth:
+    def __init__(self, token="local"):
+        self._token = token
+
+    def token(self):
+        return self._token
+
+    def refresh(self, stale_token):
+        pass
+
+def make_session(workers=MAX_WORKERS):
+    """One keep-alive connection per worker thread."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=workers)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+def build_batch_body(urls):
+    """multipart/mixed body with one publish request per URL; returns (content_type, body)."""
+    boundary = f"batch_{uuid.uuid4().hex}"
+    parts = []
+    for i, url in enumerate(urls):
+        payload = json.dumps({"url": url, "type": "URL_UPDATED"})
+        parts.append(
+            f"--{boundary}\r\n"
+            "Content-Type: application/http\r\n"
+            "Content-Transfer-Encoding: binary\r\n"
+            f"Content-ID: <item{i}>\r\n\r\n"
+            f"POST {PUBLISH_PATH}\r\n"
+            "Content-Type: application/json\r\n"
+            f"Content-Length: {len(payload.encode('utf-8'))}\r\n\r\n"
+            f"{payload}\r\n"
+        )
+    parts.append(f"--{boundary}--\r\n")
+    return f"multipart/mixed; boundary={boundary}", "".join(parts).encode("utf-8")
+
+def parse_batch_response(content_type, body):
+    """{item index: (status, body text)} from a multipart/mixed batch response."""
+    msg = BytesParser(policy=HTTP).parsebytes(f"Content-Type: {content_type}\r\n\r\n".encode("latin-1") + body)
+    results = {}
+    for part in msg.iter_parts():
+        match = re.search(r"item(\d+)", part.get("Content-ID", ""))
+        if not match:
+            continue
+        raw = part.get_payload(decode=True) or b""
+        status_line, _, rest = raw.decode("utf-8", "replace").partition("\n")
+        status = re.match(r"HTTP/[\d.]+ (\d{3})", status_line.strip())
+        results[int(match.group(1))] = (int(status.group(1)) if status else 0, rest.partition("\r\n\r\n")[2] or rest)
+    return results
+
+def is_retryable(status):
+    return status == 429 or status >= 500 or status == 0
+
+def is_daily_quota(text):
+    # Per-minute limits clear up with backoff, the daily quota does not
+    return "per day" in text.lower() or "perday" in text.lower()
+
+def backoff(attempt):
+    # Exponential backoff with jitter so the workers do not retry in step
+    time.sleep(BACKOFF_BASE * (2 ** attempt) * (0.5 + random.random() / 2))
+
+class QuotaExhausted(Exception):
+    def __init__(self, results):
+        super().__init__("daily quota exhausted")
+        self.results = results
+
+def submit_batch(session, auth, urls, endpoint=BATCH_ENDPOINT, stop=None):
+    """
+    Publish urls in one batch call and return {url: status}. The whole batch or
+    the items answered with 429/5xx are retried with exponential backoff.
+    """
+    results = {}
+    pending = list(urls)
+    refreshed = False
+    attempt = 0
+    while pending and not (stop is not None and stop.is_set()):
+        token = auth.token()
+        content_type, body = build_batch_body(pending)
+        try:
+            response = session.post(endpoint, data=body, timeout=60, headers={
+                "Authorization": f"Bearer {token}",
+                "Content-Type": content_type,
+            })
+            status, text = response.status_code, response.text if response.status_code != 200 else ""
+        except requests.RequestException as e:
+            print(f"⚠️ Batch de {len(pending)} URLs: {e}")
+            status, text = 0, str(e)
+
+        if status == 401 and not refreshed:
+            auth.refresh(token)
+            refreshed = True
+            continue
+
+        if status == 200:
+            items = parse_batch_response(response.headers.get("Content-Type", ""), response.content)
+            retry = []
+            for i, url in enumerate(pending):
+                item_status, item_text = items.get(i, (0, "missing from batch response"))
+                results[url] = item_status
+                if item_status == 429 and is_daily_quota(item_text):
+                    raise QuotaExhausted(results)
+                if is_retryable(item_status):
+                    retry.append(url)
+                elif item_status != 200:
+                    print(f"❌ Erreur ({item_status}): {url} - {item_text.strip()[:200]}")
+            pending = retry
+        elif is_retryable(status):
+            if status == 429 and is_daily_quota(text):
+                raise QuotaExhausted(results)
+        else:
+            print(f"❌ Batch refusé ({status}): {text[:200]}")
+            results.update((url, status) for url in pending)
+            break
+
+        if pending:
+            if attempt >= MAX_RETRIES:
+                if status == 429 or any(results.get(url) == 429 for url in pending):
+                    raise QuotaExhausted(results)
+                print(f"⚠️ {len(pending)} URLs abandonnées après {MAX_RETRIES} tentatives.")
+                break
+            backoff(attempt)
+            attempt += 1
+    return results
+
+def submit_urls(urls, auth, endpoint=BATCH_ENDPOINT, batch_size=BATCH_SIZE, workers=MAX_WORKERS, on_result=None):
+    """Send urls in batches from a bounded thread pool; stop everything once the quota is gone."""
+    session = make_session(workers)
+    stop = threading.Event()
+    batches = [urls[i:i + batch_size] for i in range(0, len(urls), batch_size)]
+    results = {}
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(submit_batch, session, auth, batch, endpoint, stop) for batch in batches]
+        for future in as_completed(futures):
+            try:
+                batch_results = future.result()
+            except QuotaExhausted as e:
+                if not stop.is_set():
+                    print("🛑 Quota Google atteint (429).")
+                stop.set()
+                batch_results = e.results
+            results.update(batch_results)
+            if on_result:
+                on_result(batch_results)
+    session.close()
+    return results
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Submit sitemap URLs to the Google Indexing API")
+    parser.add_argument("--endpoint", default=BATCH_ENDPOINT, help="batch endpoint (e.g. the local stand-in, indexing_stub.py)")
+    parser.add_argument("--no-auth", action="store_true", help="skip OAuth (for the local stand-in)")
+    parser.add_argument("--workers", type=int, default=MAX_WORKERS)
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--limit", type=int, default=DAILY_LIMIT, help="daily quota")
+    parser.add_argument("--state", default=DB_FILE, help="SQLite state database")
+    parser.add_argument("--sitemap", help="sitemap or sitemap index, local path or URL, optionally gzipped (default: output/sitemap.xml, then SITEMAP_URL)")
+    return parser.parse_args()
+
 def main():
+    args = parse_args()
     print("🚀 Démarrage du script d'indexation Google (Service de Bureau)...")
     
-    state = load_state()
+    db = open_state(args.state)
     today = datetime.date.today().isoformat()
-    
-    if state["last_run"] != today:
-        state["last_run"] = today
-        state["today_count"] = 0
+    used = quota_used(db, today)
+    if used == 0:
         print("📅 Nouvelle journée détectée. Compteur remis à 0.")
     
-    if state["today_count"] >= DAILY_LIMIT:
-        print(f"🛑 Limite quotidienne atteinte ({state['today_count']}/{DAILY_LIMIT}). À demain !")
+    if used >= args.limit:
+        print(f"🛑 Limite quotidienne atteinte ({used}/{args.limit}). À demain !")
         return
 
-    all_urls = get_sitemap_urls()
-    if not all_urls:
+    source = args.sitemap or find_sitemap()
+    try:
+        entries = iter_sitemap(source)
+        # Every URL of a batch counts against the daily quota
+        to_submit, lastmods, total, new, changed = select_urls(db, entries, args.limit - used)
+    except (OSError, ET.ParseError, requests.RequestException) as e:
+        print(f"❌ Erreur lors de la lecture du sitemap : {e}")
+        return
+    if not total:
         print("❌ Aucune URL trouvée.")
         return
         
-    print(f"🔍 URLs trouvées : {len(all_urls)}")
-    
-    submitted_set = set(state["submitted"])
-    to_submit = [u for u in all_urls if u not in submitted_set]
-    
-    print(f"📝 URLs restant à indexer : {len(to_submit)}")
+    print(f"🔍 URLs trouvées : {total}")
+    print(f"📝 URLs restant à indexer : {new} nouvelles, {changed} modifiées (lastmod)")
     
     if not to_submit:
         print("✅ Toutes les URLs ont déjà été soumises !")
         return
 
-    creds = get_credentials()
-    if not creds:
-        return
+    if args.no_auth:
+        auth = StaticAuth()
+    else:
+        creds = get_credentials()
+        if not creds:
+            return
+        auth = GoogleAuth(creds)
+
+    print(f"📤 Envoi de {len(to_submit)} URLs vers Google ({args.workers} threads, {args.batch_size} URLs par requête)...")
 
     count = 0
-    quota_left = DAILY_LIMIT - state["today_count"]
-    batch = to_submit[:quota_left]
-    
-    print(f"📤 Envoi de {len(batch)} URLs vers Google...")
-    
-    for url in batch:
-        try:
-            # Add auth to header
-            headers = {"Authorization": f"Bearer {creds.token}", "Content-Type": "application/json"}
-            response = requests.post(ENDPOINT, json={
-                "url": url,
-                "type": "URL_UPDATED"
-            }, headers=headers)
-            
-            if response.status_code == 200:
-                print(f"✅ OK: {url}")
-                state["submitted"].append(url)
-                state["today_count"] += 1
-                count += 1
-            elif response.status_code == 429:
-                print("🛑 Quota Google atteint (429).")
-                break
-            elif response.status_code == 401:
-                print("⚠️ Token expiré. Refreshing...")
-                creds.refresh(Request())
-                headers["Authorization"] = f"Bearer {creds.token}"
-                # Retry once
-                response = requests.post(ENDPOINT, json={"url": url, "type": "URL_UPDATED"}, headers=headers)
-                if response.status_code == 200:
-                    print(f"✅ OK (after refresh): {url}")
-                    state["submitted"].append(url)
-                    state["today_count"] += 1
-                    count += 1
-            else:
-                print(f"❌ Erreur ({response.status_code}): {url} - {response.text}")
-                
-        except Exception as e:
-            print(f"❌ Exception sur {url}: {e}")
-            
-    save_state(state)
-    print(f"🏁 Terminé. {count} URLs soumises aujourd'hui. Total soumis : {len(state['submitted'])}/{len(all_urls)}")
+
+    def record(batch_results):
+        # Called from this thread (as_completed), one transaction per batch
+        nonlocal count
+        record_results(db, batch_results, lastmods, today)
+        count += sum(1 for status in batch_results.values() if status == 200)
+
+    started = time.perf_counter()
+    submit_urls(to_submit, auth, endpoint=args.endpoint, batch_size=args.batch_size, workers=args.workers, on_result=record)
+    elapsed = time.perf_counter() - started
+
+    accepted = db.execute("SELECT COUNT(*) FROM sitemap s JOIN submissions x ON x.url = s.url WHERE x.status = 200").fetchone()[0]
+    db.close()
+    print(f"⏱️ {len(to_submit)} URLs en {elapsed:.2f}s ({len(to_submit) / elapsed if elapsed else 0:.0f} URLs/s).")
+    print(f"🏁 Terminé. {count} URLs soumises aujourd'hui. Total soumis : {accepted}/{total}")
 
 if __name__ == "__main__":
     main()
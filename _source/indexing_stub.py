@@ -0,0 +1,151 @@
+import argparse
+import http.server
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from email.parser import BytesParser
+from email.policy import HTTP
+
+# Local stand-in for the Google Indexing API, to test index_pages.py without
+# calling Google. Answers the batch endpoint (POST /batch, multipart/mixed) and
+# the single publish endpoint, with:
+#   - a daily quota (429 "Quota exceeded ... per day" once it is used up)
+#   - a per-minute rate limit (429 on the whole batch call)
+#   - random 500/503 items and a fixed latency per call
+# Usage: python indexing_stub.py [--port 8099] [--quota 200] ...
+#        python index_pages.py --no-auth --endpoint http://localhost:8099/batch
+
+PORT = 8099
+PUBLISH_PATH = "/v3/urlNotifications:publish"
+DAILY_QUOTA_ERROR = {"error": {"code": 429, "status": "RESOURCE_EXHAUSTED",
+                               "message": "Quota exceeded for quota metric 'Publish requests' and limit 'Publish requests per day'"}}
+RATE_ERROR = {"error": {"code": 429, "status": "RESOURCE_EXHAUSTED", "message": "Rate limit exceeded, retry later"}}
+
+
+class IndexingStub:
+    def __init__(self, quota=200, per_minute=600, error_rate=0.0, latency=0.0, seed=None):
+        self.quota = quota
+        self.per_minute = per_minute
+        self.error_rate = error_rate
+        self.latency = latency
+        self.random = random.Random(seed)
+        self.used = 0
+        self.calls = 0
+        self.published = []
+        self.window = []
+        self.lock = threading.Lock()
+
+    def rate_limited(self):
+        now = time.monotonic()
+        with self.lock:
+            self.calls += 1
+            self.window = [t for t in self.window if now - t < 60]
+            if len(self.window) >= self.per_minute:
+                return True
+            self.window.append(now)
+            return False
+
+    def publish(self, payload):
+        """(status, body) for one publish request."""
+        try:
+            data = json.loads(payload or b"{}")
+            url = data["url"]
+        except (ValueError, KeyError):
+            return 400, {"error": {"code": 400, "message": "Invalid JSON payload"}}
+        with self.lock:
+            if self.random.random() < self.error_rate:
+                return self.random.choice((500, 503)), {"error": {"code": 503, "message": "Backend Error"}}
+            if self.used >= self.quota:
+                return 429, DAILY_QUOTA_ERROR
+            self.used += 1
+            self.published.append(url)
+        return 200, {"urlNotificationMetadata": {"url": url, "latestUpdate": {"url": url, "type": data.get("type")}}}
+
+
+class StubHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        stub = self.server.stub
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        if stub.latency:
+            time.sleep(stub.latency)
+        if not self.headers.get("Authorization", "").startswith("Bearer "):
+            return self.send_json(401, {"error": {"code": 401, "message": "Request is missing required authentication credential"}})
+        if stub.rate_limited():
+            return self.send_json(429, RATE_ERROR)
+
+        if self.path == PUBLISH_PATH:
+            status, payload = stub.publish(body)
+            return self.send_json(status, payload)
+        if self.path != "/batch":
+            return self.send_json(404, {"error": {"code": 404, "message": "Not Found"}})
+
+        msg = BytesParser(policy=HTTP).parsebytes(f"Content-Type: {self.headers.get('Content-Type')}\r\n\r\n".encode("latin-1") + body)
+        if not msg.is_multipart():
+            return self.send_json(400, {"error": {"code": 400, "message": "Batch requests must be multipart/mixed"}})
+        parts = list(msg.iter_parts())
+        if len(parts) > 100:
+            return self.send_json(400, {"error": {"code": 400, "message": "A batch can contain at most 100 requests"}})
+
+        boundary = f"batch_{uuid.uuid4().hex}"
+        out = []
+        for part in parts:
+            raw = part.get_payload(decode=True) or b""
+            request_line, _, rest = raw.partition(b"\r\n")
+            _, _, payload = rest.partition(b"\r\n\r\n")
+            if PUBLISH_PATH.encode() in request_line:
+                status, data = stub.publish(payload.strip())
+            else:
+                status, data = 404, {"error": {"code": 404, "message": "Not Found"}}
+            content_id = re.sub(r"^<", "<response-", part.get("Content-ID", "<item>"))
+            text = json.dumps(data)
+            out.append(
+                f"--{boundary}\r\nContent-Type: application/http\r\nContent-ID: {content_id}\r\n\r\n"
+                f"HTTP/1.1 {status} {http.HTTPStatus(status).phrase}\r\n"
+                f"Content-Type: application/json; charset=UTF-8\r\nContent-Length: {len(text)}\r\n\r\n{text}\r\n"
+            )
+        out.append(f"--{boundary}--\r\n")
+        self.send_body(200, f"multipart/mixed; boundary={boundary}", "".join(out).encode("utf-8"))
+
+    def send_json(self, status, data):
+        self.send_body(status, "application/json; charset=UTF-8", json.dumps(data).encode("utf-8"))
+
+    def send_body(self, status, content_type, body):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubServer(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, stub):
+        self.stub = stub
+        super().__init__(address, StubHandler)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local stand-in for the Google Indexing API")
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--quota", type=int, default=200, help="publish requests per day")
+    parser.add_argument("--per-minute", type=int, default=600, help="HTTP calls per minute before 429")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of items answered with 500/503")
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    args = parser.parse_args()
+
+    stub = IndexingStub(args.quota, args.per_minute, args.error_rate, args.latency_ms / 1000)
+    with StubServer(("", args.port), stub) as httpd:
+        print(f"🧪 Indexing API stand-in on http://localhost:{args.port}/batch (quota {args.quota}/day)")
+        try:
+            httpd.serve_forever()
+        except KeyboardInterrupt:
+            print(f"\n👋 {stub.calls} HTTP calls, {stub.used} URLs published.")
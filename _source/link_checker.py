@@ -0,0 +1,238 @@
+import argparse
+import html
+import json
+import os
+import re
+import sys
+import time
+from urllib.parse import unquote, urljoin, urlsplit
+from build_executor import add_jobs_argument, map_chunks
+from sitemaps import BASE_URL, NICHE_DOMAINS
+
+# Offline internal link checker for output/.
+# Every HTML page is scanned for href and <script src> values (byte regexes,
+# no HTML parser) in a process pool. Each link is resolved with the routing rules of
+# worker-ultimate.js to the output file that would answer it:
+#   ok        the worker serves an existing file
+#   broken    the worker routes it to output/, but the file does not exist
+#   unrouted  the worker sends it upstream (Lovable), although output/ has a
+#             matching page, e.g. /departement/ain -> departement/ain/index.html
+#   upstream  served by Lovable (home, legal pages) or a niche-domain redirect
+#   external  another host
+# The report lists broken and unrouted links, orphan pages (no inbound link
+# from another page), pages no worker route can reach, and inbound counts.
+# Usage: python link_checker.py [-j 0] [--json report.json]
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+OUTPUT_DIR = os.path.normpath(os.path.join(BASE_DIR, "../output"))
+MAIN_HOSTS = ("agence-web-locale.fr", "www.agence-web-locale.fr")
+DOMAIN_NICHES = {domain: niche for niche, domain in NICHE_DOMAINS.items()}
+CHUNK_SIZE = 250
+
+# Case-sensitive on purpose: a literal prefix lets re skip ahead ~15x faster,
+# and every template writes lowercase href
+HREF_RE = re.compile(rb"""href\s*=\s*(?:"([^"]*)"|'([^']*)')""")
+# Script sources are checked too: the live-fields script must be in output/
+SCRIPT_SRC_RE = re.compile(rb"""<script[^>]*?\ssrc\s*=\s*"([^"]*)\"""")
+CITY_RE = re.compile(r"^/[^/]+/creation-site-internet-[^/]+$")
+# Assets the build writes itself: served from output/ only, no upstream fallback to hide a miss
+LOCAL_ASSETS = ("/assets/script.js", "/assets/live-fields.json")
+SKIPPED_SCHEMES = ("mailto:", "tel:", "javascript:", "data:", "#")
+
+OK, BROKEN, UNROUTED, UPSTREAM, EXTERNAL = "ok", "broken", "unrouted", "upstream", "external"
+
+
+def page_url(rel):
+    """Public URL the worker serves output/rel at, or None if no route reaches it."""
+    parts = rel.split("/")
+    if parts[0] == "demos" and len(parts) >= 4 and parts[1] in NICHE_DOMAINS:
+        page = "/".join(parts[3:])
+        if page == "index.html":
+            path = "/"
+        elif page.endswith(".html"):
+            path = "/" + page[:-len(".html")]
+        else:
+            path = "/" + page
+        return f"https://{parts[2]}.{NICHE_DOMAINS[parts[1]]}{path}"
+    if not rel.endswith(".html"):
+        return None
+    path = "/" + rel[:-len(".html")]
+    if CITY_RE.match(path) or (len(parts) == 1 and path.startswith(("/departement-", "/region-", "/creation-site-internet-"))):
+        return BASE_URL + path
+    return None
+
+
+def _static_match(path, files):
+    """output/ file a plain static server would answer path with."""
+    rel = path.strip("/")
+    for candidate in (rel, rel + ".html", f"{rel}/index.html" if rel else "index.html"):
+        if candidate in files:
+            return candidate
+    return None
+
+
+def _netlify(rel, files):
+    return (OK, rel) if rel in files else (BROKEN, rel)
+
+
+def resolve_main(path, files):
+    if path in ("/sitemap.xml", "/sitemap_index.xml") or path.startswith("/sitemaps/sitemap-main-"):
+        return _netlify(path[1:], files)
+    if path in LOCAL_ASSETS:
+        return _netlify(path[1:], files)
+    if path.startswith("/assets/") or path == "/robots.txt":
+        # Missing assets fall back to Lovable; robots.txt has a built-in default
+        rel = path[1:]
+        return (OK, rel) if rel in files else (UPSTREAM, path)
+    if CITY_RE.match(path) or path.startswith(("/departement-", "/region-")) or (
+            path.startswith("/creation-site-internet-") and "/" not in path[1:]):
+        return _netlify(path[1:] if path.endswith(".html") else path[1:] + ".html", files)
+    match = _static_match(path, files)
+    return (UNROUTED, match) if match and path != "/" else (UPSTREAM, path)
+
+
+def resolve_niche(host, path, domain, niche, files):
+    brand = host[:-len(domain) - 1] if host.endswith("." + domain) else ""
+    if not brand or brand == "www":
+        if path == "/sitemap.xml":
+            return _netlify(f"sitemaps/sitemap-{niche}.xml", files)
+        if path.startswith(f"/sitemaps/sitemap-{niche}-"):
+            return _netlify(path[1:], files)
+        return UPSTREAM, path  # redirected to the main site
+    if path in ("", "/"):
+        target = "/index.html"
+    elif "." not in path:
+        target = path + ".html"
+    else:
+        target = path
+    return _netlify(f"demos/{niche}/{brand}{target}", files)
+
+
+def resolve(url, files):
+    """(kind, target) for an absolute URL; target is an output/ path for ok, broken and unrouted."""
+    parts = urlsplit(url)
+    if parts.scheme not in ("http", "https"):
+        return EXTERNAL, url
+    host = (parts.hostname or "").lower()
+    path = unquote(parts.path) or "/"
+    if host in MAIN_HOSTS:
+        return resolve_main(path, files)
+    for domain, niche in DOMAIN_NICHES.items():
+        if host.endswith(domain):
+            return resolve_niche(host, path, domain, niche, files)
+    return EXTERNAL, url
+
+
+def scan_chunk(ctx, rels):
+    """[(rel, ok targets, [(kind, href, target)] for broken/unrouted, counts)] for a chunk of pages."""
+    root, files = ctx["root"], ctx["files"]
+    cache = ctx.setdefault("cache", {})
+    results = []
+    for rel in rels:
+        with open(os.path.join(root, rel), "rb") as f:
+            data = f.read()
+        base = page_url(rel) or f"{BASE_URL}/{rel}"
+        targets, problems = set(), []
+        counts = {OK: 0, BROKEN: 0, UNROUTED: 0, UPSTREAM: 0, EXTERNAL: 0}
+        hrefs = {double or single for double, single in HREF_RE.findall(data)}
+        hrefs.update(SCRIPT_SRC_RE.findall(data))
+        for raw in hrefs:
+            # Most links are absolute and shared by thousands of pages: resolve them once
+            resolved = cache.get(raw)
+            if resolved is None:
+                href = raw.decode("utf-8", "replace")
+                href = (html.unescape(href) if "&" in href else href).strip()
+                if not href or href.startswith(SKIPPED_SCHEMES):
+                    continue
+                kind, target = resolve(urljoin(base, href), files)
+                if href.startswith(("/", "http:", "https:")):
+                    cache[raw] = (href, kind, target)
+            else:
+                href, kind, target = resolved
+            counts[kind] += 1
+            if kind == OK:
+                targets.add(target)
+            elif kind in (BROKEN, UNROUTED):
+                problems.append((kind, href, target))
+        results.append((rel, targets, problems, counts))
+    return results
+
+
+def list_files(root):
+    files = set()
+    for dirpath, _, filenames in os.walk(root):
+        for name in filenames:
+            if not name.endswith(".gz") or name.endswith(".xml.gz"):
+                files.add(os.path.relpath(os.path.join(dirpath, name), root).replace(os.sep, "/"))
+    return files
+
+
+def check_links(root=OUTPUT_DIR, jobs=1):
+    files = list_files(root)
+    pages = sorted(f for f in files if f.endswith(".html"))
+    chunks = [pages[i:i + CHUNK_SIZE] for i in range(0, len(pages), CHUNK_SIZE)]
+
+    inbound = {page: 0 for page in pages}
+    broken, unrouted = {}, {}
+    totals = {OK: 0, BROKEN: 0, UNROUTED: 0, UPSTREAM: 0, EXTERNAL: 0}
+    for results in map_chunks(scan_chunk, chunks, {"root": root, "files": files}, jobs=jobs):
+        for rel, targets, problems, counts in results:
+            for target in targets:
+                if target != rel and target in inbound:
+                    inbound[target] += 1
+            for kind, href, target in problems:
+                (broken if kind == BROKEN else unrouted).setdefault(href, {"target": target, "pages": []})["pages"].append(rel)
+            for kind, count in counts.items():
+                totals[kind] += count
+
+    # Chunks finish in any order with several jobs
+    for entry in list(broken.values()) + list(unrouted.values()):
+        entry["pages"].sort()
+    return {
+        "pages": len(pages),
+        "links": totals,
+        "broken": dict(sorted(broken.items())),
+        "unrouted": dict(sorted(unrouted.items())),
+        "orphans": sorted(page for page, count in inbound.items() if count == 0),
+        "unreachable": sorted(page for page in pages if page_url(page) is None),
+        "inbound": inbound,
+    }
+
+
+def print_report(report, limit=10):
+    links = report["links"]
+    print(f"🔗 {report['pages']} pages, {sum(links.values())} links (distinct per page): "
+          + ", ".join(f"{count} {kind}" for kind, count in links.items()))
+
+    for key, label in (("broken", "Broken links"), ("unrouted", "Links the worker sends upstream although output/ has the page")):
+        entries = sorted(report[key].items(), key=lambda item: -len(item[1]["pages"]))
+        if not entries:
+            continue
+        print(f"{'❌' if key == 'broken' else '⚠️'} {label}: {len(entries)} targets")
+        for href, entry in entries[:limit]:
+            print(f"   {href} -> {entry['target']} ({len(entry['pages'])} pages, e.g. {entry['pages'][0]})")
+
+    for key, label in (("orphans", "Orphan pages (no inbound link)"), ("unreachable", "Pages no worker route serves")):
+        if report[key]:
+            print(f"⚠️ {label}: {len(report[key])}, e.g. {', '.join(report[key][:min(limit, 5)])}")
+
+    top = sorted(report["inbound"].items(), key=lambda item: -item[1])[:min(limit, 5)]
+    print("📊 Most linked: " + ", ".join(f"{page} ({count})" for page, count in top))
+
+
+if __name__ == "__main__":
+    parser = add_jobs_argument(argparse.ArgumentParser(description="Check internal links of the generated site, offline"))
+    parser.add_argument("--root", default=OUTPUT_DIR, help="output directory to check")
+    parser.add_argument("--json", help="write the full report (with inbound counts per page) to this file")
+    parser.add_argument("--limit", type=int, default=10, help="examples shown per section")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    report = check_links(args.root, jobs=args.jobs)
+    print_report(report, args.limit)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=1)
+        print(f"💾 Report written to {args.json}")
+    print(f"🏁 Checked in {time.perf_counter() - started:.2f}s.")
+    sys.exit(1 if report["broken"] else 0)
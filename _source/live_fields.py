@@ -0,0 +1,67 @@
+import json
+import os
+from output_writer import write_file
+
+# Time-dependent page fields (--live-fields on generate.py / generate_site.py).
+# By default the month, the year and the month-seeded "places restantes" are
+# written straight into every page, so every page changes each month. With
+# --live-fields each of these values is wrapped in <span data-live="key">,
+# which keeps the value of the build that rendered the page as the no-JS
+# fallback, and assets/script.js swaps in the current one from
+# output/assets/live-fields.json ({"site": {...}, "pages": {slug: {...}}}).
+# The page digests then leave the date out: a new month rewrites that one
+# file and the HTML of unchanged pages stays byte-for-byte the same.
+# The pages load assets/script.js from the served tree, so the build copies it
+# into output/assets/ next to the JSON (link_checker.py requires both).
+# Only use these keys in text content: a span in an attribute or in the
+# JSON-LD would break it.
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+LIVE_FIELDS_PATH = os.path.join(BASE_DIR, "../output/assets/live-fields.json")
+SCRIPT_SOURCE = os.path.join(BASE_DIR, "../assets/script.js")
+SCRIPT_PATH = os.path.join(BASE_DIR, "../output/assets/script.js")
+SCRIPT_URL = "/assets/script.js?v=4"
+
+FRENCH_MONTHS = {
+    1: "janvier", 2: "février", 3: "mars", 4: "avril", 5: "mai", 6: "juin",
+    7: "juillet", 8: "août", 9: "septembre", 10: "octobre", 11: "novembre", 12: "décembre"
+}
+
+def site_fields(now):
+    """Fields shared by every page."""
+    return {
+        "mois_actuel": FRENCH_MONTHS[now.month],
+        "annee_actuelle": str(now.year),
+        "dernier_site_mois": f"{FRENCH_MONTHS[now.month]} {now.year}",
+        "year": str(now.year),
+        "date_modified": now.strftime("%Y-%m-%d"),
+    }
+
+def page_fields(stats):
+    """Fields of one city page, from its page_stats.city_stats entry (the FOMO counter changes every month)."""
+    return {"places_restantes": stats["places_restantes"]}
+
+def live_span(key, value):
+    return f'<span data-live="{key}">{value}</span>'
+
+def script_tag(slug):
+    # Placed right before </body>, hence the trailing newline
+    return f'    <script src="{SCRIPT_URL}" data-page="{slug}" defer></script>\n'
+
+def add_live_fields_argument(parser):
+    parser.add_argument("--live-fields", action="store_true",
+                        help="take the month, year and FOMO counter out of the HTML into assets/live-fields.json")
+    return parser
+
+def write_live_script(path=SCRIPT_PATH):
+    """Copy assets/script.js into the served tree (nothing else puts it in output/)."""
+    with open(SCRIPT_SOURCE, "rb") as f:
+        write_file(path, f.read())
+    return path
+
+def write_live_fields(stats, now, path=LIVE_FIELDS_PATH):
+    """Write the current values of every page ({slug: city_stats entry}) and the script; rewritten only when they change."""
+    fields = {"site": site_fields(now), "pages": {slug: page_fields(stats[slug]) for slug in sorted(stats)}}
+    write_file(path, json.dumps(fields, ensure_ascii=False, separators=(",", ":")))
+    write_live_script()
+    return path
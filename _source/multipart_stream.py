@@ -0,0 +1,154 @@
+import hashlib
+import os
+import tempfile
+from email.message import Message
+from email.parser import BytesHeaderParser
+
+# Streaming multipart/form-data parser for the dashboard uploads.
+# The request body is read in fixed-size chunks; the file part goes straight
+# to a temporary file and is hashed on the way, so memory use does not depend
+# on the size of the CSV. Boundaries split across two chunks are found by
+# keeping the last len(delimiter) - 1 bytes of each chunk for the next search.
+
+CHUNK_SIZE = 64 * 1024
+MAX_HEADER_BYTES = 16 * 1024
+
+
+class MultipartError(ValueError):
+    pass
+
+
+class UploadTooLarge(MultipartError):
+    pass
+
+
+class UploadedFile:
+    def __init__(self, path, field, filename, size, sha1):
+        self.path = path
+        self.field = field
+        self.filename = filename
+        self.size = size
+        self.sha1 = sha1
+
+
+def parse_boundary(content_type):
+    """Boundary of a multipart/form-data Content-Type header, as bytes."""
+    msg = Message()
+    msg["content-type"] = content_type or ""
+    if msg.get_content_type() != "multipart/form-data":
+        raise MultipartError("Content-Type must be multipart/form-data")
+    boundary = msg.get_param("boundary")
+    if not boundary or len(boundary) > 200:
+        raise MultipartError("missing or invalid multipart boundary")
+    return boundary.encode("latin-1")
+
+
+class _Reader:
+    """Chunked reader over exactly content_length bytes of a stream."""
+
+    def __init__(self, stream, content_length, chunk_size):
+        self.stream = stream
+        self.remaining = content_length
+        self.chunk_size = chunk_size
+        # The first delimiter has no CRLF in front of it; adding one lets every
+        # delimiter be searched as CRLF--boundary
+        self.buffer = b"\r\n"
+
+    def fill(self):
+        if self.remaining <= 0:
+            return False
+        data = self.stream.read(min(self.chunk_size, self.remaining))
+        if not data:
+            raise MultipartError("request body ended before the closing boundary")
+        self.remaining -= len(data)
+        self.buffer += data
+        return True
+
+    def read_until(self, marker, limit):
+        """Bytes before marker (marker consumed); at most limit bytes are buffered."""
+        while True:
+            index = self.buffer.find(marker)
+            if index != -1:
+                data = self.buffer[:index]
+                self.buffer = self.buffer[index + len(marker):]
+                return data
+            if len(self.buffer) > limit:
+                raise MultipartError("multipart headers too long")
+            if not self.fill():
+                raise MultipartError("request body ended before the closing boundary")
+
+
+def read_upload(stream, content_length, boundary, dest_dir, field=None, max_bytes=None, chunk_size=CHUNK_SIZE):
+    """
+    Stream the first file part (or the file part named field) of a multipart body
+    to a temporary file in dest_dir and return it as an UploadedFile, or None if
+    the form had no file. Other parts are read and discarded.
+    """
+    delimiter = b"\r\n--" + boundary
+    keep = len(delimiter) - 1
+    reader = _Reader(stream, content_length, chunk_size)
+    uploaded = None
+
+    reader.read_until(delimiter, MAX_HEADER_BYTES)  # preamble
+    try:
+        while True:
+            # After a delimiter: "--" closes the body, CRLF starts a part
+            while len(reader.buffer) < 2 and reader.fill():
+                pass
+            if reader.buffer.startswith(b"--"):
+                break
+            reader.read_until(b"\r\n", MAX_HEADER_BYTES)  # transport padding
+            while len(reader.buffer) < 2 and reader.fill():
+                pass
+            if reader.buffer.startswith(b"\r\n"):
+                # No header lines: the blank line alone ends the header block
+                reader.buffer = reader.buffer[2:]
+                raw_headers = b""
+            else:
+                raw_headers = reader.read_until(b"\r\n\r\n", MAX_HEADER_BYTES)
+            headers = BytesHeaderParser().parsebytes(raw_headers + b"\r\n\r\n")
+            name = headers.get_param("name", header="content-disposition")
+            filename = headers.get_param("filename", header="content-disposition")
+            wanted = uploaded is None and filename is not None and (field is None or name == field)
+
+            out, digest, size = None, hashlib.sha1(), 0
+            if wanted:
+                fd, tmp_path = tempfile.mkstemp(dir=dest_dir, prefix=".upload-", suffix=".part")
+                out = os.fdopen(fd, "wb")
+                uploaded = UploadedFile(tmp_path, name, filename, 0, None)
+            try:
+                while True:
+                    index = reader.buffer.find(delimiter)
+                    if index != -1:
+                        data, reader.buffer = reader.buffer[:index], reader.buffer[index + len(delimiter):]
+                    else:
+                        # Keep a possible partial delimiter for the next chunk
+                        cut = max(len(reader.buffer) - keep, 0)
+                        data, reader.buffer = reader.buffer[:cut], reader.buffer[cut:]
+                    if out is not None and data:
+                        size += len(data)
+                        if max_bytes is not None and size > max_bytes:
+                            raise UploadTooLarge(f"file larger than {max_bytes} bytes")
+                        digest.update(data)
+                        out.write(data)
+                    if index != -1:
+                        break
+                    if not reader.fill():
+                        raise MultipartError("request body ended before the closing boundary")
+            finally:
+                if out is not None:
+                    out.close()
+            if wanted:
+                uploaded.size = size
+                uploaded.sha1 = digest.hexdigest()
+
+        # Epilogue after the closing delimiter is ignored, but must be consumed
+        # (a body truncated here still removes the temporary file)
+        while reader.remaining > 0:
+            reader.buffer = b""
+            reader.fill()
+    except BaseException:
+        if uploaded is not None and os.path.exists(uploaded.path):
+            os.remove(uploaded.path)
+        raise
+    return uploaded
@@ -0,0 +1,162 @@
+import json
+import os
+import re
+import tempfile
+import unicodedata
+from collections import Counter, defaultdict
+from build_manifest import MANIFEST_DIR, input_hash
+from city_records import full_row
+from data_loader import file_digest, load_json
+
+# Neighbour-link index shared by generate.py and generate_site.py.
+# Cities are linked through an adjacency graph (slug_proche_1..3 from villes.csv,
+# communes_limitrophes from the enriched JSON). Each city gets its k nearest
+# cities by breadth-first expansion, topped up with the most populated cities
+# of its department. The index is built once per build input and saved in
+# .build/, so picking the links of a page is a dictionary lookup.
+# slug_proche columns are not trusted as-is: a triple shared by many rows is
+# filler (charleville-mezieres, cagnes-sur-mer, bastia...) and is ignored, and
+# a proche edge is kept only inside the department or when the limitrophes
+# confirm it. Unconfirmed edges give a link but are never expanded further, and
+# the expansion stops at a department border, so links stay in the /{dept}/
+# silo apart from the communes that border it.
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+ENRICHED_PATH = os.path.join(BASE_DIR, "villes_enrichies_final-1.json")
+INDEX_VERSION = 2
+# A slug_proche triple repeated on this many rows or more is filler
+FILLER_TRIPLE_ROWS = 4
+
+def name_key(name):
+    text = unicodedata.normalize("NFD", str(name)).encode("ascii", "ignore").decode("ascii")
+    return re.sub(r"[^a-z0-9]+", "-", text.lower()).strip("-")
+
+def population(city):
+    try:
+        return int(city.get("population") or 0)
+    except (TypeError, ValueError):
+        return 0
+
+def load_limitrophes():
+    """Map slug -> neighbouring commune names from the enriched JSON."""
+    if not os.path.exists(ENRICHED_PATH):
+        return {}
+    limitrophes = {}
+    for row in load_json(ENRICHED_PATH):
+        names = [n.strip() for n in str(row.get("communes_limitrophes") or "").split("|")]
+        limitrophes[row.get("slug", "")] = [n for n in names if n]
+    return limitrophes
+
+def proche_triples(cities):
+    """{slug: (slug_proche_1, 2, 3)} of every city whose triple is not filler."""
+    triples = {}
+    for c in cities:
+        row = full_row(c) if "slug_proche_1" in c else c
+        triples[c["slug"]] = tuple(row.get(f"slug_proche_{i}") or "" for i in (1, 2, 3))
+    counts = Counter(triples.values())
+    return {slug: triple for slug, triple in triples.items() if counts[triple] < FILLER_TRIPLE_ROWS}
+
+def collect_edges(cities, limitrophes):
+    """Undirected adjacency {slug: {other: verified}} in declaration order (slug_proche first, then limitrophes).
+
+    Limitrophe edges are verified; a slug_proche edge is verified when the
+    limitrophes confirm it, kept unverified inside the department and dropped
+    otherwise.
+    """
+    by_slug = {c["slug"]: c for c in cities}
+    by_name = defaultdict(list)
+    for c in cities:
+        by_name[name_key(c["ville"])].append(c)
+    limitrophe_keys = {slug: {name_key(n) for n in names} for slug, names in limitrophes.items()}
+
+    edges = defaultdict(dict)
+
+    def link(a, b, verified):
+        if a != b and b in by_slug:
+            edges[a][b] = edges[a].get(b, False) or verified
+            edges[b][a] = edges[b].get(a, False) or verified
+
+    for slug, triple in proche_triples(cities).items():
+        c = by_slug[slug]
+        for other in triple:
+            o = by_slug.get(other)
+            if o is None:
+                continue
+            confirmed = (name_key(o["ville"]) in limitrophe_keys.get(slug, ())
+                         or name_key(c["ville"]) in limitrophe_keys.get(other, ()))
+            if confirmed or o.get("departement_nom") == c.get("departement_nom"):
+                link(slug, other, confirmed)
+    for c in cities:
+        for name in limitrophes.get(c["slug"], ()):
+            candidates = by_name.get(name_key(name), [])
+            # Homonyms (Saint-Denis...): prefer the one in the same department
+            same_dept = [o for o in candidates if o.get("departement_nom") == c.get("departement_nom")]
+            if same_dept or len(candidates) == 1:
+                link(c["slug"], (same_dept or candidates)[0]["slug"], True)
+    return edges
+
+def build_neighbours(cities, edges, k):
+    by_dept = defaultdict(list)
+    for c in cities:
+        by_dept[c.get("departement_nom", "")].append(c)
+    dept_ranking = {
+        dept: [c["slug"] for c in sorted(members, key=lambda c: (-population(c), c["slug"]))]
+        for dept, members in by_dept.items()
+    }
+
+    dept_of = {c["slug"]: c.get("departement_nom", "") for c in cities}
+    neighbours = {}
+    for c in cities:
+        slug, dept = c["slug"], c.get("departement_nom", "")
+        seen, picked, frontier = {slug}, [], [slug]
+        while frontier and len(picked) < k:
+            next_frontier = []
+            for current in frontier:
+                for other, verified in edges.get(current, {}).items():
+                    # An unverified edge only links the city itself and is not expanded
+                    if other in seen or len(picked) >= k or not (verified or current == slug):
+                        continue
+                    seen.add(other)
+                    picked.append(other)
+                    # Across a department border the expansion stops: only bordering communes leave the silo
+                    if verified and dept_of[other] == dept:
+                        next_frontier.append(other)
+            frontier = next_frontier
+        for other in dept_ranking.get(dept, ()):
+            if len(picked) >= k:
+                break
+            if other not in seen:
+                seen.add(other)
+                picked.append(other)
+        neighbours[slug] = picked
+    return neighbours
+
+def load_neighbour_index(name, cities, k):
+    """Return {slug: [neighbour slugs]} for cities, rebuilding .build/neighbours-<name>.json when inputs changed."""
+    path = os.path.join(MANIFEST_DIR, f"neighbours-{name}.json")
+    enriched = file_digest(ENRICHED_PATH) if os.path.exists(ENRICHED_PATH) else None
+    # City records carry a digest of their CSV row; plain dicts are hashed whole
+    inputs = input_hash(INDEX_VERSION, k, enriched, [getattr(c, "digest", None) or c for c in cities])
+    if os.path.exists(path):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                saved = json.load(f)
+            if saved.get("inputs") == inputs:
+                return saved["neighbours"]
+        except (OSError, ValueError, KeyError):
+            pass
+
+    neighbours = build_neighbours(cities, collect_edges(cities, load_limitrophes()), k)
+    os.makedirs(MANIFEST_DIR, exist_ok=True)
+    # A temporary name of its own: generators running side by side rebuild the same index
+    fd, tmp_path = tempfile.mkstemp(dir=MANIFEST_DIR, prefix=f".neighbours-{name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump({"inputs": inputs, "k": k, "neighbours": neighbours}, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    print(f"🧭 Neighbour index rebuilt ({len(neighbours)} cities, k={k}).")
+    return neighbours
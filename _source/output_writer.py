@@ -0,0 +1,162 @@
+import os
+import threading
+
+# Shared output writer for every generator.
+# A file whose bytes are already on disk is left alone (same size, then same
+# content), so its mtime does not change and the deploy step does not upload
+# it again. Changed files are written to a temporary file and renamed over the
+# old one, so readers never see a half-written page.
+#
+# Counters are kept per thread (pipeline stages run in threads) and worker
+# processes send theirs back through build_executor.run_chunks.
+
+_local = threading.local()
+
+
+class WriteStats:
+    FIELDS = ("written", "skipped", "deleted", "bytes_written", "bytes_skipped", "bytes_deleted")
+
+    def __init__(self, *values):
+        for name, value in zip(self.FIELDS, values or (0,) * len(self.FIELDS)):
+            setattr(self, name, value)
+
+    def __reduce__(self):
+        return (WriteStats, tuple(getattr(self, name) for name in self.FIELDS))
+
+    def merge(self, other):
+        for name in self.FIELDS:
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+
+
+def _stats():
+    if not hasattr(_local, "stats"):
+        _local.stats = WriteStats()
+    return _local.stats
+
+
+def take_stats():
+    """Return the counters of the current thread and start new ones."""
+    stats = _stats()
+    _local.stats = WriteStats()
+    return stats
+
+
+def merge_stats(stats):
+    _stats().merge(stats)
+
+
+def _same_content(path, data):
+    try:
+        if os.path.getsize(path) != len(data):
+            return False
+        with open(path, "rb") as f:
+            return f.read() == data
+    except OSError:
+        return False
+
+
+def _same_file(path_a, path_b, chunk_size=1024 * 1024):
+    try:
+        if os.path.getsize(path_a) != os.path.getsize(path_b):
+            return False
+        with open(path_a, "rb") as a, open(path_b, "rb") as b:
+            while True:
+                chunk = a.read(chunk_size)
+                if chunk != b.read(chunk_size):
+                    return False
+                if not chunk:
+                    return True
+    except OSError:
+        return False
+
+
+def _tmp_path(path):
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, f".{os.path.basename(path)}.{os.getpid()}.{threading.get_ident()}.tmp")
+
+
+def write_file(path, content, encoding="utf-8"):
+    """Write content (str or bytes) to path unless identical; return True if written."""
+    data = content.encode(encoding) if isinstance(content, str) else content
+    stats = _stats()
+    if _same_content(path, data):
+        stats.skipped += 1
+        stats.bytes_skipped += len(data)
+        return False
+
+    tmp_path = _tmp_path(path)
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o666)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    stats.written += 1
+    stats.bytes_written += len(data)
+    return True
+
+
+class open_output:
+    """
+    Streamed counterpart of write_file for outputs too large to build in memory:
+    with open_output(path) as f: f.write(...) writes a temporary file that
+    replaces path on exit, unless its bytes are identical.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.tmp_path = _tmp_path(path)
+        self.file = os.fdopen(os.open(self.tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o666), "wb")
+
+    def __enter__(self):
+        return self.file
+
+    def __exit__(self, exc_type, exc, tb):
+        self.file.close()
+        if exc_type is not None:
+            os.remove(self.tmp_path)
+            return False
+        size = os.path.getsize(self.tmp_path)
+        stats = _stats()
+        if _same_file(self.tmp_path, self.path):
+            os.remove(self.tmp_path)
+            stats.skipped += 1
+            stats.bytes_skipped += size
+        else:
+            os.replace(self.tmp_path, self.path)
+            stats.written += 1
+            stats.bytes_written += size
+        return False
+
+
+def delete_file(path):
+    """Remove a generated file; return True if it existed."""
+    try:
+        size = os.path.getsize(path)
+        os.remove(path)
+    except FileNotFoundError:
+        return False
+    stats = _stats()
+    stats.deleted += 1
+    stats.bytes_deleted += size
+    return True
+
+
+def format_bytes(size):
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024 or unit == "GB":
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+
+
+def report_writes(stage):
+    """Print and reset the counters of the current thread."""
+    s = take_stats()
+    print(f"💾 {stage}: {s.written} written ({format_bytes(s.bytes_written)}), "
+          f"{s.skipped} unchanged ({format_bytes(s.bytes_skipped)}), "
+          f"{s.deleted} deleted ({format_bytes(s.bytes_deleted)})")
+    return s
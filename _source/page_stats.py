@@ -0,0 +1,167 @@
+import hashlib
+import random
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Pseudo-random page fields, computed for a whole batch of pages at once:
+# the city stats and FOMO counter of generate.py, the fake contact details of
+# the demos and generate_site.get_stable_random. Nothing here touches the
+# global random module, so renders can run side by side.
+# Two modes (--stats on the generators):
+#   compat  the values the pages have always shown: each page gets its own
+#           random.Random, seeded and drawn in the order the old
+#           random.seed() calls used.
+#   hash    counter-based: draw i of a page is splitmix64(key + i * golden)
+#           where key is an 8-byte BLAKE2b of its seed, mapped to a range by
+#           multiply-and-floor. No generator state, so every column of a batch
+#           is computed at once, with NumPy when installed (same values without).
+# compat is the default: switching to hash changes the numbers on every page.
+
+MODES = ("compat", "hash")
+DEFAULT_MODE = "compat"
+
+FIRST_NAMES = ["Marc-André", "Jean-Baptiste", "Lucie", "Aurélie", "Thomas", "Antoine", "Sophie", "Élodie", "Nicolas", "Benoit"]
+LAST_NAMES = ["Valéry", "Moreau", "Lefebvre", "Roux", "Girard", "Petit", "Simon", "Bertrand", "Lauzier", "Gaillard"]
+
+MASK = (1 << 64) - 1
+GOLDEN = 0x9E3779B97F4A7C15
+
+# hash mode counters: fixed per field, so adding a field never shifts the others
+STAT_COUNTERS = {"nb_sites_realises": 0, "nb_avis": 1, "note_google": 2, "delai_jours": 3}
+FOMO_COUNTER = 16  # + month: the counter moves every month
+DEMO_COUNTERS = {
+    "first": 0, "last": 1, "phone": 2,  # 2-6: the five phone groups
+    "siret": 7, "nic": 8, "street": 9, "tva": 10, "rpps": 11, "assurance": 12, "carte": 13,  # 13-15: carte pro
+}
+
+
+def add_stats_argument(parser):
+    parser.add_argument("--stats", choices=MODES, default=DEFAULT_MODE,
+                        help="how the pseudo-random page stats are drawn (hash changes them on every page)")
+    return parser
+
+
+def seed_key(seed):
+    return int.from_bytes(hashlib.blake2b(seed.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def _mix(z):
+    # splitmix64 finalizer
+    z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & MASK
+    z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & MASK
+    return z ^ (z >> 31)
+
+
+def unit_column(keys, counter):
+    """Draw number counter of every key, as floats in [0, 1)."""
+    offset = (counter * GOLDEN) & MASK
+    if np is None:
+        return [(_mix((key + offset) & MASK) >> 11) * 2.0 ** -53 for key in keys]
+    z = np.array(keys, dtype=np.uint64) + np.uint64(offset)
+    z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    z = z ^ (z >> np.uint64(31))
+    return (z >> np.uint64(11)).astype(np.float64) * 2.0 ** -53
+
+
+def int_column(keys, counter, low, high):
+    """randint(low, high) of every key from draw number counter, as a list of ints."""
+    units, n = unit_column(keys, counter), high - low + 1
+    if np is None:
+        return [low + min(int(u * n), n - 1) for u in units]
+    return (low + np.minimum(np.floor(units * n), n - 1).astype(np.int64)).tolist()
+
+
+def city_stats(slugs, month, mode=DEFAULT_MODE):
+    """{slug: stats and FOMO counter of its page} (strings, ready for the template)."""
+    slugs = list(dict.fromkeys(slugs))
+    if mode == "compat":
+        stats = {}
+        for slug in slugs:
+            rng = random.Random(slug + "stats")
+            stats[slug] = {
+                "nb_sites_realises": str(rng.randint(45, 85)),
+                "nb_avis": str(rng.randint(110, 160)),
+                "note_google": str(round(rng.uniform(4.8, 5.0), 1)),
+                "delai_jours": str(rng.randint(7, 15)),
+                "places_restantes": str(random.Random(slug + str(month)).randint(2, 4)),
+            }
+        return stats
+
+    keys = [seed_key(slug) for slug in slugs]
+    columns = {
+        "nb_sites_realises": int_column(keys, STAT_COUNTERS["nb_sites_realises"], 45, 85),
+        "nb_avis": int_column(keys, STAT_COUNTERS["nb_avis"], 110, 160),
+        "note_google": [round(4.8 + 0.2 * float(u), 1) for u in unit_column(keys, STAT_COUNTERS["note_google"])],
+        "delai_jours": int_column(keys, STAT_COUNTERS["delai_jours"], 7, 15),
+        "places_restantes": int_column(keys, FOMO_COUNTER + month, 2, 4),
+    }
+    return {slug: {name: str(column[i]) for name, column in columns.items()} for i, slug in enumerate(slugs)}
+
+
+def _compat_demo_fields(seed, niche):
+    rng = random.Random(seed)
+    fields = {
+        "owner": f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+        "phone": f"0{rng.randint(1, 5)} {rng.randint(40, 99)} {rng.randint(10, 99)} {rng.randint(10, 99)} {rng.randint(10, 99)}",
+    }
+    # The SIRET reseeded with the same seed, and the later draws continued from it
+    rng = random.Random(seed)
+    num = "".join([str(rng.randint(0, 9)) for _ in range(9)])
+    nic = "".join([str(rng.randint(0, 9)) for _ in range(5)])
+    fields["siret"] = f"{num} {nic}"
+    fields["street"] = rng.randint(1, 150)
+    if niche == "avocat":
+        fields["tva"] = rng.randint(10, 99)
+    elif niche == "sante":
+        fields["rpps"] = "".join([str(rng.randint(0, 9)) for _ in range(11)])
+        fields["tva"] = rng.randint(10, 99)
+    elif niche == "artisan":
+        fields["assurance"] = rng.randint(100000, 999999)
+    elif niche == "immo":
+        fields["carte_pro"] = f"{rng.randint(10, 99)}01 {rng.randint(2018, 2024)} 000 0{rng.randint(100, 999)}"
+    return fields
+
+
+def demo_fields(items, mode=DEFAULT_MODE):
+    """Fake contact details of every (seed, niche) in items, in order."""
+    if mode == "compat":
+        return [_compat_demo_fields(seed, niche) for seed, niche in items]
+
+    keys = [seed_key(seed) for seed, _ in items]
+    c = DEMO_COUNTERS
+    first, last = int_column(keys, c["first"], 0, len(FIRST_NAMES) - 1), int_column(keys, c["last"], 0, len(LAST_NAMES) - 1)
+    phone = [int_column(keys, c["phone"], 1, 5)] + [int_column(keys, c["phone"] + i, *r) for i, r in enumerate(((40, 99), (10, 99), (10, 99), (10, 99)), 1)]
+    siret, nic = int_column(keys, c["siret"], 0, 10 ** 9 - 1), int_column(keys, c["nic"], 0, 10 ** 5 - 1)
+    street, tva = int_column(keys, c["street"], 1, 150), int_column(keys, c["tva"], 10, 99)
+    rpps, assurance = int_column(keys, c["rpps"], 0, 10 ** 11 - 1), int_column(keys, c["assurance"], 100000, 999999)
+    carte = [int_column(keys, c["carte"] + i, *r) for i, r in enumerate(((10, 99), (2018, 2024), (100, 999)))]
+
+    results = []
+    for i, (_, niche) in enumerate(items):
+        fields = {
+            "owner": f"{FIRST_NAMES[first[i]]} {LAST_NAMES[last[i]]}",
+            "phone": "0" + " ".join(str(group[i]) for group in phone),
+            "siret": f"{siret[i]:09d} {nic[i]:05d}",
+            "street": street[i],
+        }
+        if niche in ("avocat", "sante"):
+            fields["tva"] = tva[i]
+        if niche == "sante":
+            fields["rpps"] = f"{rpps[i]:011d}"
+        elif niche == "artisan":
+            fields["assurance"] = assurance[i]
+        elif niche == "immo":
+            fields["carte_pro"] = f"{carte[0][i]}01 {carte[1][i]} 000 0{carte[2][i]}"
+        results.append(fields)
+    return results
+
+
+def stable_randint(seed, low, high, mode=DEFAULT_MODE):
+    """One integer in [low, high] that only depends on seed."""
+    if mode == "compat":
+        return random.Random(int(hashlib.md5(seed.encode()).hexdigest(), 16)).randint(low, high)
+    return int_column([seed_key(seed)], 0, low, high)[0]
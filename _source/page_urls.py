@@ -0,0 +1,22 @@
+# URLs of the generated city pages, shared by generate.py (where the pages are
+# written), sitemaps.py (where they are listed) and preview.py. Kept apart so
+# that listing the pages does not import the generator.
+
+def slugify(text):
+    text = str(text).lower().strip()
+    replacements = [
+        (" ", "-"), ("'", "-"), ("à", "a"), ("â", "a"), ("ä", "a"),
+        ("é", "e"), ("è", "e"), ("ê", "e"), ("ë", "e"),
+        ("î", "i"), ("ï", "i"), ("ô", "o"), ("ö", "o"),
+        ("ù", "u"), ("û", "u"), ("ü", "u"), ("ç", "c"),
+        ("œ", "oe"), ("æ", "ae")
+    ]
+    for old, new in replacements:
+        text = text.replace(old, new)
+    return text
+
+def city_page_url(v, dept_name_to_slug):
+    """/{dept_slug}/creation-site-internet-{slug}: the page of city v, without .html."""
+    dept_nom = v.get("departement_nom", "")
+    dept_slug = dept_name_to_slug.get(dept_nom, slugify(dept_nom))
+    return f"/{dept_slug}/creation-site-internet-{v['slug']}"
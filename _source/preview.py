@@ -0,0 +1,126 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+import generate
+import generate_demos
+from build_manifest import input_hash
+from city_records import full_row
+from neighbour_index import load_neighbour_index
+from page_stats import city_stats
+from page_urls import city_page_url
+
+# In-memory page previews for the dashboard.
+# A city page or a demo is rendered on request with the same functions as the
+# generators, from data loaded once (and reloaded when villes.csv,
+# departements.json or a template changes). Rendered pages are kept in an LRU
+# keyed by the page's input hash (row + template + links), so an edited row
+# gives a new entry. Nothing is written to output/.
+
+PREVIEW_CACHE_SIZE = 256
+
+
+class PreviewData:
+    """Cities, templates and routes of one version of the build inputs."""
+
+    def __init__(self):
+        with open(generate.DEPARTEMENTS_PATH, "r", encoding="utf-8") as f:
+            depts_data = json.load(f)
+        villes = generate.load_data()
+        dept_name_to_slug = {d["nom"]: d["slug"] for d in depts_data}
+
+        self.template = generate.load_city_template(villes)
+        maillage_footer = generate.generate_maillage_footer(depts_data)
+        self.footer_hash = input_hash(maillage_footer)
+        self.ctx = {
+            "template": self.template,
+            "dept_name_to_slug": dept_name_to_slug,
+            "maillage_footer": maillage_footer,
+            # The preview always shows the current values inline
+            "live_fields": False,
+        }
+        self.neighbour_index = load_neighbour_index("villes", villes, k=12)
+        self.by_slug = {v["slug"]: v for v in villes}
+        self.dept_name_to_slug = dept_name_to_slug
+
+        # Later rows win, as they overwrite earlier pages in a build
+        self.cities = {}
+        for v in villes:
+            dept_slug, _, page = city_page_url(v, dept_name_to_slug)[1:].partition("/")
+            self.cities[(dept_slug, page[len("creation-site-internet-"):])] = v
+        self.demo_templates = generate_demos.load_demo_templates()
+        self.demos = {(t[1], t[3]): t for t in generate_demos.demo_tasks(villes, self.demo_templates, dept_name_to_slug)}
+
+
+def input_signature():
+    paths = [generate.VILLES_PATH, generate.DEPARTEMENTS_PATH, generate.TEMPLATE_PATH]
+    paths += [os.path.join(generate_demos.DEMOS_SOURCE_DIR, name) for name in generate_demos.NICHES.values()]
+    signature = []
+    for path in paths:
+        try:
+            st = os.stat(path)
+            signature.append((path, st.st_size, st.st_mtime_ns))
+        except OSError:
+            signature.append((path, None, None))
+    return tuple(signature)
+
+
+class SitePreview:
+    def __init__(self, max_pages=PREVIEW_CACHE_SIZE):
+        self.max_pages = max_pages
+        self.pages = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self._data = None
+        self._signature = None
+        self._lock = threading.Lock()
+
+    def data(self):
+        signature = input_signature()
+        if self._data is None or signature != self._signature:
+            started = time.perf_counter()
+            self._data = PreviewData()
+            self._signature = signature
+            print(f"👀 Preview data loaded in {time.perf_counter() - started:.2f}s ({len(self._data.cities)} cities).")
+        return self._data
+
+    def _cached(self, key, render):
+        if key in self.pages:
+            self.pages.move_to_end(key)
+            self.hits += 1
+            return self.pages[key], True
+        self.misses += 1
+        html = render()
+        self.pages[key] = html
+        while len(self.pages) > self.max_pages:
+            self.pages.popitem(last=False)
+        return html, False
+
+    def city_page(self, dept_slug, city_slug):
+        """(html, cached) for /{dept_slug}/creation-site-internet-{city_slug}, or None."""
+        # One page at a time: the LRU and the data reload are shared
+        with self._lock:
+            data = self.data()
+            v = data.cities.get((dept_slug, city_slug))
+            if v is None:
+                return None
+            now = datetime.now()
+            neighbours = generate.neighbour_links(v, data.neighbour_index, data.by_slug, data.dept_name_to_slug)
+            key = ("city", generate.page_digest(v, neighbours, data.template, data.footer_hash, now))
+            ctx = dict(data.ctx, now=now, stats=city_stats([v["slug"]], now.month))
+            return self._cached(key, lambda: generate.render_city_html(ctx, v, neighbours))
+
+    def demo_page(self, niche, brand_slug):
+        """(html, cached) for the demo of brand_slug in niche, or None."""
+        with self._lock:
+            data = self.data()
+            task = data.demos.get((niche, brand_slug))
+            if task is None:
+                return None
+            row, niche, brand_name, _, dept_slug = task
+            template = data.demo_templates[niche]
+            key = ("demo", generate_demos.demo_digest(task, template))
+            fields = generate_demos.demo_stats([task])[(generate_demos.demo_seed(row, niche), niche)]
+            return self._cached(key, lambda: generate_demos.render_demo(template, full_row(row), niche, brand_name, dept_slug, fields))
@@ -0,0 +1,221 @@
+import atexit
+import contextlib
+import os
+import sys
+import threading
+import time
+from build_manifest import MANIFEST_DIR
+
+# Opt-in build profiling (--profile on every generator and refresh_site.py).
+# Code marks its phases with `with phase("render"):`. While profiling is off,
+# phase() returns one shared no-op context manager, so an instrumented page
+# costs a few function calls and nothing is recorded.
+# With --profile, every phase is timed (count, total, max) in the main process
+# and in the pool workers (see build_executor), and written at exit as a Chrome
+# trace (chrome://tracing, https://ui.perfetto.dev, speedscope) in
+# .build/profile/, with a summary table on stdout. Extra modes:
+#   --profile cprofile     also dump cProfile stats (.prof: snakeviz, flameprof)
+#   --profile tracemalloc  also write the top allocation sites and the peak
+# cProfile and tracemalloc cover the main process only, not pool workers.
+
+PROFILE_DIR = os.path.join(MANIFEST_DIR, "profile")
+MODES = ("timers", "cprofile", "tracemalloc")
+MAX_EVENTS = 500000
+TOP_ALLOCATIONS = 30
+
+_NULL = contextlib.nullcontext()
+_profile = None
+
+
+class _Profile:
+    def __init__(self, modes):
+        self.modes = modes
+        self.origin = time.perf_counter()
+        self.totals = {}
+        self.events = []
+        self.dropped = 0
+        self.lock = threading.Lock()
+        self.profilers = []
+
+    def add(self, name, start, duration):
+        with self.lock:
+            total = self.totals.get(name)
+            if total is None:
+                self.totals[name] = [1, duration, duration]
+            else:
+                total[0] += 1
+                total[1] += duration
+                if duration > total[2]:
+                    total[2] = duration
+            if len(self.events) < MAX_EVENTS:
+                self.events.append((name, start, duration, os.getpid(), threading.get_ident()))
+            else:
+                self.dropped += 1
+
+
+class _Phase:
+    __slots__ = ("name", "start")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        _profile.add(self.name, self.start, time.perf_counter() - self.start)
+        return False
+
+
+def phase(name):
+    """Context manager timing one phase; a shared no-op while profiling is off."""
+    if _profile is None:
+        return _NULL
+    return _Phase(name)
+
+
+def enabled():
+    return _profile is not None
+
+
+def modes():
+    """Active modes, to hand to pool workers (None while profiling is off)."""
+    return _profile.modes if _profile is not None else None
+
+
+def enable(modes=("timers",)):
+    global _profile
+    if _profile is not None:
+        return
+    _profile = _Profile(tuple(modes))
+    if "cprofile" in _profile.modes:
+        import cProfile
+        profiler = cProfile.Profile()
+        _profile.profilers.append(profiler)
+        profiler.enable()
+    if "tracemalloc" in _profile.modes:
+        import tracemalloc
+        tracemalloc.start(10)
+
+
+@contextlib.contextmanager
+def thread_profiler():
+    """cProfile the calling thread (cProfile only sees the thread that enabled it)."""
+    if _profile is None or "cprofile" not in _profile.modes:
+        yield
+        return
+    import cProfile
+    profiler = cProfile.Profile()
+    with _profile.lock:
+        _profile.profilers.append(profiler)
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+
+
+def take():
+    """Timings recorded in this (worker) process since the last call, for merge()."""
+    if _profile is None:
+        return None
+    with _profile.lock:
+        data = (_profile.totals, _profile.events, _profile.dropped)
+        _profile.totals, _profile.events, _profile.dropped = {}, [], 0
+    return data
+
+
+def merge(data):
+    """Add the timings of a pool worker to this process."""
+    if _profile is None or data is None:
+        return
+    totals, events, dropped = data
+    with _profile.lock:
+        for name, (count, total, longest) in totals.items():
+            mine = _profile.totals.setdefault(name, [0, 0.0, 0.0])
+            mine[0] += count
+            mine[1] += total
+            mine[2] = max(mine[2], longest)
+        room = MAX_EVENTS - len(_profile.events)
+        _profile.events.extend(events[:room])
+        _profile.dropped += dropped + max(0, len(events) - room)
+
+
+def write_trace(path):
+    import json
+    profile = _profile
+    pids = sorted({event[3] for event in profile.events})
+    trace = [{"name": "process_name", "ph": "M", "pid": pid, "args": {"name": "main" if pid == os.getpid() else f"worker {pid}"}}
+             for pid in pids]
+    # perf_counter is a system-wide monotonic clock, so worker timestamps line up
+    trace += [{"name": name, "cat": "build", "ph": "X", "pid": pid, "tid": tid,
+               "ts": round((start - profile.origin) * 1e6, 1), "dur": round(duration * 1e6, 1)}
+              for name, start, duration, pid, tid in profile.events]
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"traceEvents": trace, "displayTimeUnit": "ms"}, f)
+
+
+def print_summary(elapsed):
+    print(f"🧪 Profile ({elapsed:.2f}s wall; phases can nest and run in several processes):")
+    print(f"   {'phase':<30}{'count':>9}{'total s':>10}{'mean ms':>10}{'max ms':>10}")
+    for name, (count, total, longest) in sorted(_profile.totals.items(), key=lambda item: -item[1][1]):
+        print(f"   {name:<30}{count:>9}{total:>10.3f}{total / count * 1000:>10.3f}{longest * 1000:>10.2f}")
+    if _profile.dropped:
+        print(f"   ({_profile.dropped} events left out of the trace, totals are complete)")
+
+
+def report(name):
+    """Print the summary and write the trace (and cProfile / tracemalloc files) for this run."""
+    if _profile is None:
+        return
+    elapsed = time.perf_counter() - _profile.origin
+    for profiler in _profile.profilers:
+        profiler.disable()
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    base = os.path.join(PROFILE_DIR, f"{name}-{time.strftime('%Y%m%d-%H%M%S')}")
+    print_summary(elapsed)
+    write_trace(base + ".trace.json")
+    print(f"💾 Chrome trace: {base}.trace.json")
+
+    if _profile.profilers:
+        import pstats
+        stats = pstats.Stats(*_profile.profilers)
+        stats.dump_stats(base + ".prof")
+        print(f"💾 cProfile stats: {base}.prof")
+    if "tracemalloc" in _profile.modes:
+        import tracemalloc
+        snapshot = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        with open(base + ".tracemalloc.txt", "w", encoding="utf-8") as f:
+            f.write(f"current {current / 1e6:.1f} MB, peak {peak / 1e6:.1f} MB\n")
+            for stat in snapshot.statistics("lineno")[:TOP_ALLOCATIONS]:
+                f.write(f"{stat}\n")
+        print(f"💾 tracemalloc (peak {peak / 1e6:.1f} MB): {base}.tracemalloc.txt")
+
+
+def parse_modes(value):
+    modes = [m.strip() for m in value.split(",") if m.strip()]
+    unknown = [m for m in modes if m not in MODES]
+    if unknown:
+        raise ValueError(f"unknown profile mode(s): {', '.join(unknown)} (choose from {', '.join(MODES)})")
+    return ("timers",) + tuple(m for m in modes if m != "timers")
+
+
+def add_profile_argument(parser):
+    parser.add_argument("--profile", nargs="?", const="timers", metavar="MODES",
+                        help="time the build phases and write a Chrome trace to .build/profile/; "
+                             "add ,cprofile and/or ,tracemalloc for more")
+    return parser
+
+
+def start_from_args(args, name=None):
+    """Enable profiling if --profile was given; the report is written at exit."""
+    if not getattr(args, "profile", None):
+        return
+    try:
+        enable(parse_modes(args.profile))
+    except ValueError as e:
+        sys.exit(f"❌ {e}")
+    name = name or os.path.splitext(os.path.basename(sys.argv[0]))[0]
+    atexit.register(report, name)
@@ -1,33 +1,137 @@
-import subprocess
-import os
+import json
 import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 
-def run_script(script_name):
-    print(f"🚀 Running {script_name}...")
-    try:
-        BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-        script_path = os.path.join(BASE_DIR, script_name)
-        # Use sys.executable to ensure we use the same python interpreter
-        result = subprocess.run([sys.executable, script_path], capture_output=True, text=True)
-        if result.returncode == 0:
-            print(f"✅ {script_name} finished successfully.")
-            if result.stdout:
-                print(result.stdout)
-        else:
-            print(f"❌ Error in {script_name}:")
-            print(result.stderr)
-            return False
-    except Exception as e:
-        print(f"❌ Exception running {script_name}: {e}")
-        return False
-    return True
+from build_executor import parse_args
+from live_fields import add_live_fields_argument
+from page_stats import DEFAULT_MODE, add_stats_argument
+import profiler
+import generate
+import generate_departements
+import generate_demos
+import generate_sitemap
+import generate_niche_sitemaps
+import compress_output
+import deploy
+import site_pack
+
+# In-process build pipeline.
+# villes.csv and departements.json are loaded once and handed to every stage.
+# Stages run as soon as their dependencies succeeded; independent stages run
+# concurrently. A failed stage skips everything that depends on it.
+# The niche demos are written to output/demos, which the worker fetches from
+# the static host. --no-export-demos skips them, for a deployment whose worker
+# routes demos to demo_server.py (which renders them on request).
+
+class Stage:
+    def __init__(self, name, run, deps=()):
+        self.name = name
+        self.run = run
+        self.deps = tuple(deps)
+
+def load_build_data():
+    with open(generate.DEPARTEMENTS_PATH, "r", encoding="utf-8") as f:
+        depts_data = json.load(f)
+    return {"villes": generate.load_data(), "depts": depts_data}
+
+def build_stages(data, jobs=1, force=False, gzip=False, live_fields=False, prune=False, pack=False, stats_mode=DEFAULT_MODE, export_demos=True):
+    villes, depts = data["villes"], data["depts"]
+    stages = [
+        Stage("generate.py", lambda: generate.generate_site(jobs=jobs, force=force, villes=villes, depts_data=depts, live_fields=live_fields, stats_mode=stats_mode)),
+        Stage("generate_departements.py", lambda: generate_departements.generate_departements(jobs=jobs, force=force, villes=villes, depts_data=depts), deps=["generate.py"]),
+        # Sitemaps take lastmod from the manifests, so they run after the pages they list
+        Stage("generate_sitemap.py", lambda: generate_sitemap.generate_sitemap(villes=villes, depts=depts), deps=["generate.py", "generate_departements.py"]),
+    ]
+    if export_demos:
+        stages.append(Stage("generate_demos.py", lambda: generate_demos.generate_demos(jobs=jobs, force=force, villes=villes, depts_data=depts, stats_mode=stats_mode), deps=["generate.py"]))
+    # lastmod comes from the demo index; with the export, the sitemaps wait for the pages they list
+    stages.append(Stage("generate_niche_sitemaps.py", lambda: generate_niche_sitemaps.generate_niche_sitemaps(villes=villes, depts=depts, stats_mode=stats_mode),
+                        deps=["generate_demos.py"] if export_demos else ()))
+    if gzip:
+        # Compresses whatever the other stages wrote, so it runs last
+        stages.append(Stage("compress_output.py", lambda: compress_output.compress_output(jobs=jobs, force=force), deps=[s.name for s in stages]))
+    if pack:
+        # Packs the finished output/ (sidecars included) into one file
+        stages.append(Stage("site_pack.py", lambda: site_pack.pack_output(gzip_missing=gzip), deps=[s.name for s in stages]))
+    # Records what this refresh added, changed or removed in output/
+    stages.append(Stage("deploy.py", lambda: deploy.update_manifest(jobs=jobs, prune_orphans=prune), deps=[s.name for s in stages]))
+    return stages
+
+def run_stage(stage):
+    # With --profile, each stage is one span of the trace and gets its own cProfile
+    with profiler.thread_profiler(), profiler.phase(stage.name):
+        stage.run()
+
+def run_pipeline(stages, max_parallel=3):
+    """Run stages in dependency order; return {name: (status, seconds)}."""
+    results = {}
+    pending = list(stages)
+    running = {}
+
+    def start(pool, stage):
+        print(f"🚀 Running {stage.name}...")
+        started = time.perf_counter()
+        future = pool.submit(run_stage, stage)
+        running[future] = (stage, started)
+
+    with ThreadPoolExecutor(max_workers=max_parallel) as pool:
+        while pending or running:
+            for stage in list(pending):
+                statuses = [results.get(dep, (None,))[0] for dep in stage.deps]
+                if any(status in ("failed", "skipped") for status in statuses):
+                    print(f"⏭️ Skipping {stage.name} (dependency failed).")
+                    results[stage.name] = ("skipped", 0.0)
+                    pending.remove(stage)
+                elif all(status == "ok" for status in statuses):
+                    pending.remove(stage)
+                    start(pool, stage)
+            if not running:
+                if pending:
+                    # Unknown dependency: nothing can run any more
+                    for stage in pending:
+                        print(f"❌ {stage.name} depends on an unknown stage: {stage.deps}")
+                        results[stage.name] = ("failed", 0.0)
+                    pending = []
+                break
+
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                stage, started = running.pop(future)
+                elapsed = time.perf_counter() - started
+                try:
+                    future.result()
+                    print(f"✅ {stage.name} finished successfully.")
+                    results[stage.name] = ("ok", elapsed)
+                except Exception as e:
+                    print(f"❌ Error in {stage.name}: {e}")
+                    results[stage.name] = ("failed", elapsed)
+    return results
+
+def print_report(results, total):
+    print("⏱️ Stage timings:")
+    for name, (status, seconds) in results.items():
+        print(f"   {name:<30} {status:<8} {seconds:7.2f}s")
+    print(f"   {'total (wall)':<30} {'':<8} {total:7.2f}s")
+
+def configure(parser):
+    parser.add_argument("--gzip", action="store_true", help="also write precompressed .gz sidecars (compress_output.py)")
+    add_live_fields_argument(parser)
+    add_stats_argument(parser)
+    parser.add_argument("--no-export-demos", dest="export_demos", action="store_false",
+                        help="do not write output/demos (only when the worker routes demos to demo_server.py)")
+    parser.add_argument("--pack", action="store_true", help="also pack output/ into one file for server.py --pack (site_pack.py)")
+    parser.add_argument("--prune", action="store_true", help="delete generated pages no stage manifest lists any more (deploy.py)")
 
 if __name__ == "__main__":
-    if run_script("generate.py"):
-        run_script("generate_departements.py")
-        run_script("generate_demos.py")
-        run_script("generate_sitemap.py")
-        run_script("generate_niche_sitemaps.py")
-        print("🏁 Full site refresh complete.")
-    else:
+    args = parse_args("Refresh the whole site in one process", configure=configure)
+    started = time.perf_counter()
+    with profiler.phase("load data"):
+        data = load_build_data()
+    print(f"📦 Loaded {len(data['villes'])} cities and {len(data['depts'])} departments in {time.perf_counter() - started:.2f}s")
+    results = run_pipeline(build_stages(data, jobs=args.jobs, force=args.force, gzip=args.gzip, live_fields=args.live_fields, prune=args.prune, pack=args.pack, stats_mode=args.stats, export_demos=args.export_demos))
+    print_report(results, time.perf_counter() - started)
+    if results.get("generate.py", ("failed",))[0] != "ok":
         print("❌ Site generation failed.")
+        sys.exit(1)
+    print("🏁 Full site refresh complete.")
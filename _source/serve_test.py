@@ -1,18 +1,14 @@
-import http.server
-import socketserver
 import os
+from static_server import make_server, parse_server_args
 
 PORT = 8081
 # Serve the output directory relative to this script
 DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "../output")
 
-class Handler(http.server.SimpleHTTPRequestHandler):
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, directory=DIRECTORY, **kwargs)
-
+args = parse_server_args(PORT, "Serve the generated site for testing")
 try:
-    with socketserver.TCPServer(("", PORT), Handler) as httpd:
-        print(f"🎉 Serving TEST on http://localhost:{PORT}")
+    with make_server(DIRECTORY, args.port, cache_mb=args.cache_mb, quiet=args.quiet) as httpd:
+        print(f"🎉 Serving TEST on http://localhost:{args.port}")
         httpd.serve_forever()
 except OSError:
-    print(f"⚠️ Port {PORT} busy. Check if previous server is still running.")
+    print(f"⚠️ Port {args.port} busy. Check if previous server is still running.")
@@ -1,22 +1,32 @@
-import http.server
-import socketserver
 import os
+from site_pack import PACK_PATH, make_pack_server
+from static_server import make_server, parse_server_args
 
 PORT = 8000
 DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "output")
 
-class Handler(http.server.SimpleHTTPRequestHandler):
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, directory=DIRECTORY, **kwargs)
+def add_pack_argument(parser):
+    parser.add_argument("--pack", nargs="?", const=PACK_PATH,
+                        help="serve a site pack (site_pack.py) instead of the directory")
+
+def serve(httpd):
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        print("\n👋 Server stopped.")
 
 if __name__ == "__main__":
-    if not os.path.exists(DIRECTORY):
-        os.makedirs(DIRECTORY)
-    
-    with socketserver.TCPServer(("", PORT), Handler) as httpd:
-        print(f"🚀 Serving Agence Web Locale at http://localhost:{PORT}")
-        print(f"📂 Output directory: {DIRECTORY}")
-        try:
-            httpd.serve_forever()
-        except KeyboardInterrupt:
-            print("\n👋 Server stopped.")
+    args = parse_server_args(PORT, "Serve the generated site", configure=add_pack_argument)
+    if args.pack:
+        with make_pack_server(args.pack, args.port, quiet=args.quiet) as httpd:
+            print(f"🚀 Serving Agence Web Locale at http://localhost:{args.port}")
+            print(f"📦 Site pack: {args.pack} ({len(httpd.site.routes)} routes, memory-mapped)")
+            serve(httpd)
+    else:
+        if not os.path.exists(DIRECTORY):
+            os.makedirs(DIRECTORY)
+
+        with make_server(DIRECTORY, args.port, cache_mb=args.cache_mb, quiet=args.quiet) as httpd:
+            print(f"🚀 Serving Agence Web Locale at http://localhost:{args.port}")
+            print(f"📂 Output directory: {DIRECTORY} ({len(httpd.site.routes)} routes, {args.cache_mb:g} MB cache)")
+            serve(httpd)
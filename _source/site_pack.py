@@ -0,0 +1,170 @@
+import argparse
+import email.utils
+import hashlib
+import json
+import mmap
+import os
+import struct
+import time
+from build_manifest import MANIFEST_DIR, OUTPUT_ROOT
+from output_writer import format_bytes, open_output, report_writes
+from static_server import StaticHandler, StaticServer, accepts_gzip, build_route_table, clean_path, content_type
+
+# Single-file site pack: the whole output/ in one file, for fast copies and a
+# server that starts without walking 8,900 files.
+# Layout: a 24-byte header (magic, index offset, index length), the file
+# bodies one after the other (identical bodies stored once), then a JSON index:
+#   {"files": {key: {"offset", "length", "type", "etag", "mtime", "gzip": [offset, length]}},
+#    "routes": {url: key}}
+# Routes follow static_server.build_route_table (clean URLs, folder indexes).
+# The gzip variant is the page's up-to-date .gz sidecar (compress_output.py)
+# or, with --gzip, compressed here.
+# server.py --pack memory-maps the pack and answers every request with a
+# slice of the map: nothing is read or copied per request.
+# Usage: python site_pack.py [--out .build/site.pack] [--gzip]
+#        python server.py --pack [.build/site.pack]
+
+PACK_PATH = os.path.join(MANIFEST_DIR, "site.pack")
+MAGIC = b"AWLPACK1"
+HEADER = struct.Struct("<8sQQ")
+
+
+def read_sidecar(path, page_mtime):
+    """Bytes of path's .gz sidecar, unless it is missing or older than the page."""
+    try:
+        st = os.stat(path + ".gz")
+        if st.st_mtime_ns < page_mtime:
+            return None
+        with open(path + ".gz", "rb") as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+def write_pack(root=OUTPUT_ROOT, path=PACK_PATH, gzip_missing=False):
+    """Pack every file served from root into path; return the number of files."""
+    # Only the build needs these (and their process pool imports), not the server
+    from compress_output import COMPRESSIBLE, gzip_bytes
+    routes = build_route_table(root)
+    keys = sorted(set(routes.values()))
+    files = {}
+    blobs = {}  # sha1 of a body -> (offset, length)
+
+    with open_output(path) as f:
+        f.write(HEADER.pack(MAGIC, 0, 0))
+
+        def add(data, digest):
+            if digest not in blobs:
+                blobs[digest] = (f.tell(), len(data))
+                f.write(data)
+            return blobs[digest]
+
+        for key in keys:
+            full = os.path.join(root, key)
+            with open(full, "rb") as src:
+                data = src.read()
+                st = os.fstat(src.fileno())
+            digest = hashlib.sha1(data).hexdigest()
+            offset, length = add(data, digest)
+            entry = {"offset": offset, "length": length, "type": content_type(key),
+                     "etag": f'"{digest[:20]}"', "mtime": int(st.st_mtime)}
+            packed = read_sidecar(full, st.st_mtime_ns)
+            if packed is None and gzip_missing and key.endswith(COMPRESSIBLE):
+                packed = gzip_bytes(data)
+            if packed is not None and len(packed) < len(data):
+                entry["gzip"] = add(packed, hashlib.sha1(packed).hexdigest())
+            files[key.replace(os.sep, "/")] = entry
+
+        index = json.dumps({"files": files, "routes": {url: key.replace(os.sep, "/") for url, key in routes.items()}},
+                           ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        index_offset = f.tell()
+        f.write(index)
+        f.seek(0)
+        f.write(HEADER.pack(MAGIC, index_offset, len(index)))
+    return len(files)
+
+
+def pack_output(root=OUTPUT_ROOT, path=PACK_PATH, gzip_missing=False):
+    print(f"📦 Packing {root}...")
+    started = time.perf_counter()
+    count = write_pack(root, path, gzip_missing=gzip_missing)
+    report_writes("pack")
+    print(f"🏁 {count} files packed into {path} ({format_bytes(os.path.getsize(path))}) "
+          f"in {time.perf_counter() - started:.2f}s")
+
+
+class SitePack:
+    """A site pack mapped read-only in memory."""
+
+    def __init__(self, path=PACK_PATH, quiet=False):
+        self.path = path
+        self.quiet = quiet
+        with open(path, "rb") as f:
+            # The map stays valid after the file is closed
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, index_offset, index_length = HEADER.unpack_from(self.map, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a site pack")
+        index = json.loads(self.map[index_offset:index_offset + index_length])
+        self.files = index["files"]
+        self.routes = index["routes"]
+        self.view = memoryview(self.map)
+
+    def lookup(self, url_path):
+        key = self.routes.get(url_path)
+        return self.files.get(key) if key is not None else None
+
+    def body(self, entry, gzip=False):
+        offset, length = entry["gzip"] if gzip else (entry["offset"], entry["length"])
+        return self.view[offset:offset + length]
+
+
+class PackHandler(StaticHandler):
+    """StaticHandler answering from a SitePack instead of the disk."""
+
+    def serve(self, send_body):
+        pack = self.server.site
+        url_path = clean_path(self.path)
+        entry = pack.lookup(url_path) if url_path else None
+        if entry is None:
+            self.send_error(404, "File not found")
+            return
+
+        has_gzip = "gzip" in entry
+        gzip = has_gzip and accepts_gzip(self.headers.get("Accept-Encoding"))
+        etag = entry["etag"][:-1] + '-gz"' if gzip else entry["etag"]
+        last_modified = email.utils.formatdate(entry["mtime"], usegmt=True)
+        if self.not_modified(etag, entry["mtime"]):
+            self.send_response(304)
+            self.send_validators(etag, last_modified, has_gzip)
+            self.end_headers()
+            return
+
+        body = pack.body(entry, gzip)
+        self.send_response(200)
+        self.send_header("Content-Type", entry["type"])
+        self.send_header("Content-Length", str(len(body)))
+        if gzip:
+            self.send_header("Content-Encoding", "gzip")
+        self.send_validators(etag, last_modified, has_gzip)
+        self.end_headers()
+        if send_body:
+            # Straight from the mapped pages to the socket
+            self.wfile.write(body)
+
+
+class PackServer(StaticServer):
+    handler_class = PackHandler
+
+
+def make_pack_server(path, port, host="", quiet=False):
+    return PackServer((host, port), SitePack(path, quiet=quiet))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pack output/ into one file that server.py --pack can serve")
+    parser.add_argument("--root", default=OUTPUT_ROOT, help="directory to pack")
+    parser.add_argument("--out", default=PACK_PATH, help="pack file to write")
+    parser.add_argument("--gzip", action="store_true", help="compress text files that have no up-to-date .gz sidecar")
+    args = parser.parse_args()
+    pack_output(args.root, args.out, gzip_missing=args.gzip)
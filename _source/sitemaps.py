@@ -0,0 +1,165 @@
+import gzip
+import os
+import re
+from xml.sax.saxutils import escape
+from build_manifest import OUTPUT_ROOT, load_lastmods, output_key
+from output_writer import delete_file, open_output, write_file
+from page_urls import city_page_url
+
+# Sitemaps of the main site and of the six niche domains.
+# URLs are streamed into numbered gzipped files ({name}-1.xml.gz, ...), split at
+# the protocol limits (50,000 URLs or 50 MB uncompressed per file), and listed
+# in a sitemap index. lastmod is the date the page's build-manifest hash last
+# changed, so it only moves when the page itself is rebuilt with new inputs.
+# Pages with no manifest entry (the homepage) get no lastmod.
+
+BASE_URL = "https://agence-web-locale.fr"
+SITEMAP_DIR = os.path.join(OUTPUT_ROOT, "sitemaps")
+SITEMAP_NS = "http://www.sitemaps.org/schemas/sitemap/0.9"
+MAX_URLS = 50000
+MAX_BYTES = 50 * 1024 * 1024
+
+NICHE_DOMAINS = {
+    "restaurant": "sites-restaurants.fr",
+    "artisan": "sitesartisans.fr",
+    "beaute": "sites-beaute.fr",
+    "immo": "sites-immobiliers.fr",
+    "avocat": "sites-avocats.fr",
+    "sante": "sites-sante.fr"
+}
+
+URLSET_OPEN = f'<?xml version="1.0" encoding="UTF-8"?>\n<urlset xmlns="{SITEMAP_NS}">\n'.encode("utf-8")
+URLSET_CLOSE = b"</urlset>\n"
+
+
+class SitemapWriter:
+    """
+    Streams <url> entries into {directory}/{name}-{n}.xml.gz, starting a new file
+    whenever the next entry would break max_urls or max_bytes. close() returns
+    (loc, lastmod) of every file written, for the sitemap index.
+    """
+
+    def __init__(self, directory, name, base_url, max_urls=MAX_URLS, max_bytes=MAX_BYTES):
+        self.directory = directory
+        self.name = name
+        self.base_url = base_url.rstrip("/")
+        self.max_urls = max_urls
+        self.max_bytes = max_bytes
+        self.files = []
+        self.count = 0
+        self._output = None
+        self._gz = None
+        self._urls = 0
+        self._bytes = 0
+        self._lastmod = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        elif self._output is not None:
+            self._gz.close()
+            self._output.__exit__(exc_type, exc, tb)
+        return False
+
+    def add(self, loc, lastmod=None, priority=None):
+        entry = f"  <url><loc>{escape(loc)}</loc>"
+        if lastmod:
+            entry += f"<lastmod>{lastmod}</lastmod>"
+        if priority is not None:
+            entry += f"<priority>{priority}</priority>"
+        data = (entry + "</url>\n").encode("utf-8")
+
+        full = self._urls >= self.max_urls or self._bytes + len(data) + len(URLSET_CLOSE) > self.max_bytes
+        if self._output is not None and full:
+            self._finish_file()
+        if self._output is None:
+            self._start_file()
+        self._gz.write(data)
+        self._urls += 1
+        self._bytes += len(data)
+        self.count += 1
+        if lastmod and (self._lastmod is None or lastmod > self._lastmod):
+            self._lastmod = lastmod
+
+    def _file_name(self, number):
+        return f"{self.name}-{number}.xml.gz"
+
+    def _start_file(self):
+        path = os.path.join(self.directory, self._file_name(len(self.files) + 1))
+        self._output = open_output(path)
+        # Fixed mtime and no file name in the header: same URLs, same bytes
+        self._gz = gzip.GzipFile(filename="", mode="wb", compresslevel=9, fileobj=self._output.__enter__(), mtime=0)
+        self._gz.write(URLSET_OPEN)
+        self._urls = 0
+        self._bytes = len(URLSET_OPEN)
+        self._lastmod = None
+
+    def _finish_file(self):
+        self._gz.write(URLSET_CLOSE)
+        self._gz.close()
+        self._output.__exit__(None, None, None)
+        self.files.append((f"{self.base_url}/{self._file_name(len(self.files) + 1)}", self._lastmod))
+        self._output = None
+        self._gz = None
+
+    def close(self):
+        """Finish the current file, drop numbered files left by a larger run and return the file list."""
+        if self._output is None and not self.files:
+            self._start_file()  # an empty urlset is still a valid sitemap
+        if self._output is not None:
+            self._finish_file()
+        pattern = re.compile(rf"^{re.escape(self.name)}-(\d+)\.xml\.gz$")
+        if os.path.isdir(self.directory):
+            for entry in os.listdir(self.directory):
+                match = pattern.match(entry)
+                if match and int(match.group(1)) > len(self.files):
+                    delete_file(os.path.join(self.directory, entry))
+        return self.files
+
+
+def write_index(path, sitemaps):
+    """Write a sitemap index listing (loc, lastmod) pairs."""
+    lines = ['<?xml version="1.0" encoding="UTF-8"?>', f'<sitemapindex xmlns="{SITEMAP_NS}">']
+    for loc, lastmod in sitemaps:
+        lastmod_tag = f"<lastmod>{lastmod}</lastmod>" if lastmod else ""
+        lines.append(f"  <sitemap><loc>{escape(loc)}</loc>{lastmod_tag}</sitemap>")
+    lines.append("</sitemapindex>\n")
+    write_file(path, "\n".join(lines))
+
+
+def main_site_urls(villes, depts):
+    """(loc, lastmod, priority) of the homepage, department hubs and city pages."""
+    hub_lastmods = load_lastmods("departements")
+    city_lastmods = load_lastmods("villes")
+    dept_name_to_slug = {d["nom"]: d["slug"] for d in depts}
+
+    yield f"{BASE_URL}/", None, "1.0"
+    for d in depts:
+        key = output_key(os.path.join(OUTPUT_ROOT, "departement", d["slug"], "index.html"))
+        yield f"{BASE_URL}/departement/{d['slug']}", hub_lastmods.get(key), "0.9"
+
+    seen = set()
+    for v in villes:
+        if not v.get("slug"):
+            continue
+        url = city_page_url(v, dept_name_to_slug)
+        if url in seen:
+            continue
+        seen.add(url)
+        key = output_key(os.path.join(OUTPUT_ROOT, url[1:] + ".html"))
+        yield f"{BASE_URL}{url}", city_lastmods.get(key), "0.8"
+
+
+def niche_urls(demo_tasks, niche, lastmods):
+    """(loc, lastmod) of the demos of one niche, served at https://{brand}.{domain}/ (lastmods: generate_demos.demo_lastmods)."""
+    domain = NICHE_DOMAINS[niche]
+    seen = set()
+    for _, task_niche, _, brand_slug, _ in demo_tasks:
+        if task_niche != niche or brand_slug in seen:
+            continue
+        seen.add(brand_slug)
+        key = output_key(os.path.join(OUTPUT_ROOT, "demos", niche, brand_slug, "index.html"))
+        yield f"https://{brand_slug}.{domain}/", lastmods.get(key)
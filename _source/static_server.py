@@ -0,0 +1,304 @@
+import argparse
+import email.utils
+import http.server
+import mimetypes
+import os
+import posixpath
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import unquote, urlsplit
+
+# Static file server shared by server.py and serve_test.py.
+# - one thread per connection (ThreadingHTTPServer), HTTP/1.1 keep-alive
+# - clean URLs resolved from a route table built at startup, with the same
+#   rules as worker-ultimate.js (/dept/creation-site-internet-slug -> .html,
+#   /departement/slug -> index.html)
+# - small files kept in an LRU cache of bytes bounded in MB, larger ones sent
+#   with sendfile
+# - ETag / Last-Modified validation (304) and precompressed .gz sidecars
+#   (compress_output.py) for clients accepting gzip, unless older than the page
+
+DEFAULT_CACHE_MB = 64
+# A cached file is checked against the disk at most once per interval
+REVALIDATE_SECONDS = 1.0
+TEXT_TYPES = ("text/", "application/javascript", "application/json", "application/xml", "image/svg+xml")
+
+def accepts_gzip(header):
+    """True if an Accept-Encoding header allows gzip (explicitly or through '*')."""
+    wildcard = False
+    for part in (header or "").split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        name = name.strip().lower()
+        if name in ("gzip", "x-gzip"):
+            return q > 0
+        if name == "*":
+            wildcard = q > 0
+    return wildcard
+
+def content_type(path):
+    ctype, encoding = mimetypes.guess_type(path)
+    if encoding == "gzip":
+        # Served as-is (sitemap-*.xml.gz), not as a Content-Encoding of the inner type
+        return "application/gzip"
+    ctype = ctype or "application/octet-stream"
+    if ctype.startswith(TEXT_TYPES):
+        ctype += "; charset=utf-8"
+    return ctype
+
+def clean_path(url):
+    """Normalised URL path, or None if it tries to leave the site root."""
+    path = unquote(urlsplit(url).path)
+    trailing = path.endswith("/")
+    path = posixpath.normpath("/" + path.lstrip("/"))
+    if "\0" in path or any(part == ".." for part in path.split("/")):
+        return None
+    return path + "/" if trailing and path != "/" else path
+
+def url_routes(rel_path):
+    """Every URL a file under the site root answers to."""
+    url = "/" + rel_path.replace(os.sep, "/")
+    routes = [url]
+    if url.endswith("/index.html"):
+        folder = url[:-len("index.html")]
+        routes += [folder, folder.rstrip("/") or "/"]
+    elif url.endswith(".html"):
+        routes.append(url[:-len(".html")])
+    return routes
+
+def build_route_table(root):
+    table = {}
+    for dirpath, _, filenames in os.walk(root):
+        names = set(filenames)
+        for name in filenames:
+            # .gz sidecars are sent for their page; a .gz without a page is a file of its own
+            if name.endswith(".tmp") or (name.endswith(".gz") and name[:-3] in names):
+                continue
+            rel_path = os.path.relpath(os.path.join(dirpath, name), root)
+            for route in url_routes(rel_path):
+                # An explicit file wins over a folder index with the same URL
+                if route not in table or route.endswith(".html"):
+                    table[route] = rel_path
+    return table
+
+
+class CacheEntry:
+    __slots__ = ("body", "signature", "checked")
+
+    def __init__(self, body, signature):
+        self.body = body
+        self.signature = signature
+        self.checked = time.monotonic()
+
+
+class ByteCache:
+    """Thread-safe LRU of file bytes bounded by their total size."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.max_item = max_bytes // 8
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, path):
+        with self._lock:
+            entry = self._items.get(path)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(path)
+            self.hits += 1
+            return entry
+
+    def put(self, path, entry):
+        if len(entry.body) > self.max_item:
+            return
+        with self._lock:
+            old = self._items.pop(path, None)
+            if old is not None:
+                self.size -= len(old.body)
+            self._items[path] = entry
+            self.size += len(entry.body)
+            while self.size > self.max_bytes:
+                _, evicted = self._items.popitem(last=False)
+                self.size -= len(evicted.body)
+
+    def discard(self, path):
+        with self._lock:
+            entry = self._items.pop(path, None)
+            if entry is not None:
+                self.size -= len(entry.body)
+
+
+def signature(st):
+    return (st.st_size, st.st_mtime_ns)
+
+
+def fresh_sidecar(path, st):
+    """Whether path.gz exists and is not older than the page (st): a refresh without --gzip leaves stale ones."""
+    try:
+        return os.stat(path + ".gz").st_mtime_ns >= st.st_mtime_ns
+    except OSError:
+        return False
+
+
+class StaticHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "AgenceWebLocale/1.0"
+    # Headers and body go out in two writes: without TCP_NODELAY a keep-alive
+    # client waits ~40 ms (delayed ACK) for the body
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        self.serve(send_body=True)
+
+    def do_HEAD(self):
+        self.serve(send_body=False)
+
+    def resolve(self, url_path):
+        site = self.server.site
+        rel_path = site.routes.get(url_path)
+        if rel_path is None:
+            # Pages written after startup: same rules, checked on disk once
+            for candidate in (url_path, url_path + ".html", url_path.rstrip("/") + "/index.html"):
+                full = os.path.join(site.root, candidate.lstrip("/"))
+                if os.path.isfile(full):
+                    rel_path = os.path.relpath(full, site.root)
+                    site.routes[url_path] = rel_path
+                    break
+        return os.path.join(site.root, rel_path) if rel_path else None
+
+    def serve(self, send_body):
+        url_path = clean_path(self.path)
+        path = self.resolve(url_path) if url_path else None
+        if path is None:
+            self.send_error(404, "File not found")
+            return
+
+        try:
+            # Validators come from the page itself, the body maybe from its sidecar
+            st = os.stat(path)
+        except OSError:
+            self.server.site.routes.pop(url_path, None)
+            self.send_error(404, "File not found")
+            return
+        has_sidecar = fresh_sidecar(path, st)
+        gzip = has_sidecar and accepts_gzip(self.headers.get("Accept-Encoding"))
+        etag = f'"{st.st_size:x}-{st.st_mtime_ns:x}{"-gz" if gzip else ""}"'
+        last_modified = email.utils.formatdate(st.st_mtime, usegmt=True)
+        if self.not_modified(etag, st.st_mtime):
+            self.send_response(304)
+            self.send_validators(etag, last_modified, has_sidecar)
+            self.end_headers()
+            return
+
+        try:
+            body, f, length = self.load_body(path + ".gz" if gzip else path)
+        except OSError:
+            self.send_error(404, "File not found")
+            return
+        try:
+            self.send_response(200)
+            self.send_header("Content-Type", content_type(path))
+            self.send_header("Content-Length", str(length))
+            if gzip:
+                self.send_header("Content-Encoding", "gzip")
+            self.send_validators(etag, last_modified, has_sidecar)
+            self.end_headers()
+            if not send_body:
+                return
+            if body is not None:
+                self.wfile.write(body)
+            else:
+                self.connection.sendfile(f)
+        finally:
+            if f is not None:
+                f.close()
+
+    def load_body(self, path):
+        """(bytes, None, length) from the cache, or (None, open file, length) for sendfile."""
+        cache = self.server.site.cache
+        entry = cache.get(path)
+        now = time.monotonic()
+        if entry is not None and now - entry.checked < REVALIDATE_SECONDS:
+            return entry.body, None, len(entry.body)
+
+        f = open(path, "rb")
+        st = os.fstat(f.fileno())
+        if entry is not None and entry.signature == signature(st):
+            f.close()
+            entry.checked = now
+            return entry.body, None, len(entry.body)
+        if st.st_size > cache.max_item:
+            cache.discard(path)
+            return None, f, st.st_size
+        with f:
+            body = f.read()
+        cache.put(path, CacheEntry(body, signature(st)))
+        return body, None, len(body)
+
+    def not_modified(self, etag, mtime):
+        if_none_match = self.headers.get("If-None-Match")
+        if if_none_match is not None:
+            tags = [t.strip().removeprefix("W/") for t in if_none_match.split(",")]
+            return "*" in tags or etag in tags
+        if_modified_since = self.headers.get("If-Modified-Since")
+        if if_modified_since:
+            try:
+                since = email.utils.parsedate_to_datetime(if_modified_since)
+            except (TypeError, ValueError):
+                return False
+            return since is not None and int(mtime) <= since.timestamp()
+        return False
+
+    def send_validators(self, etag, last_modified, vary):
+        self.send_header("ETag", etag)
+        self.send_header("Last-Modified", last_modified)
+        if vary:
+            self.send_header("Vary", "Accept-Encoding")
+
+    def log_message(self, format, *args):
+        if not self.server.site.quiet:
+            super().log_message(format, *args)
+
+
+class Site:
+    def __init__(self, root, cache_mb=DEFAULT_CACHE_MB, quiet=False):
+        self.root = os.path.abspath(root)
+        self.routes = build_route_table(self.root)
+        self.cache = ByteCache(int(cache_mb * 1024 * 1024))
+        self.quiet = quiet
+
+
+class StaticServer(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+    handler_class = StaticHandler
+
+    def __init__(self, address, site):
+        self.site = site
+        super().__init__(address, self.handler_class)
+
+
+def make_server(root, port, cache_mb=DEFAULT_CACHE_MB, host="", quiet=False):
+    return StaticServer((host, port), Site(root, cache_mb=cache_mb, quiet=quiet))
+
+def parse_server_args(port, description=None, configure=None):
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument("--port", type=int, default=port)
+    parser.add_argument("--cache-mb", type=float, default=DEFAULT_CACHE_MB,
+                        help="memory kept for file bytes (0 = always read from disk)")
+    parser.add_argument("--quiet", action="store_true", help="do not log every request")
+    if configure:
+        configure(parser)
+    return parser.parse_args()
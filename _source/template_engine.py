@@ -0,0 +1,56 @@
+import hashlib
+import os
+import re
+
+# Shared template engine for every generator.
+# A template is parsed once into literal segments and placeholder slots, then
+# each page is rendered with a single join instead of one str.replace per key.
+
+PLACEHOLDER_RE = re.compile(r"\{\{([^{}]+)\}\}")
+
+
+class CompiledTemplate:
+    def __init__(self, source, name="template"):
+        self.name = name
+        self.hash = hashlib.sha1(source.encode("utf-8")).hexdigest()
+        self.parts = []  # literal segments interleaved with the raw placeholders
+        self.slots = []  # (index in parts, key)
+        pos = 0
+        for match in PLACEHOLDER_RE.finditer(source):
+            self.parts.append(source[pos:match.start()])
+            self.slots.append((len(self.parts), match.group(1)))
+            # A placeholder without a value is kept verbatim, like str.replace did
+            self.parts.append(match.group(0))
+            pos = match.end()
+        self.parts.append(source[pos:])
+        self.placeholders = frozenset(key for _, key in self.slots)
+
+    def check(self, known=None, required=()):
+        """Return (unknown, missing): placeholders no key will fill, and required keys the template lacks."""
+        unknown = sorted(self.placeholders - set(known)) if known is not None else []
+        missing = sorted(set(required) - self.placeholders)
+        return unknown, missing
+
+    def render(self, values):
+        parts = self.parts[:]
+        for index, key in self.slots:
+            if key in values:
+                parts[index] = str(values[key])
+        return "".join(parts)
+
+
+def compile_template(source, name="template", known=None, required=()):
+    """Parse a template and print a warning for unknown or missing placeholders."""
+    template = CompiledTemplate(source, name)
+    unknown, missing = template.check(known, required)
+    if unknown:
+        print(f"⚠️ {name}: {len(unknown)} placeholder(s) without a value: {', '.join(unknown[:10])}{' ...' if len(unknown) > 10 else ''}")
+    if missing:
+        print(f"⚠️ {name}: missing placeholder(s): {', '.join(missing)}")
+    return template
+
+
+def load_template(path, known=None, required=()):
+    with open(path, "r", encoding="utf-8") as f:
+        source = f.read()
+    return compile_template(source, name=os.path.basename(path), known=known, required=required)
@@ -17,3 +17,23 @@ document.addEventListener('DOMContentLoaded', () => {
     window.addEventListener('scroll', revealOnScroll);
     revealOnScroll(); // Trigger once on load
 });
+
+// Dated fields (generate.py --live-fields): the page holds the values of its
+// last build, replaced here by the current ones from live-fields.json
+const livePage = document.currentScript ? document.currentScript.dataset.page : null;
+document.addEventListener('DOMContentLoaded', () => {
+    const slots = document.querySelectorAll('[data-live]');
+    if (!slots.length) return;
+
+    fetch('/assets/live-fields.json')
+        .then((response) => (response.ok ? response.json() : null))
+        .then((fields) => {
+            if (!fields) return;
+            const values = Object.assign({}, fields.site, (fields.pages || {})[livePage]);
+            slots.forEach((slot) => {
+                const value = values[slot.dataset.live];
+                if (value !== undefined) slot.textContent = value;
+            });
+        })
+        .catch(() => {}); // keep the built-in values
+});
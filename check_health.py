@@ -1,4 +1,5 @@
-import requests
+import sys
+from health_probe import Target, parse_probe_args, run_cli
 
 domains = [
     "https://agence-web-locale.fr",
@@ -12,16 +13,19 @@ domains = [
     "https://sites-sante.fr"
 ]
 
-print("🔍 Starting Global Network Verification...")
-for url in domains:
-    try:
-        response = requests.get(url, timeout=5, allow_redirects=True)
-        print(f"[{response.status_code}] {url}")
-        if response.status_code == 200:
-            print(f"   ✅ Live - Content Length: {len(response.content)}")
-        else:
-            print(f"   ⚠️ Warning - Status {response.status_code}")
-    except Exception as e:
-        print(f"[ERROR] {url} - {str(e)[:50]}...")
+def print_status(result):
+    if result["error"]:
+        print(f"[ERROR] {result['url']} - {result['error'][:50]}...")
+        return
+    print(f"[{result['status']}] {result['url']}  ({result['timings']['total']:.0f} ms)")
+    if result["status"] == 200:
+        print(f"   ✅ Live - Content Length: {result['bytes']}")
+    else:
+        print(f"   ⚠️ Warning - Status {result['status']}")
 
-print("\n🏁 Diagnostics Complete.")
+if __name__ == "__main__":
+    args = parse_probe_args("Global network verification")
+    print("🔍 Starting Global Network Verification...")
+    results = run_cli([Target(url, url) for url in domains], args, on_result=print_status)
+    print("\n🏁 Diagnostics Complete.")
+    sys.exit(0 if all(r["ok"] for r in results) else 1)
@@ -0,0 +1,304 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import ssl
+import sys
+import time
+from urllib.parse import urljoin, urlsplit
+
+# Concurrent HTTP health prober for ping_master.py and check_health.py.
+# URLs are probed with asyncio (stdlib only), at most `concurrency` at a time,
+# so one hanging domain costs its own timeout and nothing more. Each probe
+# follows redirects and records DNS, connect, TLS, TTFB and total times in ms
+# (DNS/connect/TLS summed over the redirect hops, TTFB and total measured from
+# the start of the probe). Failed attempts (network errors, timeouts, 429 and
+# 5xx) are retried with jittered exponential backoff.
+# --connect-to HOST:PORT sends every request in plain HTTP to that address,
+# keeping the original Host header: the way to run against health_stub.py.
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+SOURCE_DIR = os.path.join(ROOT_DIR, "_source")
+OUTPUT_DIR = os.path.join(ROOT_DIR, "output")
+CONCURRENCY = 10
+RETRIES = 2
+TIMEOUT = 10.0
+MAX_REDIRECTS = 5
+BACKOFF_BASE = 0.5
+USER_AGENT = "agence-web-locale-health-probe/1.0"
+TIMINGS = ("dns", "connect", "tls", "ttfb", "total")
+
+
+class Target:
+    def __init__(self, name, url, expected=200):
+        self.name = name
+        self.url = url
+        self.expected = expected
+
+
+async def _read_body(reader, headers):
+    if "chunked" in headers.get("transfer-encoding", "").lower():
+        size = 0
+        while True:
+            line = await reader.readline()
+            chunk = int(line.split(b";", 1)[0].strip() or b"0", 16)
+            if chunk == 0:
+                # Trailers end with an empty line
+                while (await reader.readline()).strip():
+                    pass
+                return size
+            await reader.readexactly(chunk + 2)
+            size += chunk
+    if "content-length" in headers:
+        length = int(headers["content-length"])
+        await reader.readexactly(length)
+        return length
+    size = 0
+    while True:
+        data = await reader.read(65536)
+        if not data:
+            return size
+        size += len(data)
+
+
+async def fetch(url, started, timings, connect_to=None):
+    """One GET of url (no redirect handling); return (status, headers, body size)."""
+    parts = urlsplit(url)
+    https = parts.scheme == "https" and connect_to is None
+    host = parts.hostname
+    port = parts.port or (443 if parts.scheme == "https" else 80)
+    loop = asyncio.get_running_loop()
+
+    step = time.perf_counter()
+    if connect_to:
+        address = connect_to
+    else:
+        infos = await loop.getaddrinfo(host, port, type=socket.SOCK_STREAM)
+        address = infos[0][4][:2]
+    now = time.perf_counter()
+    timings["dns"] += now - step
+
+    step = now
+    reader, writer = await asyncio.open_connection(address[0], address[1])
+    try:
+        now = time.perf_counter()
+        timings["connect"] += now - step
+        if https:
+            step = now
+            await writer.start_tls(ssl.create_default_context(), server_hostname=host)
+            now = time.perf_counter()
+            timings["tls"] += now - step
+
+        target = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+        host_header = host if parts.port is None else f"{host}:{parts.port}"
+        writer.write(f"GET {target} HTTP/1.1\r\nHost: {host_header}\r\nUser-Agent: {USER_AGENT}\r\n"
+                     f"Accept-Encoding: identity\r\nConnection: close\r\n\r\n".encode("latin-1"))
+        await writer.drain()
+
+        status_line = await reader.readline()
+        timings["ttfb"] = time.perf_counter() - started
+        if not status_line:
+            raise ConnectionError("connection closed without a response")
+        status = int(status_line.split()[1])
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        size = await _read_body(reader, headers)
+        return status, headers, size
+    finally:
+        writer.close()
+        try:
+            await writer.wait_closed()
+        except (OSError, ssl.SSLError):
+            pass
+
+
+async def probe_once(url, timeout, connect_to=None):
+    """Follow url through its redirects; return a result dict (timings in ms)."""
+    started = time.perf_counter()
+    timings = dict.fromkeys(TIMINGS, 0.0)
+    result = {"url": url, "status": None, "final_url": url, "redirects": 0, "bytes": 0, "error": None}
+
+    async def follow():
+        current = url
+        for _ in range(MAX_REDIRECTS + 1):
+            status, headers, size = await fetch(current, started, timings, connect_to)
+            result.update(status=status, final_url=current, bytes=size)
+            if status in (301, 302, 303, 307, 308) and headers.get("location"):
+                current = urljoin(current, headers["location"])
+                result["redirects"] += 1
+                continue
+            return
+        result["error"] = f"more than {MAX_REDIRECTS} redirects"
+
+    try:
+        await asyncio.wait_for(follow(), timeout)
+    except asyncio.TimeoutError:
+        result["error"] = f"timeout after {timeout:g}s"
+    except (OSError, ssl.SSLError, ValueError, IndexError, asyncio.IncompleteReadError) as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+    timings["total"] = time.perf_counter() - started
+    result["timings"] = {name: round(value * 1000, 1) for name, value in timings.items()}
+    return result
+
+
+def is_retryable(result):
+    return result["error"] is not None or result["status"] == 429 or result["status"] >= 500
+
+
+async def probe(target, semaphore, timeout, retries, connect_to=None):
+    async with semaphore:
+        for attempt in range(retries + 1):
+            result = await probe_once(target.url, timeout, connect_to)
+            if not is_retryable(result) or attempt == retries:
+                break
+            # Jittered so retries of a failing host do not fire in step
+            await asyncio.sleep(BACKOFF_BASE * (2 ** attempt) * (0.5 + random.random() / 2))
+    result.update(name=target.name, expected=target.expected, attempts=attempt + 1,
+                  ok=result["error"] is None and result["status"] == target.expected)
+    return result
+
+
+async def _run_probes(targets, concurrency, timeout, retries, connect_to, on_result):
+    semaphore = asyncio.Semaphore(concurrency)
+    tasks = [asyncio.ensure_future(probe(t, semaphore, timeout, retries, connect_to)) for t in targets]
+    for future in asyncio.as_completed(tasks):
+        result = await future
+        if on_result:
+            on_result(result)
+    return [task.result() for task in tasks]
+
+
+def run_probes(targets, concurrency=CONCURRENCY, timeout=TIMEOUT, retries=RETRIES, connect_to=None, on_result=None):
+    """Probe every target; return the results in target order. on_result sees them as they finish."""
+    return asyncio.run(_run_probes(targets, concurrency, timeout, retries, connect_to, on_result))
+
+
+def percentile(values, p):
+    """Nearest-rank percentile of a list of numbers."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * p // 100))
+    return ordered[int(rank) - 1]
+
+
+def summarize(results):
+    """{timing: {"p50", "p95", "max"}} over the probes that got a response."""
+    answered = [r for r in results if r["status"] is not None]
+    summary = {}
+    for name in TIMINGS:
+        values = [r["timings"][name] for r in answered]
+        summary[name] = {"p50": percentile(values, 50), "p95": percentile(values, 95), "max": max(values) if values else None}
+    return summary
+
+
+def print_summary(results, elapsed):
+    ok = sum(1 for r in results if r["ok"])
+    print(f"📊 {ok}/{len(results)} OK in {elapsed:.2f}s — latency (ms) over {sum(1 for r in results if r['status'] is not None)} responses:")
+    for name, stats in summarize(results).items():
+        if stats["p50"] is not None:
+            print(f"   {name:<8} p50 {stats['p50']:>8.1f}   p95 {stats['p95']:>8.1f}   max {stats['max']:>8.1f}")
+
+
+def write_report(path, results, elapsed):
+    report = {
+        "generated": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "seconds": round(elapsed, 3),
+        "ok": sum(1 for r in results if r["ok"]),
+        "total": len(results),
+        "summary": summarize(results),
+        "results": results,
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=1)
+    print(f"💾 Report written to {path}")
+
+
+def default_sitemaps():
+    """Local main and niche sitemaps when output/ is there, else the public ones."""
+    local = os.path.join(OUTPUT_DIR, "sitemap.xml")
+    if os.path.exists(local):
+        niche = os.path.join(OUTPUT_DIR, "sitemaps")
+        return [local] + sorted(os.path.join(niche, name) for name in os.listdir(niche) if name.endswith(".xml"))
+    sys.path.insert(0, SOURCE_DIR)
+    from sitemaps import BASE_URL, NICHE_DOMAINS
+    return [f"{BASE_URL}/sitemap.xml"] + [f"https://{domain}/sitemap.xml" for domain in NICHE_DOMAINS.values()]
+
+
+def sample_targets(n, sitemaps=None, seed=None):
+    """n random city pages and n random demos listed in the sitemaps."""
+    sys.path.insert(0, SOURCE_DIR)
+    from index_pages import iter_sitemap
+    from sitemaps import NICHE_DOMAINS
+
+    rng = random.Random(seed)
+    cities, demos = [], []
+    for source in sitemaps or default_sitemaps():
+        for loc, _ in iter_sitemap(source):
+            if "/creation-site-internet-" in loc:
+                cities.append(loc)
+            elif (urlsplit(loc).hostname or "").endswith(tuple(NICHE_DOMAINS.values())):
+                demos.append(loc)
+    picked = rng.sample(cities, min(n, len(cities))) + rng.sample(demos, min(n, len(demos)))
+    return [Target(f"Sample {urlsplit(url).hostname}{urlsplit(url).path}", url) for url in picked]
+
+
+def parse_connect_to(value):
+    host, _, port = value.rpartition(":")
+    if not host or not port.isdigit():
+        raise argparse.ArgumentTypeError("expected HOST:PORT")
+    return host, int(port)
+
+
+def parse_probe_args(description=None, configure=None):
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument("--concurrency", type=int, default=CONCURRENCY, help="probes in flight at once")
+    parser.add_argument("--retries", type=int, default=RETRIES, help="extra attempts after an error, 429 or 5xx")
+    parser.add_argument("--timeout", type=float, default=TIMEOUT, help="seconds per attempt, redirects included")
+    parser.add_argument("--sample", type=int, default=0, metavar="N",
+                        help="also probe N random city pages and N random demos from the sitemaps")
+    parser.add_argument("--sitemap", action="append", help="sitemap(s) to sample from (default: output/ or the live ones)")
+    parser.add_argument("--seed", type=int, help="seed of the sample, to probe the same URLs again")
+    parser.add_argument("--json", help="write the JSON report to this file")
+    parser.add_argument("--connect-to", type=parse_connect_to, metavar="HOST:PORT",
+                        help="send every request in plain HTTP to this address (e.g. health_stub.py)")
+    if configure:
+        configure(parser)
+    return parser.parse_args()
+
+
+def run_cli(targets, args, on_result=None):
+    """Probe targets (plus the sample asked for on the command line), print the summary and write the report."""
+    if args.sample:
+        targets = list(targets) + sample_targets(args.sample, args.sitemap, args.seed)
+    started = time.perf_counter()
+    results = run_probes(targets, args.concurrency, args.timeout, args.retries, args.connect_to, on_result)
+    elapsed = time.perf_counter() - started
+    print_summary(results, elapsed)
+    if args.json:
+        write_report(args.json, results, elapsed)
+    return results
+
+
+def print_result(result):
+    t = result["timings"]
+    status = result["status"] if result["error"] is None else "ERR"
+    print(f"{'✅' if result['ok'] else '❌'} [{status}] {result['url']}  "
+          f"(dns {t['dns']:.0f} / connect {t['connect']:.0f} / tls {t['tls']:.0f} / ttfb {t['ttfb']:.0f} / total {t['total']:.0f} ms"
+          f"{', ' + str(result['attempts']) + ' attempts' if result['attempts'] > 1 else ''})")
+    if result["error"]:
+        print(f"   ⚠️ {result['error']}")
+
+
+if __name__ == "__main__":
+    args = parse_probe_args("Probe URLs concurrently and report latencies",
+                            lambda parser: parser.add_argument("urls", nargs="*", help="URLs expected to answer 200"))
+    results = run_cli([Target(url, url) for url in args.urls], args, print_result)
+    sys.exit(0 if all(r["ok"] for r in results) else 1)
@@ -0,0 +1,104 @@
+import argparse
+import http.server
+import random
+import threading
+import time
+
+# Local stand-in for the live sites, to run ping_master.py / check_health.py /
+# health_probe.py without the network. Answers every Host like the edge worker
+# does at a glance:
+#   - bare niche domains redirect (301) to https://agence-web-locale.fr/,
+#     except /sitemap.xml
+#   - everything else answers 200 with a small HTML or XML body
+# with a configurable latency, share of 503 answers and share of requests that
+# hang (to exercise timeouts and retries).
+# Usage: python health_stub.py [--port 8098] [--latency-ms 20] [--error-rate 0.1] ...
+#        python ping_master.py --connect-to 127.0.0.1:8098
+
+PORT = 8098
+NICHE_DOMAINS = ("sites-restaurants.fr", "sitesartisans.fr", "sites-beaute.fr",
+                 "sites-immobiliers.fr", "sites-avocats.fr", "sites-sante.fr")
+
+
+class HealthStub:
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, hang_rate=0.0, hang=30.0, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.hang_rate = hang_rate
+        self.hang = hang
+        self.random = random.Random(seed)
+        self.requests = 0
+        self.lock = threading.Lock()
+
+    def draw(self):
+        """(delay, status) for one request."""
+        with self.lock:
+            self.requests += 1
+            if self.random.random() < self.hang_rate:
+                return self.hang, 200
+            delay = self.latency + self.random.random() * self.jitter
+            status = 503 if self.random.random() < self.error_rate else 200
+        return delay, status
+
+
+class StubHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        stub = self.server.stub
+        host = (self.headers.get("Host") or "").split(":")[0].lower()
+        path = self.path.split("?", 1)[0]
+        delay, status = stub.draw()
+        time.sleep(delay)
+
+        if host.removeprefix("www.") in NICHE_DOMAINS and path != "/sitemap.xml":
+            self.send_response(301)
+            self.send_header("Location", "https://agence-web-locale.fr/")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        if path.endswith(".xml"):
+            content_type, body = "application/xml; charset=UTF-8", b'<?xml version="1.0" encoding="UTF-8"?>\n<urlset/>\n'
+        else:
+            content_type, body = "text/html; charset=UTF-8", f"<!DOCTYPE html><title>{host}{path}</title>\n".encode("utf-8")
+        if status != 200:
+            content_type, body = "text/plain; charset=UTF-8", b"Service Unavailable\n"
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubServer(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+    # The probes connect all at once; the default backlog of 5 would add SYN retries
+    request_queue_size = 128
+
+    def __init__(self, address, stub):
+        self.stub = stub
+        super().__init__(address, StubHandler)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local stand-in for the live sites")
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="extra random latency, up to this much")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests answered with 503")
+    parser.add_argument("--hang-rate", type=float, default=0.0, help="share of requests that hang for --hang-s")
+    parser.add_argument("--hang-s", type=float, default=30.0)
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+
+    stub = HealthStub(args.latency_ms / 1000, args.jitter_ms / 1000, args.error_rate, args.hang_rate, args.hang_s, args.seed)
+    with StubServer(("", args.port), stub) as httpd:
+        print(f"🧪 Health stand-in on http://localhost:{args.port} (latency {args.latency_ms:g} ms, errors {args.error_rate:.0%})")
+        try:
+            httpd.serve_forever()
+        except KeyboardInterrupt:
+            print(f"\n👋 {stub.requests} requests served.")
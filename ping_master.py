@@ -1,5 +1,5 @@
-import requests
-import json
+import sys
+from health_probe import Target, parse_probe_args, run_cli
 
 # Setup
 MAIN_DOMAIN = "https://agence-web-locale.fr"
@@ -49,34 +49,34 @@ for domain, brand in NICHES.items():
         "expected": 200
     })
 
-def run_checks():
+def print_check(result):
+    print(f"📡 {result['name']}")
+    if result["error"]:
+        print(f"   ⚠️ ERROR: {result['error'][:100]} ({result['attempts']} tentatives)")
+    elif result["ok"]:
+        print(f"   ✅ SUCCESS ({result['status']}) - {result['url']}  [ttfb {result['timings']['ttfb']:.0f} ms, total {result['timings']['total']:.0f} ms]")
+    else:
+        print(f"   ❌ FAILED ({result['status']}) - {result['url']}")
+        if result["status"] == 404:
+            print(f"      👉 Vérifiez si Netlify a fini le déploiement ou si le Worker est actif.")
+        elif result["status"] == 525:
+            print(f"      👉 Erreur SSL : Vérifiez que Cloudflare est en mode SSL 'Full'.")
+    print("-" * 60)
+
+def run_checks(args):
     print("🚀 Démarrage du Ping Master Network...")
     print("="*60)
-    
-    success_count = 0
-    
-    for test in TESTS:
-        print(f"📡 Testing: {test['name']}")
-        try:
-            # On suit les redirections pour vérifier la destination finale
-            response = requests.get(test['url'], timeout=10, allow_redirects=True)
-            
-            if response.status_code == test['expected']:
-                print(f"   ✅ SUCCESS ({response.status_code}) - {test['url']}")
-                success_count += 1
-            else:
-                print(f"   ❌ FAILED ({response.status_code}) - {test['url']}")
-                if response.status_code == 404:
-                    print(f"      👉 Vérifiez si Netlify a fini le déploiement ou si le Worker est actif.")
-                elif response.status_code == 525:
-                    print(f"      👉 Erreur SSL : Vérifiez que Cloudflare est en mode SSL 'Full'.")
-        except Exception as e:
-            print(f"   ⚠️ ERROR: {str(e)[:100]}")
-        print("-" * 60)
 
-    print(f"\n🏁 Résultats : {success_count}/{len(TESTS)} liens sont opérationnels.")
-    if success_count < len(TESTS):
+    # Tous les tests partent en parallèle ; on suit les redirections pour vérifier la destination finale
+    targets = [Target(test["name"], test["url"], test["expected"]) for test in TESTS]
+    results = run_cli(targets, args, on_result=print_check)
+    success_count = sum(1 for r in results if r["ok"])
+
+    print(f"\n🏁 Résultats : {success_count}/{len(results)} liens sont opérationnels.")
+    if success_count < len(results):
         print("💡 Conseil : Si vous venez de déployer le Worker, attendez 1-2 minutes et relancez le script.")
+    return success_count == len(results)
 
 if __name__ == "__main__":
-    run_checks()
+    args = parse_probe_args("Vérifie les domaines, sitemaps et démos en production")
+    sys.exit(0 if run_checks(args) else 1)
@@ -0,0 +1,112 @@
+import io
+import os
+import sys
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from unittest import mock
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT_DIR, "_source"))
+
+import deploy
+
+# deploy.py on a throwaway output/ and --target directory: the delta deploy by
+# digest, and the pruning of retired pages that leaves the hubs alone.
+
+
+def write(root, key, text):
+    path = os.path.join(root, key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+
+
+def read(root, key):
+    with open(os.path.join(root, key), "r", encoding="utf-8") as f:
+        return f.read()
+
+
+class DeployCase(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.root = os.path.join(tmp.name, "output")
+        self.target = os.path.join(tmp.name, "target")
+        # The build manifests of the real .build/ are left alone
+        patcher = mock.patch.object(deploy, "MANIFEST_PATH", os.path.join(tmp.name, "deploy-manifest.json"))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.retired = {}
+        patcher = mock.patch.object(deploy, "load_retired", lambda stage: self.retired.get(stage, []))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def update(self, prune_orphans=False):
+        with redirect_stdout(io.StringIO()):
+            return deploy.update_manifest(self.root, prune_orphans=prune_orphans)
+
+    def deploy(self, files):
+        with redirect_stdout(io.StringIO()):
+            return deploy.deploy(files, root=self.root, target=self.target)
+
+
+class TargetTest(DeployCase):
+    def test_first_deploy_copies_everything(self):
+        write(self.root, "index.html", "home")
+        write(self.root, "haute-garonne/creation-site-internet-toulouse.html", "toulouse")
+        added, changed, removed = self.deploy(self.update())
+        self.assertEqual(sorted(added), ["haute-garonne/creation-site-internet-toulouse.html", "index.html"])
+        self.assertEqual((changed, removed), ([], []))
+        self.assertEqual(read(self.target, "haute-garonne/creation-site-internet-toulouse.html"), "toulouse")
+        self.assertTrue(os.path.exists(os.path.join(self.target, deploy.TARGET_MANIFEST)))
+
+    def test_next_deploy_sends_only_the_delta(self):
+        write(self.root, "index.html", "home")
+        write(self.root, "gironde/creation-site-internet-bordeaux.html", "bordeaux")
+        write(self.root, "nord/creation-site-internet-lille.html", "lille")
+        self.deploy(self.update())
+
+        write(self.root, "index.html", "new home")
+        os.remove(os.path.join(self.root, "nord/creation-site-internet-lille.html"))
+        write(self.root, "var/creation-site-internet-toulon.html", "toulon")
+        added, changed, removed = self.deploy(self.update())
+        self.assertEqual((added, changed, removed),
+                         (["var/creation-site-internet-toulon.html"], ["index.html"], ["nord/creation-site-internet-lille.html"]))
+        self.assertEqual(read(self.target, "index.html"), "new home")
+        # Emptied directories go with their last file
+        self.assertFalse(os.path.exists(os.path.join(self.target, "nord")))
+        self.assertEqual(self.deploy(self.update()), ([], [], []))
+
+    def test_rewritten_identical_file_is_not_sent(self):
+        write(self.root, "index.html", "home")
+        self.deploy(self.update())
+        write(self.root, "index.html", "home")
+        os.utime(os.path.join(self.root, "index.html"), ns=(0, 0))
+        self.assertEqual(self.deploy(self.update()), ([], [], []))
+
+
+class PruneTest(DeployCase):
+    def test_retired_pages_and_sidecars_are_pruned(self):
+        write(self.root, "alpes-maritimes/creation-site-internet-nice.html", "nice")
+        write(self.root, "alpes-maritimes/creation-site-internet-nice.html.gz", "gz")
+        write(self.root, "gironde/creation-site-internet-bordeaux.html", "bordeaux")
+        self.retired["villes"] = ["alpes-maritimes/creation-site-internet-nice.html"]
+        files = self.update(prune_orphans=True)
+        self.assertEqual(list(files), ["gironde/creation-site-internet-bordeaux.html"])
+        self.assertFalse(os.path.exists(os.path.join(self.root, "alpes-maritimes")))
+
+    def test_hubs_are_never_pruned(self):
+        write(self.root, "departement-gironde.html", "hub")
+        write(self.root, "region-occitanie.html", "hub")
+        self.retired["site"] = ["departement-gironde.html", "region-occitanie.html"]
+        self.assertEqual(deploy.find_orphans(self.root), [])
+        self.assertEqual(list(self.update(prune_orphans=True)), ["departement-gironde.html", "region-occitanie.html"])
+
+    def test_pages_not_retired_are_kept(self):
+        write(self.root, "index.html", "home")
+        self.assertEqual(deploy.find_orphans(self.root), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
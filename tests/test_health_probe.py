@@ -0,0 +1,78 @@
+import os
+import subprocess
+import sys
+import threading
+import unittest
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from health_probe import Target, run_probes
+from health_stub import HealthStub, StubServer
+import ping_master
+
+# ping_master.py and health_probe.py against health_stub.py on an ephemeral
+# port: every check of the network (main site, each niche sitemap, redirect
+# and demo) goes through --connect-to, without the network.
+
+
+class StubCase(unittest.TestCase):
+    error_rate = 0.0
+
+    def setUp(self):
+        self.stub = HealthStub(error_rate=self.error_rate, seed=1)
+        self.server = StubServer(("127.0.0.1", 0), self.stub)
+        self.connect_to = self.server.server_address[:2]
+        thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        thread.start()
+        self.addCleanup(thread.join)
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+
+    def targets(self):
+        return [Target(test["name"], test["url"], test["expected"]) for test in ping_master.TESTS]
+
+    def run_ping_master(self):
+        host, port = self.connect_to
+        return subprocess.run([sys.executable, "ping_master.py", "--connect-to", f"{host}:{port}", "--retries", "0"],
+                              cwd=ROOT_DIR, capture_output=True, text=True, timeout=60)
+
+
+class HealthyStubTest(StubCase):
+    def test_every_niche_is_checked(self):
+        names = {test["name"] for test in ping_master.TESTS}
+        for domain in ping_master.NICHES:
+            self.assertIn(f"Sitemap {domain}", names)
+            self.assertIn(f"Redirect {domain} -> Main", names)
+
+    def test_all_checks_pass(self):
+        results = run_probes(self.targets(), timeout=5, retries=0, connect_to=self.connect_to)
+        self.assertEqual(len(results), len(ping_master.TESTS))
+        self.assertEqual([r["name"] for r in results if not r["ok"]], [])
+        # Bare niche domains answer 301, followed to the main site
+        redirects = [r for r in results if r["name"].startswith("Redirect ")]
+        self.assertEqual(len(redirects), len(ping_master.NICHES))
+        self.assertTrue(all(r["status"] == 200 for r in redirects))
+
+    def test_exit_code_is_zero(self):
+        done = self.run_ping_master()
+        self.assertEqual(done.returncode, 0, done.stdout + done.stderr)
+        self.assertIn(f"{len(ping_master.TESTS)}/{len(ping_master.TESTS)} liens", done.stdout)
+
+
+class FailingStubTest(StubCase):
+    error_rate = 1.0
+
+    def test_all_checks_fail_after_retries(self):
+        results = run_probes(self.targets(), timeout=5, retries=1, connect_to=self.connect_to)
+        self.assertEqual(sum(1 for r in results if r["ok"]), 0)
+        self.assertTrue(all(r["status"] == 503 and r["attempts"] == 2 for r in results))
+
+    def test_exit_code_is_non_zero(self):
+        done = self.run_ping_master()
+        self.assertEqual(done.returncode, 1, done.stdout + done.stderr)
+        self.assertIn(f"0/{len(ping_master.TESTS)} liens", done.stdout)
+
+
+if __name__ == "__main__":
+    unittest.main()
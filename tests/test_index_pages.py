@@ -0,0 +1,110 @@
+import os
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SOURCE_DIR = os.path.join(ROOT_DIR, "_source")
+sys.path.insert(0, SOURCE_DIR)
+
+import index_pages
+from index_pages import StaticAuth, submit_urls
+from indexing_stub import IndexingStub, StubServer
+
+# index_pages.py against indexing_stub.py on an ephemeral port: batching,
+# item retries, the daily quota and the SQLite state, without calling Google.
+
+
+def page_urls(n):
+    return [f"https://agence-web-locale.fr/page-{i}" for i in range(n)]
+
+
+class IndexingStubCase(unittest.TestCase):
+    stub_options = {}
+
+    def setUp(self):
+        self.stub = IndexingStub(seed=1, **self.stub_options)
+        self.server = StubServer(("127.0.0.1", 0), self.stub)
+        host, port = self.server.server_address[:2]
+        self.endpoint = f"http://{host}:{port}/batch"
+        thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        thread.start()
+        self.addCleanup(thread.join)
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        # No backoff sleeps between retries
+        patcher = mock.patch.object(index_pages, "BACKOFF_BASE", 0)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+
+class SubmitTest(IndexingStubCase):
+    stub_options = {"quota": 1000}
+
+    def test_batches_publish_every_url(self):
+        urls = page_urls(250)
+        results = submit_urls(urls, StaticAuth(), endpoint=self.endpoint, batch_size=100, workers=2)
+        self.assertEqual(results, {url: 200 for url in urls})
+        self.assertEqual(sorted(self.stub.published), sorted(urls))
+        # 100 + 100 + 50: one HTTP call per batch
+        self.assertEqual(self.stub.calls, 3)
+
+
+class FlakyItemsTest(IndexingStubCase):
+    stub_options = {"quota": 1000, "error_rate": 0.3}
+
+    def test_failed_items_are_retried(self):
+        urls = page_urls(100)
+        results = submit_urls(urls, StaticAuth(), endpoint=self.endpoint)
+        self.assertEqual(results, {url: 200 for url in urls})
+        self.assertGreater(self.stub.calls, 1)
+
+
+class DailyQuotaTest(IndexingStubCase):
+    stub_options = {"quota": 150}
+
+    def test_quota_stops_every_worker(self):
+        urls = page_urls(400)
+        results = submit_urls(urls, StaticAuth(), endpoint=self.endpoint, batch_size=50, workers=2)
+        self.assertEqual(len(self.stub.published), 150)
+        self.assertEqual(sum(1 for status in results.values() if status == 200), 150)
+        self.assertIn(429, results.values())
+        # The batches still queued when the quota ran out are never sent
+        self.assertLess(self.stub.calls, len(urls) // 50)
+
+
+class CommandLineTest(IndexingStubCase):
+    stub_options = {"quota": 1000}
+
+    def run_index_pages(self, sitemap, state):
+        return subprocess.run([sys.executable, "index_pages.py", "--no-auth", "--endpoint", self.endpoint,
+                               "--sitemap", sitemap, "--state", state],
+                              cwd=SOURCE_DIR, capture_output=True, text=True, timeout=60)
+
+    def test_state_skips_submitted_urls(self):
+        urls = page_urls(120)
+        with tempfile.TemporaryDirectory() as tmp:
+            sitemap, state = os.path.join(tmp, "sitemap.xml"), os.path.join(tmp, "state.sqlite")
+            with open(sitemap, "w", encoding="utf-8") as f:
+                f.write('<?xml version="1.0" encoding="UTF-8"?>\n<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n')
+                f.writelines(f"<url><loc>{url}</loc><lastmod>2026-01-01</lastmod></url>\n" for url in urls)
+                f.write("</urlset>\n")
+
+            done = self.run_index_pages(sitemap, state)
+            self.assertEqual(done.returncode, 0, done.stdout + done.stderr)
+            self.assertEqual(sorted(self.stub.published), sorted(urls))
+            with sqlite3.connect(state) as db:
+                self.assertEqual(db.execute("SELECT COUNT(*) FROM submissions WHERE status = 200").fetchone()[0], 120)
+                self.assertEqual(db.execute("SELECT SUM(used) FROM daily_quota").fetchone()[0], 120)
+
+            done = self.run_index_pages(sitemap, state)
+            self.assertIn("déjà été soumises", done.stdout)
+            self.assertEqual(len(self.stub.published), 120)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -30,6 +30,8 @@ export default {
             if (filename.endsWith(".webp")) return "image/webp";
             if (filename.endsWith(".woff2")) return "font/woff2";
             if (filename.endsWith(".xml")) return "application/xml; charset=UTF-8";
+            if (filename.endsWith(".json")) return "application/json; charset=UTF-8";
+            if (filename.endsWith(".gz")) return "application/gzip";
             return "application/octet-stream";
         };
 
@@ -48,6 +50,24 @@ export default {
                         headers: { "Content-Type": "application/xml; charset=UTF-8", "Cache-Control": "public, max-age=86400" }
                     });
                 }
+                // sitemap.xml is an index of numbered gzipped files
+                if ((hostname === domain || hostname === "www." + domain) && path.startsWith(`/sitemaps/sitemap-${niche}-`)) {
+                    const response = await fetch(NETLIFY_URL + path);
+                    return new Response(response.body, {
+                        status: response.status,
+                        headers: { "Content-Type": getContentType(path), "Cache-Control": "public, max-age=86400" }
+                    });
+                }
+
+                // Every host of the niche points its robots.txt at the niche sitemap: this
+                // cross-submission is what lets https://{domain}/sitemap.xml list
+                // https://{brand}.{domain}/ URLs, which live on other hosts
+                if (path === "/robots.txt") {
+                    const robotsTxt = `User-agent: *\nAllow: /\n\nSitemap: https://${domain}/sitemap.xml`;
+                    return new Response(robotsTxt, {
+                        headers: { "Content-Type": "text/plain; charset=UTF-8", "Cache-Control": "public, max-age=86400" }
+                    });
+                }
 
                 // --- 1.2 Home Redirect/Landing for Niche ---
                 if (!brandSlug || brandSlug === "www" || brandSlug === domain) {
@@ -102,11 +122,11 @@ export default {
             }
 
             // 2.2 Sitemaps & Robots
-            if (path === "/sitemap.xml") {
-                const response = await fetch(NETLIFY_URL + "/sitemap.xml");
+            if (path === "/sitemap.xml" || path === "/sitemap_index.xml" || path.startsWith("/sitemaps/sitemap-main-")) {
+                const response = await fetch(NETLIFY_URL + path);
                 return new Response(response.body, {
                     status: response.status,
-                    headers: { "Content-Type": "application/xml; charset=UTF-8", "Cache-Control": "public, max-age=86400" }
+                    headers: { "Content-Type": getContentType(path), "Cache-Control": "public, max-age=86400" }
                 });
             }
 
@@ -121,9 +141,11 @@ export default {
             if (path.startsWith("/assets/")) {
                 const response = await fetch(NETLIFY_URL + path);
                 if (response.status === 200) {
+                    // live-fields.json carries the month shown on the pages: short cache
+                    const maxAge = path === "/assets/live-fields.json" ? 3600 : 604800;
                     return new Response(response.body, {
                         status: 200,
-                        headers: { "Content-Type": getContentType(path), "Cache-Control": "public, max-age=604800" }
+                        headers: { "Content-Type": getContentType(path), "Cache-Control": `public, max-age=${maxAge}` }
                     });
                 }
                 // Fallback to Lovable